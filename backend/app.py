@@ -3,16 +3,19 @@ import pandas as pd
 from flask_cors import CORS
 import numpy as np
 import math
+import os
+import tempfile
 from dateutil.parser import parse
+from chunked_ingest import read_excel_file
+from dataset_registry import DatasetRegistry
 
 # Initialize Flask application
 app = Flask(__name__)
 # Enable Cross-Origin Resource Sharing (CORS) for the app
 CORS(app)
 
-# Global variables to store the uploaded data and column definitions
-global_data = []
-global_columns = []
+# Same registry as app_v2, set up from the same environment variables
+registry = DatasetRegistry.from_env()
 
 def is_date(string):
     try:
@@ -58,8 +61,6 @@ def generate_summary(df):
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global global_data, global_columns
-
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
 
@@ -72,37 +73,45 @@ def upload_file():
             if file.filename.endswith('.csv'):
                 df = pd.read_csv(file)
             else:
-                df = pd.read_excel(file)
+                # Streamed in read-only mode; sheet=<name> and range=B2:F100 pick the part of the workbook to read
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    file_path = os.path.join(tmp_dir, 'upload.xlsx')
+                    file.save(file_path)
+                    df = read_excel_file(file_path, request.form.get('sheet') or None, request.form.get('range') or None).to_pandas()
 
+            # Missing values stay NaN/NaT; the Arrow table keeps them as nulls in a validity bitmap
             df.replace([np.inf, -np.inf], np.nan, inplace=True)
-            df = df.where(pd.notnull(df), None)
 
             summary = generate_summary(df)
             summary_row = {col: summary[col] for col in df.columns}
-            df = pd.concat([pd.DataFrame([summary_row]), df], ignore_index=True)
 
-            global_data = df.to_dict(orient='records')
-            global_columns = [{'headerName': col, 'field': col, 'sortable': True, 'filter': True, 'editable': True} for col in df.columns]
+            columns = [{'headerName': col, 'field': col, 'sortable': True, 'filter': True, 'editable': True} for col in df.columns]
+            dataset = registry.add(df, summary_row, columns)
 
-            return get_paginated_data(1)
+            return get_paginated_data(1, dataset.dataset_id)
         except Exception as e:
             return jsonify({'error': 'Error processing file', 'message': str(e)}), 500
     else:
         return jsonify({'error': 'Unsupported file format'}), 400
 
 @app.route('/data', methods=['GET'])
-def get_paginated_data(page=1):
-    global global_data, global_columns
+def get_paginated_data(page=1, dataset_id=None):
+    dataset_id = dataset_id or request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
 
     rows_per_page = 20
     start = (page - 1) * rows_per_page
     end = start + rows_per_page
 
-    paginated_data = global_data[start:end]
-    total_pages = math.ceil(len(global_data) / rows_per_page)
+    summary_row, rows = dataset.rows(start, end)
+    paginated_data = ([summary_row] if summary_row else []) + rows.to_pylist()
+    total_pages = math.ceil(dataset.total_rows / rows_per_page)
 
     response = {
-        'columns': global_columns,
+        'datasetId': dataset.dataset_id,
+        'columns': dataset.columns,
         'data': paginated_data,
         'page': page,
         'totalPages': total_pages
@@ -114,23 +123,40 @@ def get_paginated_data(page=1):
 def get_page(page):
     return get_paginated_data(page)
 
+@app.route('/memory', methods=['GET'])
+def get_memory():
+    """Storage size of each column of a dataset, and of all datasets held in memory."""
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+    return jsonify(registry.memory_report(dataset))
+
 @app.route('/search', methods=['GET'])
 def search_data():
-    global global_data, global_columns
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
 
     query = request.args.get('query', '')
 
+    rows_per_page = 20
     if query:
-        filtered_data = [row for row in global_data if any(query.lower() in str(value).lower() for value in row.values())]
+        summary_row, first_rows, matches = dataset.search(query, limit=rows_per_page)
     else:
-        filtered_data = global_data
+        summary_row, first_rows, matches = dataset.summary_row, dataset.table.slice(0, rows_per_page), dataset.table.num_rows
 
-    rows_per_page = 20
-    total_pages = math.ceil(len(filtered_data) / rows_per_page)
+    # The summary row, when it matches, takes the first slot of the page
+    if summary_row:
+        first_rows = first_rows.slice(0, rows_per_page - 1)
+    total_rows = matches + (1 if summary_row else 0)
+    total_pages = math.ceil(total_rows / rows_per_page)
 
     response = {
-        'columns': global_columns,
-        'data': filtered_data[:rows_per_page],
+        'datasetId': dataset.dataset_id,
+        'columns': dataset.columns,
+        'data': ([summary_row] if summary_row else []) + first_rows.to_pylist(),
         'page': 1,
         'totalPages': total_pages
     }
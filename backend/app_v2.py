@@ -1,61 +1,113 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import os
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import math
 import json
-from openai import AzureOpenAI
-from functions_v2 import (
-    summarize_date_time, summarize_numeric, summarize_categorical, summarize_text,
-    summarize_identifiers, summarize_financial, summarize_geospatial, summarize_boolean,
-    summarize_binary, summarize_contact_information, summarize_aggregated_mixed,
-    summarize_special_symbols, summarize_ratings_scoring, summarize_duration,
-    summarize_survey_feedback, summarize_file_references, summarize_miscellaneous,
-    summarize_names
+import copy
+import cProfile
+import datetime
+import hashlib
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from werkzeug.utils import secure_filename
+from chunked_ingest import (
+    COLUMNAR_EXTENSIONS, EXCEL_EXTENSIONS, compact_arrow_file, data_column_names, excel_sheet_names, iter_column_chunks,
+    parse_cell_range, read_columnar_file, read_columnar_schema, read_excel_file, write_columnar_as_arrow,
+    write_csv_as_arrow, write_excel_as_arrow
 )
+from cursors import InvalidCursor, decode_cursor, encode_cursor
+from dataset_registry import DatasetRegistry
+from dataset_diff import diff_columns, diff_rows
+from dataset_export import EXPORT_FORMATS, ExportError, export_chunks
+from dataset_store import VersionConflict, compact_table, json_default, to_arrow_table
+from metrics import (
+    CACHE_LOOKUPS, REQUEST_SECONDS, REQUESTS, finish_request_timings, render_metrics, server_timing, stage,
+    start_request_timings, summarizer, timed
+)
+from processed_cache import ProcessedDatasetCache, cache_key
+from response_cache import ResponseCache
+from summarizers import column_type_handlers
+from summary_state import build_summary_state_from_chunks
+from upload_jobs import UploadJobManager
+
+FRONTEND_ORIGIN = "http://localhost:5173"
 
 app = Flask(__name__)   
-CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}})
-
-# Azure OpenAI configuration
-GRAPHRAG_LLM_DEPLOYMENT_NAME = "gpt-4o"
-GRAPHRAG_LLM_API_KEY = "7c90d344cb524b9885202a7603641589"
-GRAPHRAG_LLM_API_BASE = "https://azure-isv-success-in.openai.azure.com/"
-GRAPHRAG_LLM_API_VERSION = "2024-06-01"
-
-# Initialize the Azure OpenAI client
-client = AzureOpenAI(
-    api_key=GRAPHRAG_LLM_API_KEY,
-    api_version=GRAPHRAG_LLM_API_VERSION,
-    base_url=f"{GRAPHRAG_LLM_API_BASE}openai/deployments/{GRAPHRAG_LLM_DEPLOYMENT_NAME}"
-)
+CORS(app, resources={r"/*": {"origins": FRONTEND_ORIGIN}})
+
+# Azure OpenAI configuration. LLM_API_BASE can point classification at any OpenAI-compatible
+# server, e.g. the fake one the load tests run (benchmarks/fake_llm_server.py).
+GRAPHRAG_LLM_DEPLOYMENT_NAME = os.environ.get('LLM_DEPLOYMENT_NAME', "gpt-4o")
+GRAPHRAG_LLM_API_KEY = os.environ.get('LLM_API_KEY', "7c90d344cb524b9885202a7603641589")
+GRAPHRAG_LLM_API_BASE = os.environ.get('LLM_API_BASE', "https://azure-isv-success-in.openai.azure.com/")
+GRAPHRAG_LLM_API_VERSION = os.environ.get('LLM_API_VERSION', "2024-06-01")
+
+# The Azure OpenAI client, created by get_llm_client on first use: importing openai is a large
+# share of startup, and most worker processes start long before a column needs classifying.
+# Assign a client here first to use it instead (the benchmarks use an offline stand-in).
+client = None
+llm_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    global client
+    if client is None:
+        with llm_client_lock:
+            if client is None:
+                from openai import AzureOpenAI
+                client = AzureOpenAI(
+                    api_key=GRAPHRAG_LLM_API_KEY,
+                    api_version=GRAPHRAG_LLM_API_VERSION,
+                    base_url=f"{GRAPHRAG_LLM_API_BASE}openai/deployments/{GRAPHRAG_LLM_DEPLOYMENT_NAME}"
+                )
+    return client
 
-# Mapping of column types to handler functions
-column_type_handlers = {
-    "Date/Time": summarize_date_time,
-    "Numeric": summarize_numeric,
-    "Categorical": summarize_categorical,
-    "Text": summarize_text,
-    "Identifiers": summarize_identifiers,
-    "Financial": summarize_financial,
-    "Geospatial": summarize_geospatial,
-    "Boolean": summarize_boolean,
-    "Binary": summarize_binary,
-    "Contact Information": summarize_contact_information,
-    "Aggregated/Mixed Data": summarize_aggregated_mixed,
-    "Special Symbols": summarize_special_symbols,
-    "Ratings/Scoring": summarize_ratings_scoring,
-    "Duration": summarize_duration,
-    "Survey/Feedback": summarize_survey_feedback,
-    "File References": summarize_file_references,
-    "Miscellaneous": summarize_miscellaneous,
-    "Names": summarize_names
-}
-
-# Global variables to store the uploaded data and column definitions
-global_data = []
-global_columns = []
+
+# Uploaded datasets keyed by dataset ID, so concurrent uploads don't overwrite each other
+registry = DatasetRegistry.from_env()
+
+# Uploads are processed by a background worker pool, progress is reported per job.
+# In shared mode progress is written next to the datasets so any worker can report it.
+SSE_KEEPALIVE_SECONDS = 15
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'ag-grid-uploads'))
+# Processed uploads by content hash, so re-uploading the same file skips all processing
+processed_cache = ProcessedDatasetCache(
+    os.environ.get('PROCESSED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ag-grid-cache')),
+    int(float(os.environ.get('PROCESSED_CACHE_MAX_MB', 2048)) * 1024 * 1024)
+)
+jobs = UploadJobManager(
+    max_workers=int(os.environ.get('UPLOAD_WORKERS', 4)),
+    jobs_dir=os.path.join(registry.store.root, 'jobs') if registry.shared else None
+)
+# CSV files above this size are ingested out of core: streamed into a memory-mapped Arrow file
+# and summarized chunk by chunk. Column types without a mergeable summary use a sample of rows.
+OUT_OF_CORE_THRESHOLD_BYTES = int(float(os.environ.get('OUT_OF_CORE_THRESHOLD_MB', 512)) * 1024 * 1024)
+OUT_OF_CORE_SAMPLE_ROWS = int(os.environ.get('OUT_OF_CORE_SAMPLE_ROWS', 100000))
+CLASSIFY_SAMPLE_ROWS = 1000
+# Columns of an upload sent to the LLM at the same time
+CLASSIFY_CONCURRENCY = int(os.environ.get('CLASSIFY_CONCURRENCY', 8))
+# Row windows: /data and /search serve any [startRow, endRow) window of the data rows up to
+# MAX_WINDOW_ROWS rows, pages of DEFAULT_PAGE_ROWS by default
+DEFAULT_PAGE_ROWS = int(os.environ.get('DEFAULT_PAGE_ROWS', 20))
+MAX_WINDOW_ROWS = int(os.environ.get('MAX_WINDOW_ROWS', 1000))
+# Request latency histograms are kept for these routes, see /metrics
+LATENCY_ROUTES = ('/data', '/data/<int:page>', '/search', '/upload')
+# Set to a directory to allow profile=1 on any request, dumping its cProfile stats there
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+profiler_lock = threading.Lock()
+# Serialized /data, /search and /summary bodies by ETag, so repeated requests skip serialization
+response_cache = ResponseCache(
+    int(os.environ.get('RESPONSE_CACHE_ENTRIES', 256)),
+    int(float(os.environ.get('RESPONSE_CACHE_MAX_MB', 64)) * 1024 * 1024)
+)
 
 # Function to generate prompt for the LLM to identify column type
 def generate_prompt(column_name, column_data_sample):
@@ -100,6 +152,7 @@ def generate_prompt(column_name, column_data_sample):
     """
     return system_prompt, user_prompt
 
+@timed('convert_to_serializable')
 def convert_to_serializable(data):
     """Convert DataFrame to a serializable format."""
     def handle_value(val):
@@ -109,10 +162,14 @@ def convert_to_serializable(data):
             return val.item()  # Convert numpy types to native Python types
         if isinstance(val, bytes):
             return val.decode('utf-8')  # Handle bytes (base64 images)
+        if isinstance(val, (datetime.date, datetime.time)):
+            return val.isoformat()  # Date/time columns from Parquet/Arrow files
+        if isinstance(val, pd.Timedelta):
+            return str(val)  # Duration columns from Parquet/Arrow files
         return val
 
     if isinstance(data, pd.DataFrame):
-        data = data.applymap(handle_value)
+        data = data.map(handle_value)
         return data.to_dict(orient='records')
     if isinstance(data, dict):
         return {k: handle_value(v) for k, v in data.items()}
@@ -122,9 +179,444 @@ def convert_to_serializable(data):
 
 
 
+VALID_COLUMN_TYPES = [
+    "Date/Time", "Numeric", "Categorical", "Text", "Identifiers", "Financial", "Geospatial", "Boolean", "Binary",
+    "Contact Information", "Aggregated/Mixed Data", "Special Symbols", "Ratings/Scoring", "Duration",
+    "Survey/Feedback", "File References", "Miscellaneous", "Names"
+]
+
+
+def read_upload(file_path, filename, columns=None, sheet=None, cell_range=None, progress=None):
+    """
+    Read an uploaded file, returning it as an Arrow table and as a DataFrame.
+    columns selects the columns of a columnar file, sheet and cell_range the part of a workbook to read.
+    """
+    if filename.endswith(COLUMNAR_EXTENSIONS):
+        table = read_columnar_file(file_path, columns)
+        return table, table.to_pandas()
+    if filename.endswith(EXCEL_EXTENSIONS):
+        table = read_excel_file(file_path, sheet, cell_range, progress)
+        return compact_table(table), table.to_pandas()
+    df = pd.read_csv(file_path)
+    return to_arrow_table(df), df
+
+
+def write_upload_as_arrow(file_path, filename, arrow_path, columns=None, sheet=None, cell_range=None, progress=None):
+    """Stream an uploaded file into an Arrow IPC file, returning its schema. Options as for read_upload."""
+    if filename.endswith(COLUMNAR_EXTENSIONS):
+        return write_columnar_as_arrow(file_path, arrow_path, columns, progress)
+    # CSV and Excel cells are converted as they come, then stored in compact types like read_upload's tables
+    raw_path = f"{arrow_path}.raw"
+    try:
+        if filename.endswith(EXCEL_EXTENSIONS):
+            write_excel_as_arrow(file_path, raw_path, sheet, cell_range, progress)
+        else:
+            write_csv_as_arrow(file_path, raw_path, progress)
+        return compact_arrow_file(raw_path, arrow_path)
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+
+def check_read_options(file_path, filename, read_options):
+    """Return an error response body if the read options don't apply to the file, else None."""
+    if 'columns' in read_options:
+        if not filename.endswith(COLUMNAR_EXTENSIONS):
+            return {'error': 'Column selection is only supported for Parquet, Feather and Arrow files'}
+        try:
+            available = data_column_names(read_columnar_schema(file_path))
+        except (pa.ArrowInvalid, OSError) as e:
+            return {'error': 'Error reading file', 'message': str(e)}
+        unknown = [col for col in read_options['columns'] if col not in available]
+        if unknown:
+            return {'error': 'Unknown columns', 'columns': unknown}
+
+    if ('sheet' in read_options or 'cell_range' in read_options) and not filename.endswith(EXCEL_EXTENSIONS):
+        return {'error': 'Sheet and range selection is only supported for Excel files'}
+    if 'cell_range' in read_options:
+        try:
+            parse_cell_range(read_options['cell_range'])
+        except ValueError as e:
+            return {'error': 'Invalid range', 'message': str(e)}
+    if 'sheet' in read_options:
+        try:
+            sheet_names = excel_sheet_names(file_path)
+        except Exception as e:
+            return {'error': 'Error reading file', 'message': str(e)}
+        if read_options['sheet'] not in sheet_names:
+            return {'error': 'Unknown sheet', 'sheet': read_options['sheet'], 'sheets': sheet_names}
+    return None
+
+
+def schema_column_type(data_type):
+    """The column type an Arrow type already settles, or None if the values have to be classified."""
+    if pa.types.is_boolean(data_type):
+        return "Boolean"
+    if pa.types.is_timestamp(data_type) or pa.types.is_date(data_type) or pa.types.is_time(data_type):
+        return "Date/Time"
+    if pa.types.is_duration(data_type):
+        return "Duration"
+    if pa.types.is_dictionary(data_type):
+        return "Categorical"
+    return None
+
+
+def classify_column(df, column_name, schema=None):
+    """
+    Ask the LLM for the column type, falling back to column name clues.
+    schema is the Arrow schema of a file that declares its types; the LLM is skipped where it settles the type.
+    """
+    if schema is not None:
+        column_type = schema_column_type(schema.field(column_name).type)
+        if column_type:
+            return column_type
+
+    column_data_sample = df[column_name].dropna().head(5).to_list()
+    column_data_sample_str = '\n'.join([f"{i+1}. \"{str(value)}\"" for i, value in enumerate(column_data_sample)])
+    system_prompt, user_prompt = generate_prompt(column_name, column_data_sample_str)
+
+    # Send the prompt to the OpenAI model
+    with stage('llm_classify'):
+        response = get_llm_client().chat.completions.create(
+            model="gpt-35-turbo",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        )
+
+    identified_type = response.choices[0].message.content.strip()
+
+    # Types added by summarizer plugins are accepted too
+    if identified_type in VALID_COLUMN_TYPES or identified_type in column_type_handlers:
+        return identified_type
+    if "id" in column_name.lower():
+        return "Identifiers"
+    elif any(x in column_name.lower() for x in ["date", "time", "year", "month", "day"]):
+        return "Date/Time"
+    elif any(x in column_name.lower() for x in ["amount", "price", "cost", "revenue"]):
+        return "Financial"
+    elif any(x in column_name.lower() for x in ["email", "phone", "address"]):
+        return "Contact Information"
+    elif any(x in column_name.lower() for x in ["lat", "long", "geo", "address"]):
+        return "Geospatial"
+    elif any(x in column_name.lower() for x in ["score", "rating"]):
+        return "Ratings/Scoring"
+    return "Miscellaneous"
+
+
+def format_summary(result):
+    """Turn a summary handler's result into the summary row cell."""
+    # Add formatted summary text and chart options together, with numpy values made JSON-safe
+    return json.loads(json.dumps({
+        'summary': ', '.join([f"{key}: {value}" for key, value in result.items() if key != 'chart_options']),
+        'chart_options': result.get('chart_options', {})
+    }, default=json_default))
+
+
+def error_cell(column_name, error):
+    """Summary row cell of a column whose summary handler raised error."""
+    return {'summary': f"Error processing column '{column_name}': {str(error)}", 'chart_options': {}}
+
+
+def column_definitions(column_names):
+    """ag-Grid column definitions of the data columns."""
+    return [{'headerName': col, 'field': col, 'sortable': True, 'filter': True, 'editable': True} for col in column_names]
+
+
+def summarize_column(df, column_name, column_type):
+    """Run the summary handler for the column type, returning the cell for the summary row and whether the handler failed."""
+    if column_type not in column_type_handlers:
+        return {'summary': "", 'chart_options': {}}, False
+    try:
+        # Execute the summary function, importing it on first use
+        handler_function = column_type_handlers[column_type]
+        with summarizer(column_type):
+            result = handler_function(df, column_name)
+        return format_summary(result), False
+    except Exception as e:
+        return error_cell(column_name, e), True
+
+
+def summarize_column_chunked(table, column_name, column_type):
+    """Like summarize_column, for a table that is read one record batch at a time."""
+    if column_type not in column_type_handlers:
+        return {'summary': "", 'chart_options': {}}, False
+    try:
+        handler_function = column_type_handlers[column_type]
+        with summarizer(column_type):
+            chunks = lambda: iter_column_chunks(table, column_name)
+            state = build_summary_state_from_chunks(column_name, column_type, chunks, handler_function,
+                                                    incremental=column_type_handlers.is_builtin(column_type),
+                                                    sample_rows=OUT_OF_CORE_SAMPLE_ROWS)
+            result = state.result(chunks)
+        return format_summary(result), False
+    except Exception as e:
+        return error_cell(column_name, e), True
+
+
+def summarize_table_column(table, column_name, column_type):
+    """summarize_column for a column of an Arrow table."""
+    return summarize_column(table.select([column_name]).to_pandas(), column_name, column_type)
+
+
+def publish_column_summary(dataset_id, data_version, column_name, column_type, cell, failed, summarize_current):
+    """
+    Merge the type and summary an upload job computed for one column into the dataset's current
+    column types and summary row. The job summarizes the data as it was read, edits made since then
+    win: a column an edit has already re-summarized keeps that summary, and one whose rows changed
+    otherwise is summarized again from the current data with summarize_current(table, column_name, column_type).
+    failed says the job's summary handler raised. Returns the (cell, failed) published, or None if
+    the dataset or the column is gone.
+    """
+    job_summary = (cell, failed)
+    while True:
+        dataset = registry.get(dataset_id)
+        if dataset is None or column_name not in dataset.table.column_names:
+            return None
+        if column_name in dataset.summary_states:
+            # update_summaries drops the state of a column it failed to summarize
+            cell, failed = dataset.summary_row.get(column_name, job_summary[0]), False
+        elif dataset.data_version != data_version:
+            cell, failed = summarize_current(dataset.table, column_name, column_type)
+        else:
+            cell, failed = job_summary
+        try:
+            registry.update(dataset_id, summary_row={**dataset.summary_row, column_name: cell},
+                            column_types={**dataset.column_types, column_name: column_type}, expected_version=dataset.version)
+            return cell, failed
+        except VersionConflict:
+            # An edit or another worker published a version in between, merge into that one
+            continue
+
+
+def classify_and_summarize(job, dataset, column_names, column_types, classify, summarize, summarize_current):
+    """
+    Classify and summarize the columns of an upload job, publishing each column's type and summary
+    as soon as it is ready. Columns without a type in column_types are sent to the LLM concurrently,
+    and each column is summarized as soon as its own type is known, so no chart waits for a slower
+    classification of another column. classify(column_name) returns the column type and summarize(column_name,
+    column_type) the job's summary cell and whether its handler failed; summarize_current is passed on to publish_column_summary.
+    Fills in column_types and returns the job's summary cells.
+    """
+    cells = {}
+
+    def summarize_and_publish(column_name):
+        if job.stage != 'summarize':
+            jobs.update(job, stage='summarize')
+        cells[column_name], failed = summarize(column_name, column_types[column_name])
+        published = publish_column_summary(dataset.dataset_id, dataset.data_version, column_name, column_types[column_name],
+                                           cells[column_name], failed, summarize_current)
+        failed = published is not None and published[1]
+        jobs.update(job, column_status=(column_name, 'error' if failed else 'summarized'))
+
+    with ThreadPoolExecutor(max_workers=CLASSIFY_CONCURRENCY, thread_name_prefix='classify') as pool:
+        pending = {pool.submit(classify, column_name): column_name for column_name in column_names if column_name not in column_types}
+        try:
+            # Columns whose type is known don't wait for the LLM, the others go in the order their answers come back
+            for column_name in column_names:
+                if column_name in column_types:
+                    summarize_and_publish(column_name)
+            for future in as_completed(pending):
+                column_name = pending[future]
+                column_types[column_name] = future.result()
+                jobs.update(job, column_status=(column_name, 'classified'))
+                summarize_and_publish(column_name)
+        finally:
+            # A failed classification fails the job, the LLM calls not started yet are dropped
+            for future in pending:
+                future.cancel()
+    return cells
+
+
+def process_upload(job, file_path, filename, key, read_options):
+    """Background upload job: read the file, then classify and summarize each column."""
+    jobs.update(job, stage='ingest')
+    try:
+        with stage('read'):
+            table, df = read_upload(file_path, filename, **read_options, progress=lambda fraction: jobs.update(job, ingest_progress=fraction))
+    finally:
+        os.remove(file_path)
+
+    # Register the data straight away so pages can be read while the summaries are computed
+    summary_row = {col: {'summary': "", 'chart_options': {}} for col in df.columns}
+    columns = column_definitions(df.columns)
+    dataset = registry.add_table(table, summary_row, columns)
+    jobs.update(job, dataset_id=dataset.dataset_id, stage='classify', columns={col: 'pending' for col in df.columns})
+
+    # Identify the type of each column and summarize it, publishing each summary as soon as it is ready
+    schema = table.schema if filename.endswith(COLUMNAR_EXTENSIONS) else None
+    column_types = {}
+    summary_row.update(classify_and_summarize(
+        job, dataset, list(df.columns), column_types,
+        classify=lambda column_name: classify_column(df, column_name, schema),
+        summarize=lambda column_name, column_type: summarize_column(df, column_name, column_type),
+        summarize_current=summarize_table_column
+    ))
+
+    # Cache what was read from the file, not the dataset, which may have been edited by now
+    with stage('cache_write'):
+        processed_cache.put(key, table, {'summary_row': summary_row, 'columns': columns, 'column_types': column_types})
+
+
+def process_out_of_core_upload(job, file_path, filename, key, read_options):
+    """
+    Background job for files too large to load: the file is streamed into an Arrow file in
+    the dataset store and served memory-mapped, and each column is summarized chunk by chunk.
+    """
+    jobs.update(job, stage='ingest')
+    arrow_path = registry.store.temp_path()
+    try:
+        with stage('read'):
+            schema = write_upload_as_arrow(file_path, filename, arrow_path, **read_options,
+                                           progress=lambda fraction: jobs.update(job, ingest_progress=fraction))
+    except Exception:
+        if os.path.exists(arrow_path):
+            os.remove(arrow_path)
+        raise
+    finally:
+        os.remove(file_path)
+
+    summary_row = {col: {'summary': "", 'chart_options': {}} for col in schema.names}
+    columns = column_definitions(schema.names)
+    dataset = registry.add_arrow_file(arrow_path, summary_row, columns)
+    data_path = registry.data_path(dataset)
+    jobs.update(job, dataset_id=dataset.dataset_id, stage='classify', columns={col: 'pending' for col in schema.names})
+
+    # The LLM only sees a few values per column, the first rows are enough
+    sample = dataset.table.slice(0, CLASSIFY_SAMPLE_ROWS).to_pandas()
+    column_types = {}
+    summary_row.update(classify_and_summarize(
+        job, dataset, schema.names, column_types,
+        classify=lambda column_name: classify_column(sample, column_name, schema if filename.endswith(COLUMNAR_EXTENSIONS) else None),
+        summarize=lambda column_name, column_type: summarize_column_chunked(dataset.table, column_name, column_type),
+        summarize_current=summarize_column_chunked
+    ))
+
+    # Cache the file as ingested. If edits have replaced it in the store since, the mapped table
+    # is still readable and gets written out instead of linked
+    with stage('cache_write'):
+        processed_cache.put(key, dataset.table, {'summary_row': summary_row, 'columns': columns, 'column_types': column_types},
+                            data_path=data_path)
+
+
+def replace_with_delta(base_dataset_id, table, df, key_column):
+    """
+    Diff the uploaded version against the stored one and publish it with the summaries that are still
+    valid. Returns (dataset, summary_row, columns, column_types, changes, reused columns); raises
+    VersionConflict if the stored version changed while it was being diffed.
+    """
+    base = registry.get(base_dataset_id)
+    if base is None:
+        raise ValueError(f"Dataset '{base_dataset_id}' no longer exists")
+
+    # Compare both versions as they are stored, so parsing differences don't show up as changes
+    old_df, new_df = base.table.to_pandas(), table.to_pandas()
+    if key_column is not None and (key_column not in old_df.columns or key_column not in new_df.columns):
+        raise ValueError(f"Key column '{key_column}' is not in both versions")
+    column_changes = diff_columns(old_df, new_df)
+    changes = {'columns': column_changes, 'rows': diff_rows(old_df, new_df, key_column)}
+
+    # Publish the new data straight away with the summaries that are still valid
+    reused = [col for col in column_changes['unchanged'] if col in base.column_types and col in base.summary_row]
+    column_types = {col: base.column_types[col] for col in df.columns if col in base.column_types and col not in column_changes['added']}
+    summary_row = {col: base.summary_row[col] if col in reused else {'summary': "", 'chart_options': {}} for col in df.columns}
+    columns = column_definitions(df.columns)
+    dataset = registry.replace_table(base_dataset_id, table, summary_row, {}, columns=columns, column_types=column_types,
+                                     expected_version=base.version)
+    if dataset is None:
+        raise ValueError(f"Dataset '{base_dataset_id}' no longer exists")
+    return dataset, summary_row, columns, column_types, changes, reused
+
+
+def process_delta_upload(job, file_path, filename, key, read_options, base_dataset_id, key_column):
+    """
+    Background job for a new version of an existing dataset. Rows and columns are diffed against
+    the stored version; unchanged columns keep their type and summary, changed columns keep their
+    type and are re-summarized, and only new columns are classified.
+    """
+    jobs.update(job, stage='ingest')
+    try:
+        with stage('read'):
+            table, df = read_upload(file_path, filename, **read_options)
+    finally:
+        os.remove(file_path)
+
+    jobs.update(job, stage='diff')
+    # The diff is made outside any lock and only published if the base version is still current;
+    # if an edit or another worker publishes a version first, the diff is made again against that one
+    # so no change is lost unseen
+    while True:
+        try:
+            dataset, summary_row, columns, column_types, changes, reused = replace_with_delta(base_dataset_id, table, df, key_column)
+            break
+        except VersionConflict:
+            continue
+    jobs.update(job, dataset_id=base_dataset_id, stage='classify', changes=changes,
+                columns={col: 'summarized' if col in reused else 'pending' for col in df.columns})
+
+    # Only columns without a stored type are sent to the LLM
+    schema = table.schema if filename.endswith(COLUMNAR_EXTENSIONS) else None
+    summary_row.update(classify_and_summarize(
+        job, dataset, [col for col in df.columns if col not in reused], column_types,
+        classify=lambda column_name: classify_column(df, column_name, schema),
+        summarize=lambda column_name, column_type: summarize_column(df, column_name, column_type),
+        summarize_current=summarize_table_column
+    ))
+
+    with stage('cache_write'):
+        processed_cache.put(key, table, {'summary_row': summary_row, 'columns': columns, 'column_types': column_types})
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    start_request_timings()
+    # One profiled request at a time, cProfile can't profile two threads at once
+    if PROFILE_DIR and request.args.get('profile') == '1' and profiler_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def finish_request_metrics(response):
+    """Record the request's latency and report its stage timings in a Server-Timing header."""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        profiler_lock.release()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        dump_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}-{uuid.uuid4().hex[:8]}.prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, dump_name))
+        response.headers['X-Profile-Dump'] = dump_name
+
+    elapsed = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else None
+    if route in LATENCY_ROUTES:
+        REQUEST_SECONDS.observe(elapsed, route)
+        REQUESTS.inc(route, response.status_code)
+    response.headers['Server-Timing'] = server_timing(finish_request_timings() + [('total', elapsed)])
+    # Lets the frontend's devtools show the timings of cross-origin requests
+    response.headers['Timing-Allow-Origin'] = FRONTEND_ORIGIN
+    return response
+
+
+@app.teardown_request
+def stop_profiler(error=None):
+    # A request that raised skips after_request, stop its profiler without a dump
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        profiler_lock.release()
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global global_data, global_columns
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
 
@@ -132,126 +624,567 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
-    # Save the uploaded file
-    file_path = os.path.join(os.getcwd(), file.filename)
-    file.save(file_path)
-
-    # Read the file into a DataFrame
-    if file.filename.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    elif file.filename.endswith(('.xls', '.xlsx')):
-        df = pd.read_excel(file_path)
-    else:
+    if not file.filename.endswith(('.csv',) + EXCEL_EXTENSIONS + COLUMNAR_EXTENSIONS):
         return jsonify({'error': 'Unsupported file type'}), 400
 
-    # Initialize an empty dictionary to store the column types
-    column_types = {}
+    # Which part of the file to read: columns=a,b of a Parquet/Feather/Arrow file, sheet=<name> and range=B2:F100 of a workbook
+    read_options = {
+        'columns': [col.strip() for col in request.form.get('columns', '').split(',') if col.strip()] or None,
+        'sheet': request.form.get('sheet') or None,
+        'cell_range': request.form.get('range') or None,
+    }
+    read_options = {name: value for name, value in read_options.items() if value is not None}
 
-    # Iterate through each column and generate a prompt for the LLM
-    for column_name in df.columns:
-        column_data_sample = df[column_name].dropna().head(5).to_list()
-        column_data_sample_str = '\n'.join([f"{i+1}. \"{str(value)}\"" for i, value in enumerate(column_data_sample)])
-        system_prompt, user_prompt = generate_prompt(column_name, column_data_sample_str)
-        
-        # Send the prompt to the OpenAI model
-        response = client.chat.completions.create(
-            model="gpt-35-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-        )
+    # A new version of an existing dataset, see process_delta_upload
+    base_dataset_id = request.form.get('base_dataset_id')
+    if base_dataset_id and registry.get(base_dataset_id) is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': base_dataset_id}), 404
 
-        identified_type = response.choices[0].message.content.strip()
+    # Save the uploaded file under a unique name for the background job, hashing it on the way
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}-{secure_filename(file.filename)}")
+    content_hash = hashlib.sha256()
+    with stage('save'), open(file_path, 'wb') as f:
+        for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_BYTES), b''):
+            content_hash.update(chunk)
+            f.write(chunk)
+    error = check_read_options(file_path, file.filename, read_options)
+    if error:
+        os.remove(file_path)
+        return jsonify(error), 400
 
-        valid_types = [
-            "Date/Time", "Numeric", "Categorical", "Text", "Identifiers", "Financial", "Geospatial", "Boolean", "Binary",
-            "Contact Information", "Aggregated/Mixed Data", "Special Symbols", "Ratings/Scoring", "Duration", 
-            "Survey/Feedback", "File References", "Miscellaneous", "Names"
-        ]
-        if identified_type in valid_types:
-            column_types[column_name] = identified_type
+    out_of_core = not base_dataset_id and (
+        request.form.get('storage') == 'out_of_core' or os.path.getsize(file_path) > OUT_OF_CORE_THRESHOLD_BYTES
+    )
+    key = cache_key(content_hash.hexdigest(), extension=os.path.splitext(file.filename)[1].lower(),
+                    out_of_core=out_of_core, **read_options)
+
+    if base_dataset_id:
+        job = jobs.submit(file.filename, process_delta_upload, file_path, file.filename, key, read_options,
+                          base_dataset_id, request.form.get('key_column') or None)
+        return jsonify(job.snapshot()), 202
+
+    # The same file has been processed before, register the cached result without reading the file
+    with stage('cache_read'):
+        cached = processed_cache.get(key)
+    CACHE_LOOKUPS.inc('processed', 'hit' if cached else 'miss')
+    if cached:
+        os.remove(file_path)
+        table, meta = cached
+        arrow_path = registry.store.temp_path()
+        if out_of_core and processed_cache.link_data(key, arrow_path):
+            # Too large to hold in memory, serve it memory-mapped from the store
+            dataset = registry.add_arrow_file(arrow_path, meta['summary_row'], meta['columns'], meta['column_types'])
         else:
-            if "id" in column_name.lower():
-                column_types[column_name] = "Identifiers"
-            elif any(x in column_name.lower() for x in ["date", "time", "year", "month", "day"]):
-                column_types[column_name] = "Date/Time"
-            elif any(x in column_name.lower() for x in ["amount", "price", "cost", "revenue"]):
-                column_types[column_name] = "Financial"
-            elif any(x in column_name.lower() for x in ["email", "phone", "address"]):
-                column_types[column_name] = "Contact Information"
-            elif any(x in column_name.lower() for x in ["lat", "long", "geo", "address"]):
-                column_types[column_name] = "Geospatial"
-            elif any(x in column_name.lower() for x in ["score", "rating"]):
-                column_types[column_name] = "Ratings/Scoring"
+            dataset = registry.add_table(table, meta['summary_row'], meta['columns'], meta['column_types'])
+        job = jobs.add_finished(file.filename, dataset_id=dataset.dataset_id, columns={col: 'summarized' for col in meta['summary_row']})
+        return jsonify({**job.snapshot(), 'cached': True})
+
+    job = jobs.submit(file.filename, process_out_of_core_upload if out_of_core else process_upload,
+                      file_path, file.filename, key, read_options)
+    return jsonify(job.snapshot()), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    snapshot = jobs.get(job_id)
+    if snapshot is None:
+        return jsonify({'error': 'Unknown job', 'jobId': job_id}), 404
+    return jsonify(snapshot)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=json_default)}\n\n"
+
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """
+    Server-Sent Events for an upload job: 'progress' on every change, 'summary' with each
+    column's summary and chart options as soon as it is ready, then 'done' or 'error'.
+    """
+    snapshot = jobs.get(job_id)
+    if snapshot is None:
+        return jsonify({'error': 'Unknown job', 'jobId': job_id}), 404
+
+    def generate():
+        current = snapshot
+        sent = set()
+        yield sse_event('progress', current)
+        while True:
+            finished = [col for col, status in current['columns'].items() if status in ('summarized', 'error') and col not in sent]
+            dataset = registry.get(current['datasetId']) if finished else None
+            for column_name in finished:
+                sent.add(column_name)
+                yield sse_event('summary', {
+                    'column': column_name,
+                    'columnType': dataset.column_types.get(column_name),
+                    **dataset.summary_row.get(column_name, {})
+                })
+
+            if current['stage'] in ('done', 'error'):
+                yield sse_event(current['stage'], current)
+                return
+
+            latest = jobs.wait_for_change(job_id, current['revision'], timeout=SSE_KEEPALIVE_SECONDS)
+            if latest is None:
+                return
+            if latest['revision'] == current['revision']:
+                # Comment line to keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            current = latest
+            yield sse_event('progress', current)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def to_arrow_values(values, data_type):
+    """Arrow array of the column's type from values sent as JSON, where dates and durations arrive as strings."""
+    if pa.types.is_dictionary(data_type):
+        return pc.cast(to_arrow_values(values, data_type.value_type), data_type)
+    if pa.types.is_timestamp(data_type) or pa.types.is_date(data_type):
+        values = pd.to_datetime(pd.Series(values, dtype=object), format='mixed')
+        if pa.types.is_date(data_type):
+            values = values.dt.date
+    elif pa.types.is_duration(data_type):
+        values = pd.to_timedelta(pd.Series(values, dtype=object))
+    elif pa.types.is_integer(data_type) or pa.types.is_floating(data_type):
+        # A checked cast, so 2.5 isn't truncated into an integer column and 300 doesn't wrap around in an int8 one
+        return pc.cast(pa.array(values), data_type)
+    elif pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        # JSON numbers and booleans sent to a text column are stored as text, like read_csv reads them
+        values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+    return pa.array(values, type=data_type, from_pandas=True)
+
+
+def to_column_values(values, data_type):
+    """
+    to_arrow_values for an edit of a column stored in a compact type, returning (array, type).
+    When the values don't fit, small integers are widened to int64 and then float64, float32 to float64
+    and dictionaries with small indexes to int32 indexes.
+    """
+    candidates = [data_type]
+    if pa.types.is_integer(data_type):
+        candidates += [pa.int64(), pa.float64()]
+    elif pa.types.is_floating(data_type):
+        candidates.append(pa.float64())
+    elif pa.types.is_dictionary(data_type):
+        candidates.append(pa.dictionary(pa.int32(), data_type.value_type))
+    for candidate in dict.fromkeys(candidates):
+        try:
+            array = to_arrow_values(values, candidate)
+            # Casts to float32 round without raising, a value it can't hold exactly widens the column
+            if candidate == pa.float32() and not pc.all(pc.equal(pc.cast(array, pa.float64()), pc.cast(pa.array(values), pa.float64()))).as_py():
+                raise pa.ArrowInvalid(f"Values don't fit {candidate} exactly")
+            return array, candidate
+        except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError) as e:
+            error = e
+    raise error
+
+
+def fits_dictionary(data_type, values):
+    """Whether the dictionary type's indexes can address every distinct value."""
+    return len(pc.unique(values)) <= np.iinfo(data_type.index_type.to_pandas_dtype()).max + 1
+
+
+def set_rows(column, rows, new_values, value_type):
+    """
+    Set the values at the sorted row indexes, rewriting only the chunks that hold one of them
+    so that an edit to a large or memory-mapped column doesn't copy the whole column.
+    Returns the edited column and its type.
+    """
+    dense_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+    column_type = column.type if value_type == dense_type else value_type
+    rows = np.asarray(rows)
+    chunks, offset, done = [], 0, 0
+    for chunk in column.chunks:
+        count = int(np.searchsorted(rows, offset + len(chunk))) - done
+        if count:
+            mask = np.zeros(len(chunk), dtype=bool)
+            mask[rows[done:done + count] - offset] = True
+            # replace_with_mask has no dictionary kernel, edit the decoded values and encode them again
+            chunk = pc.replace_with_mask(pc.cast(chunk, value_type), pa.array(mask), new_values.slice(done, count))
+            if pa.types.is_dictionary(column_type):
+                chunk = pc.dictionary_encode(chunk)
+            done += count
+        chunks.append(chunk)
+        offset += len(chunk)
+    if pa.types.is_dictionary(column_type) and not fits_dictionary(column_type, pa.concat_arrays([chunk.dictionary for chunk in chunks])):
+        column_type = pa.dictionary(pa.int32(), column_type.value_type)
+    return pa.chunked_array([chunk if chunk.type == column_type else pc.cast(chunk, column_type) for chunk in chunks], type=column_type), column_type
+
+
+def update_summaries(dataset, table, changes):
+    """
+    Bring the summary row up to date after an edit without re-summarizing the dataset.
+    changes maps each changed column to its (removed values, added values).
+    """
+    summary_row = dict(dataset.summary_row)
+    states = dict(dataset.summary_states)
+    # Handlers without an incremental form see a sample of a memory-mapped column, as at upload
+    sample_rows = OUT_OF_CORE_SAMPLE_ROWS if dataset.memory_mapped else None
+    for column_name, (removed, added) in changes.items():
+        column_type = dataset.column_types.get(column_name)
+        if column_type not in column_type_handlers:
+            continue
+        try:
+            if column_name not in states:
+                # First change to this column: build its state from the data before the change,
+                # one chunk at a time so a memory-mapped column isn't copied into memory whole
+                states[column_name] = build_summary_state_from_chunks(
+                    column_name, column_type, lambda: iter_column_chunks(dataset.table, column_name),
+                    column_type_handlers[column_type], incremental=column_type_handlers.is_builtin(column_type),
+                    sample_rows=sample_rows
+                )
             else:
-                column_types[column_name] = "Miscellaneous"
-
-    # Prepare the JSON response with summaries
-    summary = {}
-    for column_name, column_type in column_types.items():
-        handler_function = column_type_handlers.get(column_type)
-        if handler_function:
-            try:
-                # Execute the summary function
-                result = handler_function(df, column_name)
-
-                # Add formatted summary text and chart options together
-                summary[column_name] = {
-                    'summary_text': ', '.join([f"{key}: {value}" for key, value in result.items() if key != 'chart_options']),
-                    'chart_options': result.get('chart_options', {})
-                }
-            except Exception as e:
-                summary[column_name] = {
-                    'summary_text': f"Error processing column '{column_name}': {str(e)}",
-                    'chart_options': {}
-                }
-
-    # Insert the formatted summary and chart options into the first row
-    summary_row = {}
-    for col in df.columns:
-        summary_row[col] = {
-            'summary': summary.get(col, {}).get('summary_text', ""),
-            'chart_options': summary.get(col, {}).get('chart_options', {})
-        }
-
-    # Serialize DataFrame data
-    data_rows = convert_to_serializable(df.to_dict(orient='records'))
-
-    # Combine the summary_row with the rest of the data
-    global_data = [summary_row] + data_rows
-    global_columns = [{'headerName': col, 'field': col, 'sortable': True, 'filter': True, 'editable': True} for col in df.columns]
-
-    # Return paginated data
-    return get_paginated_data(1)
+                # The state belongs to the published version too, an edit that gets rejected must leave it as it was
+                states[column_name] = copy.deepcopy(states[column_name])
+            states[column_name].update(removed, added)
+            summary_row[column_name] = format_summary(states[column_name].result(lambda: iter_column_chunks(table, column_name)))
+        except Exception as e:
+            states.pop(column_name, None)
+            summary_row[column_name] = error_cell(column_name, e)
+    return summary_row, states
+
+
+def version_conflict(dataset):
+    # Another request or worker process published a version while the change was being made, the client applies it again
+    return jsonify({
+        'error': 'Version conflict', 'datasetId': dataset.dataset_id, 'version': dataset.version,
+        'message': 'The dataset was changed by another request, reload it and retry'
+    }), 409
+
+
+@app.route('/cells', methods=['PATCH'])
+def patch_cells():
+    """
+    Edit cells: {"dataset_id": ..., "edits": [{"row": <data row index>, "column": ..., "value": ...}]}.
+    Row indexes count data rows from 0, not including the summary row.
+    """
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    edits = body.get('edits') or []
+    if not isinstance(edits, list) or not all(isinstance(edit, dict) for edit in edits):
+        return jsonify({'error': 'Invalid edits', 'message': 'edits must be a list of {"row", "column", "value"} objects'}), 400
+    dataset = registry.get(body.get('dataset_id'))
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': body.get('dataset_id')}), 404
+
+    # Last edit wins when a batch edits the same cell twice
+    cells = {}
+    for edit in edits:
+        row, column_name = edit.get('row'), edit.get('column')
+        if column_name not in dataset.table.column_names:
+            return jsonify({'error': 'Unknown column', 'column': column_name}), 400
+        # bool is a subclass of int, but true isn't a row index
+        if type(row) is not int or not 0 <= row < dataset.table.num_rows:
+            return jsonify({'error': 'Row out of range', 'row': row}), 400
+        cells.setdefault(column_name, {})[row] = edit.get('value')
+
+    table = dataset.table
+    changes = {}
+    for column_name, values in cells.items():
+        index = table.schema.get_field_index(column_name)
+        column = table.column(index)
+        rows = sorted(values)
+        dense_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        try:
+            new_values, value_type = to_column_values([values[row] for row in rows], dense_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError) as e:
+            return jsonify({'error': 'Invalid value', 'column': column_name, 'message': str(e)}), 400
+        changes[column_name] = (column.take(rows).to_pylist(), new_values.to_pylist())
+        edited, column_type = set_rows(column, rows, new_values, value_type)
+        table = table.set_column(index, pa.field(column_name, column_type), edited)
+
+    summary_row, states = update_summaries(dataset, table, changes)
+    try:
+        dataset = registry.replace_table(dataset.dataset_id, table, summary_row, states, expected_version=dataset.version,
+                                         keep_row_positions=True)
+    except VersionConflict:
+        return version_conflict(dataset)
+    if dataset is None:
+        # Deleted while the edit was being made
+        return jsonify({'error': 'Unknown dataset', 'datasetId': body.get('dataset_id')}), 404
 
+    return jsonify({
+        'datasetId': dataset.dataset_id,
+        'version': dataset.version,
+        'summary': {column_name: summary_row[column_name] for column_name in changes}
+    })
+
+
+@app.route('/rows', methods=['POST'])
+def append_rows():
+    """Append a batch of rows: {"dataset_id": ..., "rows": [{column: value, ...}, ...]}."""
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    new_rows = body.get('rows') or []
+    if not isinstance(new_rows, list) or not all(isinstance(row, dict) for row in new_rows):
+        return jsonify({'error': 'Invalid rows', 'message': 'rows must be a list of {column: value} objects'}), 400
+    dataset = registry.get(body.get('dataset_id'))
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': body.get('dataset_id')}), 404
+    table, arrays = dataset.table, []
+    try:
+        for index, field in enumerate(table.schema):
+            array, value_type = to_column_values([row.get(field.name) for row in new_rows], field.type)
+            if pa.types.is_dictionary(value_type):
+                dictionaries = [chunk.dictionary for chunk in table.column(index).chunks] + [array.dictionary]
+                if not fits_dictionary(value_type, pa.concat_arrays(dictionaries)):
+                    value_type = pa.dictionary(pa.int32(), value_type.value_type)
+                    array = pc.cast(array, value_type)
+            if value_type != field.type:
+                # The new values don't fit the column's compact type
+                table = table.set_column(index, pa.field(field.name, value_type), pc.cast(table.column(index), value_type))
+            arrays.append(array)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid rows', 'message': str(e)}), 400
+
+    # Appending only adds chunks, the existing data isn't copied
+    appended = pa.Table.from_arrays(arrays, schema=table.schema)
+    table = pa.concat_tables([table, appended])
+    changes = {column_name: ([], appended.column(column_name).to_pylist()) for column_name in table.column_names}
+    summary_row, states = update_summaries(dataset, table, changes)
+    try:
+        dataset = registry.replace_table(dataset.dataset_id, table, summary_row, states, expected_version=dataset.version)
+    except VersionConflict:
+        return version_conflict(dataset)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': body.get('dataset_id')}), 404
+
+    return jsonify({
+        'datasetId': dataset.dataset_id,
+        'version': dataset.version,
+        'totalRows': dataset.table.num_rows,
+        'summary': summary_row
+    })
+
+
+def requested_columns(dataset):
+    """The columns=a,b,c request argument as a list, or None for all columns. Raises KeyError for unknown columns."""
+    columns = [col.strip() for col in request.args.get('columns', '').split(',') if col.strip()]
+    if not columns:
+        return None
+    dataset.check_columns(columns)
+    return columns
+
+
+def with_column_definitions(dataset, response):
+    # Column definitions are left out when the client says it already has the current ones
+    # (columns_version=<version>); summary and data changes don't change them
+    response['columnsVersion'] = dataset.columns_version
+    if request.args.get('columns_version') != str(dataset.columns_version):
+        response['columns'] = dataset.columns
+    return response
+
+
+@app.route('/columns', methods=['GET'])
+def get_columns():
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+    return jsonify({'datasetId': dataset.dataset_id, 'columnsVersion': dataset.columns_version, 'columns': dataset.columns})
+
+
+class StaleCursor(Exception):
+    pass
+
+
+def requested_window(page=None):
+    """
+    The [startRow, endRow) window of data rows asked for: startRow/endRow (ag-Grid's infinite row model),
+    or page and page_size. Windows are cut to MAX_WINDOW_ROWS rows. Raises ValueError for malformed windows.
+    """
+    if 'startRow' in request.args or 'endRow' in request.args:
+        start = int(request.args.get('startRow', 0))
+        end = int(request.args.get('endRow', start + DEFAULT_PAGE_ROWS))
+    else:
+        page_size = int(request.args.get('page_size', DEFAULT_PAGE_ROWS))
+        page = page or int(request.args.get('page', 1))
+        if page < 1 or page_size < 1:
+            raise ValueError('page and page_size must be positive')
+        start = (page - 1) * page_size
+        end = start + page_size
+    if start < 0 or end <= start:
+        raise ValueError('startRow must be non-negative and below endRow')
+    return start, min(end, start + MAX_WINDOW_ROWS)
+
+
+def requested_cursor(dataset, query):
+    """
+    Row the cursor argument continues from, or None without one. A cursor holds a row position,
+    so it stays valid through cell edits and summary updates; raises StaleCursor once rows were
+    appended or the table was replaced and InvalidCursor for a cursor of another query or one
+    that doesn't decode.
+    """
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return None
+    version, cursor_query, row = decode_cursor(cursor)
+    if cursor_query != query:
+        raise InvalidCursor(cursor)
+    if version != dataset.rows_version:
+        raise StaleCursor(cursor)
+    return row
+
+
+def request_etag(dataset):
+    """Strong ETag of a read request: the dataset version plus a hash of the path and the request arguments."""
+    params = json.dumps([request.path, sorted(request.args.items(multi=True))])
+    return f"{dataset.dataset_id}-{dataset.version}-{hashlib.sha256(params.encode()).hexdigest()[:32]}"
+
+
+def cached_response(dataset, build):
+    """
+    JSON response of build() with an ETag. A client that already has this version of the response
+    gets 304 Not Modified, and a body serialized recently is served from the response cache.
+    """
+    etag = request_etag(dataset)
+    if request.if_none_match.contains(etag):
+        CACHE_LOOKUPS.inc('response', 'not_modified')
+        response = Response(status=304)
+    else:
+        body = response_cache.get(etag)
+        CACHE_LOOKUPS.inc('response', 'miss' if body is None else 'hit')
+        if body is None:
+            window = build()
+            with stage('serialize'):
+                body = app.json.dumps(window).encode()
+            response_cache.put(etag, body)
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Cached copies are revalidated on every use, which costs a 304 while the dataset is unchanged
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def window_error(e):
+    if isinstance(e, KeyError):
+        return jsonify({'error': 'Unknown column', 'column': e.args[0]}), 400
+    if isinstance(e, StaleCursor):
+        return jsonify({'error': 'Stale cursor', 'message': 'Rows were added or replaced, restart from the first window'}), 409
+    if isinstance(e, InvalidCursor):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({'error': 'Invalid window', 'message': str(e)}), 400
 
 
 @app.route('/data', methods=['GET'])
-def get_paginated_data(page=1):
-    global global_data, global_columns
+def get_paginated_data(page=None):
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+    try:
+        columns = requested_columns(dataset)
+        start, end = requested_window(page)
+        # A cursor holds the next data row; the window keeps the requested size
+        cursor_row = requested_cursor(dataset, '')
+        if cursor_row is not None:
+            start, end = cursor_row, cursor_row + (end - start)
+    except (KeyError, ValueError, StaleCursor) as e:
+        return window_error(e)
 
-    rows_per_page = 20
-    start = (page - 1) * rows_per_page
-    end = start + rows_per_page
+    def build():
+        _, rows = dataset.project(None, dataset.table.slice(start, end - start), columns)
+        last_row = dataset.table.num_rows
+        window_end = start + rows.num_rows
+        return with_column_definitions(dataset, {
+            'datasetId': dataset.dataset_id,
+            'data': convert_to_serializable(rows.to_pandas()),
+            'startRow': start,
+            'endRow': window_end,
+            'lastRow': last_row,
+            'nextCursor': encode_cursor(dataset.rows_version, '', window_end) if window_end < last_row else None,
+            'page': start // (end - start) + 1,
+            'totalPages': max(math.ceil(last_row / (end - start)), 1)
+        })
 
-    paginated_data = global_data[start:end]
-    total_pages = math.ceil(len(global_data) / rows_per_page)
+    return cached_response(dataset, build)
 
-    response = {
-        'columns': global_columns,
-        'data': paginated_data,
-        'page': page,
-        'totalPages': total_pages
-    }
 
-    return jsonify(response)
+@app.route('/summary', methods=['GET'])
+def get_summary():
+    """The summary row, served apart from the data rows; the grid shows it above the first page."""
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+    try:
+        columns = requested_columns(dataset)
+    except KeyError as e:
+        return window_error(e)
+
+    def build():
+        summary_row, _ = dataset.project(dataset.summary_row, dataset.table.schema.empty_table(), columns)
+        return {'datasetId': dataset.dataset_id, 'version': dataset.version, 'summary': summary_row}
+
+    return cached_response(dataset, build)
 
 
 @app.route('/data/<int:page>', methods=['GET'])
 def get_page(page):
     return get_paginated_data(page)
 
+@app.route('/datasets/<dataset_id>', methods=['DELETE'])
+def delete_dataset(dataset_id):
+    """Delete every version of a dataset, from memory and from the store."""
+    if not registry.delete(dataset_id):
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+    return '', 204
+
+
+@app.route('/memory', methods=['GET'])
+def get_memory():
+    """Storage size of each column of a dataset, and of all datasets held in memory."""
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+    return jsonify(registry.memory_report(dataset))
+
+
+@app.route('/export', methods=['GET'])
+def export_data():
+    """
+    Download the grid's current view, streamed as it is written.
+
+    query is the search box text, filters and sort are ag-Grid's filter model and sort model
+    as JSON, columns the visible columns (comma separated). format is csv, jsonl or parquet;
+    compression=gzip gzips CSV/JSONL, for Parquet it names the page codec (snappy by default).
+    """
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+
+    export_format = request.args.get('format', 'csv')
+    compression = request.args.get('compression') or None
+    columns = request.args.get('columns')
+    try:
+        filter_model = json.loads(request.args.get('filters') or '{}')
+        sort_model = json.loads(request.args.get('sort') or '[]')
+    except json.JSONDecodeError as e:
+        return jsonify({'error': 'Invalid filters or sort', 'message': str(e)}), 400
+    try:
+        chunks = export_chunks(
+            dataset.table, export_format, compression,
+            query=request.args.get('query', ''), filter_model=filter_model, sort_model=sort_model,
+            columns=columns.split(',') if columns else None
+        )
+    except (ExportError, pa.ArrowException) as e:
+        return jsonify({'error': 'Invalid export request', 'message': str(e)}), 400
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"{dataset.dataset_id}.{extension}" + ('.gz' if compression == 'gzip' and export_format != 'parquet' else '')
+    return Response(
+        stream_with_context(chunks), mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @app.route('/images/<filename>', methods=['GET'])
 def get_image(filename):
     file_path = os.path.join('images', filename)
@@ -263,24 +1196,58 @@ def get_image(filename):
 # Search 
 @app.route('/search', methods=['GET'])
 def search_data():
+    dataset_id = request.args.get('dataset_id')
+    dataset = registry.get(dataset_id)
+    if dataset is None:
+        return jsonify({'error': 'Unknown dataset', 'datasetId': dataset_id}), 404
+
     query = request.args.get('query', '')
+    try:
+        columns = requested_columns(dataset)
+        start, end = requested_window()
+        # A search cursor holds the table row after the last match served, so the next window
+        # scans on from there instead of from the top
+        cursor_row = requested_cursor(dataset, query)
+    except (KeyError, ValueError, StaleCursor) as e:
+        return window_error(e)
+    if cursor_row is not None and not query:
+        # Without a query the cursor holds the next data row, like on /data
+        start, end, cursor_row = cursor_row, cursor_row + (end - start), None
 
-    if query:
-        filtered_data = [row for row in global_data if any(query.lower() in str(value).lower() for value in row.values())]
-    else:
-        filtered_data = global_data
+    def build():
+        if cursor_row is not None:
+            with stage('search'):
+                rows, _, next_row = dataset.scan(query, from_row=cursor_row, limit=end - start, count_all=False)
+            _, rows = dataset.project(None, rows, columns)
+            # The scan stops once the window is full, so how many matches are left isn't known
+            return with_column_definitions(dataset, {
+                'datasetId': dataset.dataset_id,
+                'data': convert_to_serializable(rows.to_pandas()),
+                'nextCursor': encode_cursor(dataset.rows_version, query, next_row) if next_row is not None else None
+            })
 
-    rows_per_page = 20
-    total_pages = math.ceil(len(filtered_data) / rows_per_page)
+        if query:
+            with stage('search'):
+                rows, last_row, next_row = dataset.scan(query, skip=start, limit=end - start)
+        else:
+            rows = dataset.table.slice(start, end - start)
+            last_row = dataset.table.num_rows
+            next_row = end if end < last_row else None
+        _, rows = dataset.project(None, rows, columns)
 
-    response = {
-        'columns': global_columns,
-        'data': filtered_data[:rows_per_page],
-        'page': 1,
-        'totalPages': total_pages
-    }
+        return with_column_definitions(dataset, {
+            'datasetId': dataset.dataset_id,
+            'data': convert_to_serializable(rows.to_pandas()),
+            'startRow': start,
+            'endRow': start + rows.num_rows,
+            'lastRow': last_row,
+            'nextCursor': encode_cursor(dataset.rows_version, query, next_row) if next_row is not None else None,
+            'page': start // (end - start) + 1,
+            'totalPages': max(math.ceil(last_row / (end - start)), 1)
+        })
+
+    return cached_response(dataset, build)
 
-    return jsonify(response)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1 @@
+"""Benchmarks for the backend. Run from the backend directory: python -m benchmarks.run --help"""
@@ -0,0 +1,38 @@
+"""
+Offline stand-in for the Azure OpenAI client used by classify_column. It answers every prompt
+with the column type the synthetic generator used for the column named in the prompt, so runs
+need no network or credentials and always classify the same way.
+"""
+import re
+import time
+from types import SimpleNamespace
+
+COLUMN_NAME_PATTERN = re.compile(r"from the column '(.*?)'")
+
+
+class _Completions:
+    def __init__(self, column_types, latency):
+        self.column_types = column_types
+        self.latency = latency
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.latency:
+            # Stands in for the round trip to the real API
+            time.sleep(self.latency)
+        match = COLUMN_NAME_PATTERN.search(messages[-1]['content'])
+        column_type = self.column_types.get(match.group(1) if match else None, "Miscellaneous")
+        message = SimpleNamespace(role='assistant', content=column_type)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')])
+
+
+class FakeLLMClient:
+    """Same call shape as AzureOpenAI: client.chat.completions.create(model=..., messages=[...])."""
+
+    def __init__(self, column_types, latency=0.0):
+        self.chat = SimpleNamespace(completions=_Completions(column_types, latency))
+
+    @property
+    def calls(self):
+        return self.chat.completions.calls
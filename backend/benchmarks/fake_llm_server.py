@@ -0,0 +1,81 @@
+"""
+Local OpenAI-compatible server answering chat completions like the offline LLM stub: with the
+type of the synthetic column named in the prompt. Point app_v2 at it with LLM_API_BASE:
+
+    python -m benchmarks.fake_llm_server --port 8001 --latency 0.5
+    LLM_API_BASE=http://127.0.0.1:8001/ flask --app app_v2 run
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fake_llm import COLUMN_NAME_PATTERN
+from benchmarks.synthetic import column_type_of
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        # Azure clients post to /openai/deployments/<name>/chat/completions, OpenAI clients to /v1/chat/completions
+        if not self.path.split('?')[0].endswith('/chat/completions'):
+            self._respond(404, {'error': {'message': f"Unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        match = COLUMN_NAME_PATTERN.search(request.get('messages', [{}])[-1].get('content', ''))
+        column_type = (column_type_of(match.group(1)) if match else None) or "Miscellaneous"
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.calls += 1
+        self._respond(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': column_type}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 1, 'total_tokens': 1},
+        })
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_llm_server(port=0, latency=0.0):
+    """Serve in a background thread; returns (server, base URL). Port 0 picks a free port."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.calls = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before answering (default 0)')
+    args = parser.parse_args()
+    server, base_url = start_fake_llm_server(args.port, args.latency)
+    print(f"Fake LLM server on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Startup check: how long a fresh interpreter takes to import app_v2, and that modules only needed
+later (the LLM client, summarizer plugins) are not imported at startup. Run from the backend directory:
+
+    python -m benchmarks.import_budget --budget-ms 800
+
+Each run imports app_v2 in a new process under `python -X importtime`; the fastest of --repeat
+runs is compared with the budget. Exits with status 1 when the budget is exceeded or a deferred
+module was imported, and lists the slowest top-level imports either way.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use only; loading one of these at startup is a regression
+DEFERRED_MODULES = ['openai', 'matplotlib', 'seaborn', 'functions_v2']
+
+
+def import_times(module, env):
+    """Import module in a fresh interpreter; returns {imported module: (self us, cumulative us)}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Indentation gives the nesting; only the first import of a module is reported
+        times.setdefault(name.strip(), (int(self_us), int(cumulative_us), len(name) - len(name.lstrip())))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app_v2', help='module to import (default app_v2)')
+    parser.add_argument('--budget-ms', type=float, default=800, help='import time allowed in milliseconds (default 800)')
+    parser.add_argument('--repeat', type=int, default=5, help='imports to take the fastest of (default 5)')
+    parser.add_argument('--top', type=int, default=10, help='slowest top-level imports to list (default 10)')
+    args = parser.parse_args()
+
+    # Importing app_v2 creates its storage directories, so keep them out of the tree
+    scratch_dir = tempfile.mkdtemp(prefix='ag-grid-import-')
+    env = dict(os.environ)
+    for name, directory in (('DATASET_DIR', 'datasets'), ('UPLOAD_DIR', 'uploads'), ('PROCESSED_CACHE_DIR', 'cache')):
+        env.setdefault(name, os.path.join(scratch_dir, directory))
+
+    runs = [import_times(args.module, env) for _ in range(args.repeat)]
+    fastest = min(runs, key=lambda times: times[args.module][1])
+    total_ms = fastest[args.module][1] / 1000
+
+    print(f"import {args.module}: {total_ms:.0f} ms (fastest of {args.repeat}), budget {args.budget_ms:.0f} ms")
+    top_level = sorted(((cumulative, name) for name, (_, cumulative, depth) in fastest.items()
+                        if depth == 3 and name != args.module), reverse=True)
+    for cumulative, name in top_level[:args.top]:
+        print(f"  {name:30s} {cumulative / 1000:8.1f} ms")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.0f} ms, over the budget of {args.budget_ms:.0f} ms")
+    eager = [name for name in DEFERRED_MODULES if name in fastest]
+    if eager:
+        failures.append(f"imported at startup but should load on first use: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+Load test: many simulated analysts uploading, scrolling and searching at once against a running
+app_v2, with classification going to a local fake LLM server. Run from the backend directory:
+
+    python -m benchmarks.load_test --users 50 --duration 60
+    python -m benchmarks.load_test --server gunicorn --workers 4 --threads 8 --users 50
+
+Reports throughput and p50/p95/p99 latency per endpoint, the time from upload to readable data,
+and the mean time each endpoint spends in every stage reported by its Server-Timing header.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlparse
+
+from benchmarks.fake_llm_server import start_fake_llm_server
+from benchmarks.synthetic import CITIES, FIRST_NAMES, generate_csv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Words typed into the search box: common values, rare ones and ones that match nothing
+SEARCH_WORDS = CITIES + FIRST_NAMES + ['Category B', 'CUST-0000123', 'report_42', 'Very satisfied', 'nothing here']
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+class LoadStats:
+    """Latencies, errors and Server-Timing stage totals per endpoint, shared by all simulated users."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, elapsed, error=False, server_timing=None):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if error:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            for entry in (server_timing or '').split(','):
+                name, _, duration = entry.strip().partition(';dur=')
+                if duration:
+                    totals = self.stages.setdefault(endpoint, {})
+                    totals[name] = totals.get(name, 0.0) + float(duration)
+
+    def report(self, duration):
+        rows = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            rows[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors.get(endpoint, 0),
+                'throughput': len(latencies) / duration,
+                'p50_ms': percentile(latencies, 0.50) * 1000,
+                'p95_ms': percentile(latencies, 0.95) * 1000,
+                'p99_ms': percentile(latencies, 0.99) * 1000,
+                'max_ms': latencies[-1] * 1000,
+                'server_timing_mean_ms': {name: total / len(latencies) for name, total in self.stages.get(endpoint, {}).items()},
+            }
+        return rows
+
+
+class ApiClient:
+    """One keep-alive connection to the app, recording every request in the stats."""
+
+    def __init__(self, host, port, stats):
+        self.connection = http.client.HTTPConnection(host, port, timeout=300)
+        self.stats = stats
+
+    def request(self, method, path, endpoint, params=None, body=None, headers=None):
+        """Return (status, parsed JSON body or None). Failed connections count as errors with status None."""
+        url = path + ('?' + urlencode(params) if params else '')
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, url, body=body, headers=headers or {})
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.stats.record(endpoint, time.perf_counter() - started, error=True)
+            return None, None
+        # A stale cursor (409) is an expected answer the client recovers from
+        self.stats.record(endpoint, time.perf_counter() - started, error=response.status >= 400 and response.status != 409,
+                          server_timing=response.getheader('Server-Timing'))
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+def multipart_file(filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+class SimulatedUser:
+    """An analyst working on one dataset: scrolls it, searches it, and now and then uploads a new file."""
+
+    def __init__(self, index, api, dataset_id, args, uploads):
+        self.rng = random.Random(index)
+        self.api = api
+        self.dataset_id = dataset_id
+        self.args = args
+        self.uploads = uploads
+        self.columns_version = None
+        self.visible_columns = None
+
+    def _params(self, **params):
+        # Like the grid: only the visible columns, and column definitions only when they changed
+        params['dataset_id'] = self.dataset_id
+        if self.columns_version is not None:
+            params['columns_version'] = self.columns_version
+            params['columns'] = ','.join(self.visible_columns)
+        return params
+
+    def _remember_columns(self, body):
+        if body and body.get('columns'):
+            self.visible_columns = [column['field'] for column in body['columns'][:3]]
+        if body and 'columnsVersion' in body:
+            self.columns_version = body['columnsVersion']
+
+    def think(self, low, high):
+        time.sleep(self.rng.uniform(low, high))
+
+    def scroll(self):
+        page_rows = self.args.page_rows
+        self.api.request('GET', '/summary', '/summary', self._params())
+        page = 0
+        for _ in range(self.args.scroll_pages):
+            _, body = self.api.request('GET', '/data', '/data', self._params(startRow=page * page_rows, endRow=(page + 1) * page_rows))
+            self._remember_columns(body)
+            if not body or body.get('endRow', 0) >= body.get('lastRow', 0):
+                break
+            # Mostly forward, sometimes back to a page already seen
+            page = max(page - 1, 0) if self.rng.random() < 0.2 else page + 1
+            self.think(0.05, 0.3)
+
+    def search(self):
+        word = self.rng.choice(SEARCH_WORDS)
+        # Keystrokes come 80-250 ms apart; like the frontend, a query is only sent after a pause of the debounce time
+        for length in range(1, len(word) + 1):
+            gap = self.rng.uniform(0.08, 0.25)
+            if length == len(word) or gap >= self.args.debounce:
+                _, body = self.api.request('GET', '/search', '/search', self._params(query=word[:length], startRow=0, endRow=self.args.page_rows))
+                self._remember_columns(body)
+            time.sleep(gap)
+        # Page on through the results with the cursor
+        if body and body.get('nextCursor') and self.rng.random() < 0.5:
+            self.api.request('GET', '/search', '/search', self._params(query=word, cursor=body['nextCursor'], page_size=self.args.page_rows))
+
+    def upload(self):
+        filename, content = self.rng.choice(self.uploads)
+        body, headers = multipart_file(filename, content)
+        started = time.perf_counter()
+        status, job = self.api.request('POST', '/upload', '/upload', body=body, headers=headers)
+        if status not in (200, 202) or not job:
+            return
+        # Poll like the frontend until the rows can be read
+        while not job.get('dataReady') and job.get('stage') != 'error':
+            time.sleep(0.5)
+            status, job = self.api.request('GET', f"/jobs/{job['jobId']}", '/jobs/<id>')
+            if not job:
+                return
+        self.api.stats.record('upload -> data ready', time.perf_counter() - started, error=job.get('stage') == 'error')
+        if job.get('datasetId'):
+            self.dataset_id = job['datasetId']
+            self.columns_version = None
+
+    def run(self, deadline, weights):
+        scenarios = [self.upload, self.scroll, self.search]
+        while time.time() < deadline:
+            self.rng.choices(scenarios, weights)[0]()
+            self.think(0.2, 1.0)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(args, llm_base_url, scratch_dir):
+    """Start app_v2 under the chosen server in a subprocess; returns (process, host, port)."""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        'LLM_API_BASE': llm_base_url,
+        'DATASET_DIR': os.path.join(scratch_dir, 'datasets'),
+        'UPLOAD_DIR': os.path.join(scratch_dir, 'uploads'),
+        'PROCESSED_CACHE_DIR': os.path.join(scratch_dir, 'cache'),
+    })
+    # Identical uploads would otherwise be served from the processed-upload cache
+    env.setdefault('PROCESSED_CACHE_MAX_MB', '0')
+    if args.server == 'gunicorn':
+        # Worker processes only see each other's datasets and jobs in shared mode
+        if args.workers > 1:
+            env['SHARED_DATASETS'] = '1'
+        command = [sys.executable, '-m', 'gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+                   '--bind', f'127.0.0.1:{port}', '--timeout', '300', 'app_v2:app']
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'app_v2', 'run', '--port', str(port),
+                   '--with-threads' if args.threads > 1 else '--without-threads']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+                               stderr=None if args.verbose else subprocess.DEVNULL)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app server exited with status {process.returncode}: {' '.join(command)}")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/metrics')
+            if connection.getresponse().status == 200:
+                return process, '127.0.0.1', port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('The app server did not start within 60 seconds')
+
+
+def prepare_dataset(api, rows, seed):
+    """Upload the dataset every user starts with and wait until it is fully summarized."""
+    content, _ = generate_csv(rows, seed=seed)
+    body, headers = multipart_file('base.csv', content)
+    _, job = api.request('POST', '/upload', 'setup', body=body, headers=headers)
+    if not job or 'jobId' not in job:
+        raise RuntimeError(f"Setup upload failed: {job}")
+    while job['stage'] not in ('done', 'error'):
+        time.sleep(0.5)
+        _, job = api.request('GET', f"/jobs/{job['jobId']}", 'setup')
+    if job['stage'] == 'error':
+        raise RuntimeError(f"Setup upload failed: {job['error']}")
+    return job['datasetId']
+
+
+def print_report(report, duration, args):
+    print(f"\n{args.users} users for {duration:.0f}s against {args.server}"
+          + (f" ({args.workers} workers x {args.threads} threads)" if args.server == 'gunicorn' else ''))
+    print(f"{'endpoint':24s} {'requests':>9s} {'errors':>7s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for endpoint, row in report.items():
+        print(f"{endpoint:24s} {row['requests']:9d} {row['errors']:7d} {row['throughput']:8.1f} "
+              f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['max_ms']:9.1f}")
+    print('\nMean Server-Timing per request (ms):')
+    for endpoint, row in report.items():
+        stages = sorted(row['server_timing_mean_ms'].items(), key=lambda item: -item[1])
+        if stages:
+            print(f"{endpoint:24s} " + ', '.join(f"{name} {value:.1f}" for name, value in stages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50, help='simulated analysts (default 50)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds of traffic after ramp-up starts (default 60)')
+    parser.add_argument('--ramp-up', type=float, default=10, help='seconds over which users start (default 10)')
+    parser.add_argument('--mix', default='upload=1,scroll=6,search=3', help='relative weights of the scenarios (default upload=1,scroll=6,search=3)')
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn', 'external'], default='werkzeug',
+                        help="how to run app_v2: Flask's development server, gunicorn, or an already running server at --url")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='app URL with --server external')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes (default 4)')
+    parser.add_argument('--threads', type=int, default=8, help='threads per worker; 1 runs werkzeug single-threaded (default 8)')
+    parser.add_argument('--rows', type=int, default=100000, help='rows of the dataset all users start with (default 100000)')
+    parser.add_argument('--upload-rows', type=int, default=10000, help='rows of each uploaded file (default 10000)')
+    parser.add_argument('--upload-variants', type=int, default=4, help='different files to upload (default 4)')
+    parser.add_argument('--page-rows', type=int, default=100, help='rows per /data and /search window (default 100)')
+    parser.add_argument('--scroll-pages', type=int, default=20, help='windows fetched per scroll (default 20)')
+    parser.add_argument('--debounce', type=float, default=0.3, help='search debounce in seconds, 0 sends every keystroke (default 0.3)')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='seconds the fake LLM takes per call (default 0.2)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the report as JSON to this file')
+    parser.add_argument('--verbose', action='store_true', help="show the app server's log")
+    args = parser.parse_args()
+
+    weights = dict(item.split('=') for item in args.mix.split(','))
+    weights = [float(weights.get(name, 0)) for name in ('upload', 'scroll', 'search')]
+
+    llm_server, llm_base_url = start_fake_llm_server(latency=args.llm_latency)
+    process = None
+    try:
+        if args.server == 'external':
+            url = urlparse(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            process, host, port = start_app(args, llm_base_url, tempfile.mkdtemp(prefix='ag-grid-load-'))
+            print(f"app_v2 on http://{host}:{port}, fake LLM on {llm_base_url}")
+
+        stats = LoadStats()
+        dataset_id = prepare_dataset(ApiClient(host, port, LoadStats()), args.rows, args.seed)
+        uploads = [(f"upload-{variant}.csv", generate_csv(args.upload_rows, seed=args.seed + 1 + variant)[0])
+                   for variant in range(args.upload_variants)]
+
+        started = time.time()
+        deadline = started + args.duration
+        threads = []
+        for index in range(args.users):
+            user = SimulatedUser(index, ApiClient(host, port, stats), dataset_id, args, uploads)
+            thread = threading.Thread(target=user.run, args=(deadline, weights), daemon=True)
+            threads.append(thread)
+            thread.start()
+            time.sleep(args.ramp_up / max(args.users, 1))
+        for thread in threads:
+            # Scenarios in flight at the deadline are allowed to finish
+            thread.join()
+        duration = time.time() - started
+
+        report = stats.report(duration)
+        print_report(report, duration, args)
+        print(f"\nLLM calls answered: {llm_server.calls}")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'args': vars(args), 'duration': duration, 'endpoints': report}, f, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        llm_server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Benchmark suite: every summary handler, convert_to_serializable, uploads end to end, paging and
+search, on a synthetic dataset and with the offline LLM stub. Run from the backend directory:
+
+    python -m benchmarks.run --rows 100000 --columns 36
+
+Results are written as JSON to benchmarks/results/ and compared with the previous run there
+(or with --baseline), so a slower median shows up as a regression.
+"""
+import argparse
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def measure(function, repeat, warmup=1):
+    """Run function warmup + repeat times and return timing statistics in seconds of the timed runs."""
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return {'median': statistics.median(times), 'min': min(times), 'mean': statistics.fmean(times), 'runs': repeat}
+
+
+def load_app(scratch_dir):
+    """Import app_v2 with its storage in scratch_dir and the processed-upload cache off, so every upload is processed."""
+    os.environ.setdefault('DATASET_DIR', os.path.join(scratch_dir, 'datasets'))
+    os.environ.setdefault('UPLOAD_DIR', os.path.join(scratch_dir, 'uploads'))
+    os.environ.setdefault('PROCESSED_CACHE_DIR', os.path.join(scratch_dir, 'cache'))
+    os.environ.setdefault('PROCESSED_CACHE_MAX_MB', '0')
+    import app_v2
+    return app_v2
+
+
+def upload(client, csv_bytes, filename='synthetic.csv'):
+    """POST the file to /upload and wait for its job to finish, returning the job snapshot."""
+    job = client.post('/upload', data={'file': (io.BytesIO(csv_bytes), filename)}).get_json()
+    while job['stage'] not in ('done', 'error'):
+        time.sleep(0.005)
+        job = client.get(f"/jobs/{job['jobId']}").get_json()
+    if job['stage'] == 'error':
+        raise RuntimeError(f"Upload failed: {job['error']}")
+    return job
+
+
+def run_benchmarks(args):
+    from benchmarks.fake_llm import FakeLLMClient
+    from benchmarks.synthetic import COLUMN_GENERATORS, generate_dataset
+
+    df, column_types = generate_dataset(args.rows, args.columns, args.seed)
+    csv_bytes = df.to_csv(index=False).encode()
+    app_v2 = load_app(tempfile.mkdtemp(prefix='ag-grid-bench-'))
+    app_v2.client = FakeLLMClient(column_types, latency=args.llm_latency)
+    client = app_v2.app.test_client()
+    results = {}
+
+    def bench(name, function, repeat=args.repeat, warmup=1):
+        results[name] = measure(function, repeat, warmup)
+        print(f"{name:40s} {results[name]['median'] * 1000:10.2f} ms", file=sys.stderr)
+
+    # Summary handlers, one column of each type. Handlers may modify the frame, so each run gets a copy.
+    for column_type, column_name, _ in COLUMN_GENERATORS[:args.columns]:
+        handler = app_v2.column_type_handlers[column_type]
+        frame = df[[column_name]]
+        bench(f"summarize/{column_type}", lambda: handler(frame.copy(), column_name))
+
+    # Uploads end to end: save, read, classify with the stub, summarize every column
+    job = upload(client, csv_bytes)
+    bench('upload/csv', lambda: upload(client, csv_bytes), repeat=args.upload_repeat, warmup=0)
+    dataset_id = job['datasetId']
+    dataset = app_v2.registry.get(dataset_id)
+
+    for rows in (20, 1000):
+        frame = dataset.table.slice(0, rows).to_pandas()
+        bench(f"convert_to_serializable/{rows}_rows", lambda: app_v2.convert_to_serializable(frame))
+
+    # Paging through the data in windows, with and without the response cache
+    page_rows = 100
+    windows = [(start, start + page_rows) for start in range(0, min(args.rows, page_rows * args.pages), page_rows)]
+
+    def page_through():
+        for start, end in windows:
+            client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': start, 'endRow': end})
+
+    def page_through_uncached():
+        app_v2.response_cache.clear()
+        page_through()
+
+    def follow_cursors():
+        app_v2.response_cache.clear()
+        cursor = None
+        for _ in windows:
+            params = {'dataset_id': dataset_id, 'page_size': page_rows}
+            if cursor:
+                params['cursor'] = cursor
+            cursor = client.get('/data', query_string=params).get_json()['nextCursor']
+            if not cursor:
+                break
+
+    bench(f"paging/{len(windows)}_windows_uncached", page_through_uncached)
+    bench(f"paging/{len(windows)}_windows_cached", page_through)
+    bench(f"paging/{len(windows)}_cursor_windows", follow_cursors)
+
+    # Search: a rare value, a common one, no match, and a query typed one key at a time
+    def search(*queries):
+        def run():
+            app_v2.response_cache.clear()
+            for query in queries:
+                client.get('/search', query_string={'dataset_id': dataset_id, 'query': query})
+        return run
+
+    bench('search/selective', search('CUST-00000042'))
+    bench('search/broad', search('Category'))
+    bench('search/no_match', search('zzzzzz'))
+    bench('search/typing', search(*['L', 'Lo', 'Lon', 'Lond', 'Londo', 'London']))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(output):
+    """The most recent results file in RESULTS_DIR other than output, or None."""
+    paths = sorted(path for path in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if os.path.abspath(path) != os.path.abspath(output))
+    return paths[-1] if paths else None
+
+
+def compare(results, baseline, threshold):
+    """Print each benchmark's median next to the baseline's and return the names that got slower than threshold allows."""
+    regressions = []
+    print(f"{'benchmark':40s} {'median ms':>10s} {'baseline':>10s} {'change':>8s}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:40s} {result['median'] * 1000:10.2f} {'-':>10s} {'new':>8s}")
+            continue
+        change = result['median'] / before['median'] - 1 if before['median'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:40s} {result['median'] * 1000:10.2f} {before['median'] * 1000:10.2f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='rows of the synthetic dataset (default 10000)')
+    parser.add_argument('--columns', type=int, default=18, help='columns, cycling through the 18 column types (default 18)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark (default 5)')
+    parser.add_argument('--upload-repeat', type=int, default=3, help='timed runs of the upload benchmark (default 3)')
+    parser.add_argument('--pages', type=int, default=50, help='100-row windows fetched by the paging benchmarks (default 50)')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='seconds the LLM stub waits per call (default 0)')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<UTC time>.json)')
+    parser.add_argument('--baseline', help='results file to compare with (default: the previous run in benchmarks/results)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown of the median counted as a regression (default 0.2)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 when a benchmark regressed')
+    args = parser.parse_args()
+
+    import pandas as pd
+    import pyarrow as pa
+
+    results = run_benchmarks(args)
+    output = args.output or os.path.join(RESULTS_DIR, datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'commit': git_commit(), 'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'python': platform.python_version(), 'pandas': pd.__version__, 'pyarrow': pa.__version__,
+                'rows': args.rows, 'columns': args.columns, 'seed': args.seed, 'llm_latency': args.llm_latency,
+            },
+            'results': results
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+    baseline_path = args.baseline or previous_results(output)
+    if not baseline_path:
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if (baseline['meta'].get('rows'), baseline['meta'].get('columns')) != (args.rows, args.columns):
+        print(f"Note: the baseline {baseline_path} used {baseline['meta'].get('rows')} rows and {baseline['meta'].get('columns')} columns")
+    print(f"Compared with {baseline_path}")
+    regressions = compare(results, baseline['results'], args.threshold)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
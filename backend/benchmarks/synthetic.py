@@ -0,0 +1,77 @@
+"""
+Synthetic datasets for the benchmarks: the columns of mixed_data.csv plus one column of every
+other column type, repeated to any number of columns and generated to any number of rows.
+Values are drawn from a seeded generator, so the same arguments always give the same data.
+"""
+import numpy as np
+import pandas as pd
+
+FIRST_NAMES = ['Alice', 'Bob', 'Carla', 'Dmitri', 'Eve', 'Farah', 'Gustavo', 'Hana', 'Ivan', 'Jun']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Silva', 'Kim', 'Haddad']
+CITIES = ['London', 'Paris', 'Lagos', 'Tokyo', 'Lima', 'Toronto', 'Mumbai', 'Sydney', 'Berlin', 'Nairobi']
+DOMAINS = ['example.com', 'mail.org', 'corp.net', 'school.edu']
+FEEDBACK = ['Very satisfied', 'Satisfied', 'Neutral', 'Dissatisfied', 'Very dissatisfied']
+EXTENSIONS = ['pdf', 'csv', 'xlsx', 'png', 'docx']
+SYMBOLS = ['#', '@', '$', '%', '&', '*']
+DESCRIPTIONS = ['Lorem ipsum dolor sit amet', 'Consectetur adipiscing elit', 'Sed do eiusmod tempor incididunt', 'Ut labore et dolore magna aliqua']
+
+
+def _names(rng, rows):
+    return [f"{FIRST_NAMES[i]} {LAST_NAMES[j]}" for i, j in zip(rng.integers(0, len(FIRST_NAMES), rows), rng.integers(0, len(LAST_NAMES), rows))]
+
+
+# Column name and value generator for each of the 18 column types. The first six are the columns of mixed_data.csv.
+COLUMN_GENERATORS = [
+    ("Categorical", "Category", lambda rng, rows: rng.choice(['Category A', 'Category B', 'Category C'], rows)),
+    ("Numeric", "Numerical", lambda rng, rows: rng.integers(1, 1000, rows)),
+    ("Text", "Description", lambda rng, rows: rng.choice(DESCRIPTIONS, rows)),
+    ("Financial", "Salary", lambda rng, rows: rng.integers(30000, 120000, rows)),
+    ("Ratings/Scoring", "Rating", lambda rng, rows: rng.integers(1, 6, rows)),
+    ("Boolean", "Boolean", lambda rng, rows: rng.choice(['True', 'False'], rows)),
+    ("Date/Time", "Order Date", lambda rng, rows: (pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, rows), unit='D')).strftime('%Y-%m-%d')),
+    ("Identifiers", "Customer ID", lambda rng, rows: [f"CUST-{value:08d}" for value in rng.permutation(rows)]),
+    ("Geospatial", "City", lambda rng, rows: rng.choice(CITIES, rows)),
+    ("Binary", "Subscribed", lambda rng, rows: rng.integers(0, 2, rows)),
+    ("Contact Information", "Email", lambda rng, rows: [f"user{i}@{DOMAINS[i % len(DOMAINS)]}" for i in rng.integers(0, rows, rows)]),
+    ("Aggregated/Mixed Data", "Notes", lambda rng, rows: [f"{value}; {int(number)} items" for value, number in zip(rng.choice(CITIES, rows), rng.integers(1, 50, rows))]),
+    ("Special Symbols", "Tag", lambda rng, rows: [f"{symbol}tag{number}" for symbol, number in zip(rng.choice(SYMBOLS, rows), rng.integers(0, 100, rows))]),
+    ("Duration", "Call Duration", lambda rng, rows: [f"{int(seconds) // 60} min {int(seconds) % 60} s" for seconds in rng.exponential(300, rows)]),
+    ("Survey/Feedback", "Survey Response", lambda rng, rows: rng.choice(FEEDBACK, rows)),
+    ("File References", "Attachment", lambda rng, rows: [f"files/report_{number}.{extension}" for number, extension in zip(rng.integers(0, 10000, rows), rng.choice(EXTENSIONS, rows))]),
+    ("Miscellaneous", "Misc", lambda rng, rows: rng.choice(['alpha', 'beta', 'gamma', 'delta', ''], rows)),
+    ("Names", "Full Name", _names),
+]
+
+COLUMN_TYPES = [column_type for column_type, _, _ in COLUMN_GENERATORS]
+_TYPE_BY_NAME = {name: column_type for column_type, name, _ in COLUMN_GENERATORS}
+
+
+def column_type_of(column_name):
+    """Column type of a generated column from its name, e.g. "Salary 2" is Financial; None for other names."""
+    base, _, repeat = column_name.rpartition(' ')
+    if base and repeat.isdigit() and base in _TYPE_BY_NAME:
+        return _TYPE_BY_NAME[base]
+    return _TYPE_BY_NAME.get(column_name)
+
+
+def generate_dataset(rows, columns=len(COLUMN_GENERATORS), seed=0):
+    """
+    Return (DataFrame, {column name: column type}) with the given number of rows and columns.
+    Columns cycle through the 18 column types; repeats get a numeric suffix ("Salary 2").
+    """
+    rng = np.random.default_rng(seed)
+    data, column_types = {}, {}
+    for index in range(columns):
+        column_type, name, generate = COLUMN_GENERATORS[index % len(COLUMN_GENERATORS)]
+        repeat = index // len(COLUMN_GENERATORS)
+        if repeat:
+            name = f"{name} {repeat + 1}"
+        data[name] = generate(rng, rows)
+        column_types[name] = column_type
+    return pd.DataFrame(data), column_types
+
+
+def generate_csv(rows, columns=len(COLUMN_GENERATORS), seed=0):
+    """The generated dataset as CSV bytes, with its column types."""
+    df, column_types = generate_dataset(rows, columns, seed)
+    return df.to_csv(index=False).encode(), column_types
@@ -0,0 +1,398 @@
+import itertools
+import os
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from dataset_store import CompactTypes
+
+# Bytes of CSV text per record batch, which is also the unit of chunked summarizing and search
+CSV_BLOCK_BYTES = 64 * 1024 * 1024
+# Files that carry their own schema; Feather v2 is the Arrow IPC file format
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather', '.arrow', '.ipc')
+EXCEL_EXTENSIONS = ('.xls', '.xlsx')
+# Spreadsheet rows per record batch
+EXCEL_BATCH_ROWS = 50000
+
+try:
+    # Much faster than openpyxl, and reads .xls too
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+
+def write_csv_as_arrow(csv_path, arrow_path, progress=None):
+    """
+    Stream a CSV file into an Arrow IPC file one record batch at a time, without holding the
+    whole file in memory. Column types are inferred from the first block; a column that turns
+    out to hold other values further down is re-read as strings. Like pandas' read_csv, dates
+    and times are kept as text and empty fields are missing. progress is called with the
+    fraction of the file converted so far.
+    """
+    file_size = max(os.path.getsize(csv_path), 1)
+    forced_types = {}
+    while True:
+        reader = pacsv.open_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+            convert_options=pacsv.ConvertOptions(column_types=forced_types, strings_can_be_null=True)
+        )
+        temporal = [field.name for field in reader.schema if pa.types.is_temporal(field.type)]
+        if temporal:
+            forced_types.update((name, pa.string()) for name in temporal)
+            continue
+        try:
+            with pa.OSFile(arrow_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, reader.schema) as writer:
+                    for converted, batch in enumerate(reader, start=1):
+                        writer.write_batch(batch)
+                        if progress:
+                            progress(min(converted * CSV_BLOCK_BYTES / file_size, 1.0))
+            return reader.schema
+        except pa.ArrowInvalid as e:
+            match = re.search(r'In CSV column #(\d+)', str(e))
+            if not match:
+                raise
+            column_name = reader.schema.names[int(match.group(1))]
+            if column_name in forced_types:
+                raise
+            forced_types[column_name] = pa.string()
+
+
+def _open_ipc(source):
+    # Arrow IPC comes as a file (with a footer, Feather v2) or as a stream
+    try:
+        return pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        return pa.ipc.open_stream(source)
+
+
+def read_columnar_schema(path):
+    """Read the schema of a Parquet or Arrow IPC/Feather file without reading its data."""
+    if path.endswith('.parquet'):
+        return pq.read_schema(path, memory_map=True)
+    return _open_ipc(pa.memory_map(path)).schema
+
+
+def data_column_names(schema):
+    """The schema's column names, without the index columns pandas adds when it writes a DataFrame."""
+    index_columns = (schema.pandas_metadata or {}).get('index_columns', [])
+    return [name for name in schema.names if name not in index_columns]
+
+
+def read_columnar_file(path, columns=None):
+    """
+    Read a Parquet or Arrow IPC/Feather file as an Arrow table, keeping its types and reading
+    only the given columns. Uncompressed IPC files are memory-mapped without copying.
+    """
+    columns = columns or data_column_names(read_columnar_schema(path))
+    if path.endswith('.parquet'):
+        return pq.read_table(path, columns=columns, memory_map=True)
+    return _open_ipc(pa.memory_map(path)).read_all().select(columns)
+
+
+class DictionaryUnifier:
+    """
+    Re-encodes the dictionary columns of successive record batches against one growing dictionary
+    per column. An IPC file allows a single dictionary per column, extended with deltas, while
+    batches read from a Parquet file can each bring their own.
+    """
+
+    def __init__(self):
+        self._dictionaries = {}  # column name -> (values, value -> index)
+
+    def unify(self, batch):
+        arrays = []
+        for name, column in zip(batch.schema.names, batch.columns):
+            if not pa.types.is_dictionary(column.type):
+                arrays.append(column)
+                continue
+            values, positions = self._dictionaries.setdefault(name, ([], {}))
+            mapping = []
+            for value in column.dictionary.to_pylist():
+                if value not in positions:
+                    positions[value] = len(values)
+                    values.append(value)
+                mapping.append(positions[value])
+            indices = pc.take(pa.array(mapping, type=column.type.index_type), column.indices)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(values, type=column.type.value_type)))
+        return pa.RecordBatch.from_arrays(arrays, schema=batch.schema)
+
+
+def write_columnar_as_arrow(path, arrow_path, columns=None, progress=None):
+    """Copy the given columns of a Parquet or Arrow IPC/Feather file into an Arrow IPC file one record batch at a time."""
+    schema = read_columnar_schema(path)
+    columns = columns or data_column_names(schema)
+    schema = pa.schema([schema.field(name) for name in columns], metadata=schema.metadata)
+    if path.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        total_rows = parquet_file.metadata.num_rows
+        batches = parquet_file.iter_batches(columns=columns)
+    else:
+        reader = _open_ipc(pa.memory_map(path))
+        if isinstance(reader, pa.ipc.RecordBatchFileReader):
+            total_rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+            batches = (reader.get_batch(i).select(columns) for i in range(reader.num_record_batches))
+        else:
+            # A stream doesn't say how long it is
+            total_rows = None
+            batches = (batch.select(columns) for batch in reader)
+
+    written, dictionaries = 0, DictionaryUnifier()
+    with pa.OSFile(arrow_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)) as writer:
+            for batch in batches:
+                writer.write_batch(dictionaries.unify(batch))
+                written += batch.num_rows
+                if progress and total_rows:
+                    progress(written / total_rows)
+    return schema
+
+
+def compact_arrow_file(source_path, arrow_path):
+    """
+    Rewrite an Arrow IPC file with its columns in the types compact_table gives them, one record
+    batch at a time: a first pass over the memory-mapped file gathers each column's statistics,
+    a second casts the batches, dictionary-encoding strings against one dictionary per column.
+    Returns the new schema.
+    """
+    with pa.memory_map(source_path) as source:
+        reader = pa.ipc.open_file(source)
+        batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+        compact_types = CompactTypes(reader.schema)
+        for batch in batches:
+            compact_types.add(batch)
+        schema = compact_types.types()
+
+        dictionaries = DictionaryUnifier()
+        with pa.OSFile(arrow_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)) as writer:
+                for batch in batches:
+                    writer.write_batch(dictionaries.unify(CompactTypes.compact(batch, schema)))
+    return schema
+
+
+def parse_cell_range(cell_range):
+    """(min_col, min_row, max_col, max_row) of a range like 'B2:F100', 'B:F' or '2:100', 1-based with None for open ends."""
+    from openpyxl.utils.cell import range_boundaries
+    return range_boundaries(cell_range.upper())
+
+
+def excel_sheet_names(path):
+    if CalamineWorkbook is not None:
+        return list(CalamineWorkbook.from_path(path).sheet_names)
+    if path.endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+    return list(pd.ExcelFile(path).sheet_names)
+
+
+def _excel_rows(path, sheet, cell_range):
+    """
+    Return (rows, total) for the sheet (a name, or the first sheet if None) and cell range:
+    an iterator of row tuples, header row first, and the number of rows if the sheet says.
+    """
+    min_col, min_row, max_col, max_row = parse_cell_range(cell_range) if cell_range else (None, None, None, None)
+
+    if CalamineWorkbook is None and path.endswith('.xlsx'):
+        # Read-only mode streams the rows from the zipped XML instead of building every cell
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        first_row = min_row or 1
+        last_row = max_row or worksheet.max_row
+        total = last_row - first_row + 1 if last_row else None
+
+        def rows():
+            try:
+                yield from worksheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True)
+            finally:
+                workbook.close()
+        return rows(), total
+
+    if CalamineWorkbook is not None:
+        workbook = CalamineWorkbook.from_path(path)
+        worksheet = workbook.get_sheet_by_name(sheet) if sheet is not None else workbook.get_sheet_by_index(0)
+        # iter_rows yields rows from the first row but cells from the first used column; pad them
+        # to start at A1 so that cell ranges line up. Empty cells come as '', None with openpyxl
+        start_col = worksheet.start[1] if worksheet.start else 0
+        all_rows = ((None,) * start_col + tuple(None if value == '' else value for value in row) for row in worksheet.iter_rows())
+        total = worksheet.end[0] + 1 if worksheet.end else 0
+    else:
+        # .xls without calamine: xlrd through pandas, which reads the whole sheet
+        frame = pd.read_excel(path, sheet_name=sheet if sheet is not None else 0, header=None)
+        frame = frame.astype(object).where(frame.notna(), None)
+        all_rows, total = frame.itertuples(index=False, name=None), len(frame)
+
+    first_row = (min_row or 1) - 1
+    rows = itertools.islice(all_rows, first_row, max_row)
+    if min_col or max_col:
+        rows = (tuple(row[(min_col or 1) - 1:max_col]) for row in rows)
+    total = (min(max_row, total) if max_row else total) - first_row
+    return rows, total
+
+
+def _column_names(header):
+    # Like pandas: blank headers become 'Unnamed: <position>', repeated names get a '.<n>' suffix
+    names, seen = [], {}
+    for position, value in enumerate(header):
+        name = f"Unnamed: {position}" if value is None or str(value).strip() == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _excel_batches(rows, names):
+    # Blank rows at the end of a sheet (left over from formatting) are dropped, those in between are kept
+    width, batch, blank = len(names), [], 0
+    for row in rows:
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        if all(value is None or value == '' for value in row):
+            blank += 1
+            continue
+        batch.extend([(None,) * width] * blank)
+        blank = 0
+        batch.append(row)
+        if len(batch) >= EXCEL_BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _to_record_batch(rows, names, forced_types):
+    arrays = []
+    for name, values in zip(names, zip(*rows)):
+        data_type = forced_types.get(name)
+        if data_type == pa.string():
+            values = [None if value is None else str(value) for value in values]
+        try:
+            arrays.append(pa.array(values, type=data_type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed cell types, e.g. numbers and text
+            arrays.append(pa.array([None if value is None else str(value) for value in values], type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def _promote(current, other):
+    if pa.types.is_null(current):
+        return other
+    if pa.types.is_null(other):
+        return current
+    if (pa.types.is_integer(current) or pa.types.is_floating(current)) and (pa.types.is_integer(other) or pa.types.is_floating(other)):
+        return pa.float64()
+    return pa.string()
+
+
+def _cell_text(value, from_integers):
+    # A whole number in a float column that was widened from integers was an integer cell
+    if from_integers and isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _widen_batch(batch, schema, from_integers):
+    arrays = []
+    for column, field in zip(batch.columns, schema):
+        if column.type == field.type:
+            arrays.append(column)
+        elif pa.types.is_string(field.type):
+            # The text of each cell value, like _to_record_batch, rather than Arrow's cast formatting
+            integral = field.name in from_integers
+            arrays.append(pa.array([None if value is None else _cell_text(value, integral) for value in column.to_pylist()],
+                                   type=field.type))
+        else:
+            arrays.append(column.cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _rewrite_widened(arrow_path, schema, from_integers):
+    # Re-encode the batches written so far with the widened schema; returns the writer to append the rest with
+    narrow_path = f"{arrow_path}.narrow"
+    os.replace(arrow_path, narrow_path)
+    try:
+        writer = pa.ipc.new_file(arrow_path, schema)
+        with pa.memory_map(narrow_path) as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                writer.write_batch(_widen_batch(reader.get_batch(index), schema, from_integers))
+    finally:
+        os.remove(narrow_path)
+    return writer
+
+
+def write_excel_as_arrow(path, arrow_path, sheet=None, cell_range=None, progress=None):
+    """
+    Stream a worksheet into an Arrow IPC file one batch of rows at a time. The first row of the
+    cell range is the header. Column types come from the cell values of the first batch; when a
+    later batch doesn't fit them the column is widened (to float64 for numbers, otherwise to
+    strings) and the batches already written are rewritten with the wider type, so the sheet is
+    read once. progress is called with the fraction of the rows converted.
+    """
+    rows, total = _excel_rows(path, sheet, cell_range)
+    names = _column_names(next(rows, ()))
+    if total:
+        # Not counting the header row
+        total -= 1
+    forced_types, schema, writer, converted = {}, None, None, 0
+    from_integers = set()
+    try:
+        for batch_rows in _excel_batches(rows, names):
+            batch = _to_record_batch(batch_rows, names, forced_types)
+            if schema is None:
+                schema = batch.schema
+                writer = pa.ipc.new_file(arrow_path, schema)
+            while batch.schema != schema:
+                widened = {
+                    name: _promote(schema.field(name).type, batch.schema.field(name).type)
+                    for name in names if schema.field(name).type != batch.schema.field(name).type
+                }
+                from_integers.update(name for name, data_type in widened.items()
+                                     if pa.types.is_floating(data_type) and pa.types.is_integer(schema.field(name).type))
+                forced_types.update(widened)
+                schema = pa.schema([(name, forced_types.get(name, schema.field(name).type)) for name in names])
+                writer.close()
+                writer = _rewrite_widened(arrow_path, schema, from_integers)
+                batch = _to_record_batch(batch_rows, names, forced_types)
+            writer.write_batch(batch)
+            converted += len(batch_rows)
+            if progress and total:
+                progress(min(converted / total, 1.0))
+        if writer is None:
+            # Only a header row
+            schema = pa.schema([(name, pa.null()) for name in names])
+            writer = pa.ipc.new_file(arrow_path, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return schema
+
+
+def read_excel_file(path, sheet=None, cell_range=None, progress=None):
+    """Read a worksheet as an Arrow table through write_excel_as_arrow, so both paths type the cells the same way."""
+    arrow_path = f"{path}.arrow"
+    try:
+        write_excel_as_arrow(path, arrow_path, sheet, cell_range, progress)
+        with pa.OSFile(arrow_path, 'rb') as source:
+            return pa.ipc.open_file(source).read_all()
+    finally:
+        if os.path.exists(arrow_path):
+            os.remove(arrow_path)
+
+
+def iter_column_chunks(table, column_name):
+    """Yield the column one record batch at a time as pandas Series."""
+    for chunk in table.column(column_name).chunks:
+        yield chunk.to_pandas()
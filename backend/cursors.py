@@ -0,0 +1,23 @@
+import base64
+import binascii
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(version, query, row):
+    """Opaque cursor for the next window: the dataset's rows_version, the search query and the row to continue from."""
+    return base64.urlsafe_b64encode(json.dumps([version, query, row]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (version, query, row) of a cursor made by encode_cursor, or raise InvalidCursor."""
+    try:
+        version, query, row = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(version, int) or not isinstance(query, str) or not isinstance(row, int) or row < 0:
+        raise InvalidCursor(cursor)
+    return version, query, row
@@ -0,0 +1,65 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# How many example keys (or row positions) of each kind of change to include in a report
+REPORT_SAMPLE_SIZE = 20
+
+
+def column_hash(series):
+    """Content hash of a column, including its dtype."""
+    digest = hashlib.sha256(str(series.dtype).encode())
+    digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def diff_columns(old_df, new_df):
+    """Split the new file's columns into unchanged, changed and added, and list the removed ones."""
+    unchanged, changed, added = [], [], []
+    for column_name in new_df.columns:
+        if column_name not in old_df.columns:
+            added.append(column_name)
+        elif column_hash(old_df[column_name]) == column_hash(new_df[column_name]):
+            unchanged.append(column_name)
+        else:
+            changed.append(column_name)
+    removed = [column_name for column_name in old_df.columns if column_name not in new_df.columns]
+    return {'unchanged': unchanged, 'changed': changed, 'added': added, 'removed': removed}
+
+
+def diff_rows(old_df, new_df, key=None):
+    """
+    Compare the rows of two versions over their common columns.
+
+    With a key column rows are matched by key; without one they are matched by position,
+    which suits exports that append rows or edit them in place.
+    """
+    common = [column_name for column_name in new_df.columns if column_name in old_df.columns]
+    old_hashes = pd.util.hash_pandas_object(old_df[common], index=False).to_numpy()
+    new_hashes = pd.util.hash_pandas_object(new_df[common], index=False).to_numpy()
+
+    if key is not None:
+        old_by_key = dict(zip(old_df[key].tolist(), old_hashes))
+        new_by_key = dict(zip(new_df[key].tolist(), new_hashes))
+        added = [k for k in new_by_key if k not in old_by_key]
+        removed = [k for k in old_by_key if k not in new_by_key]
+        changed = [k for k, h in new_by_key.items() if k in old_by_key and old_by_key[k] != h]
+    else:
+        overlap = min(len(old_hashes), len(new_hashes))
+        changed = np.flatnonzero(old_hashes[:overlap] != new_hashes[:overlap]).tolist()
+        added = list(range(overlap, len(new_hashes)))
+        removed = list(range(overlap, len(old_hashes)))
+
+    return {
+        'matchedBy': key if key is not None else 'position',
+        'added': len(added),
+        'removed': len(removed),
+        'changed': len(changed),
+        'unchanged': len(new_hashes) - len(added) - len(changed),
+        'examples': {
+            'added': added[:REPORT_SAMPLE_SIZE],
+            'removed': removed[:REPORT_SAMPLE_SIZE],
+            'changed': changed[:REPORT_SAMPLE_SIZE],
+        },
+    }
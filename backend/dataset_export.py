@@ -0,0 +1,266 @@
+import io
+import json
+import zlib
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from dataset_registry import search_mask
+from dataset_store import json_default
+
+# Rows taken from the table per output chunk when the view is sorted
+EXPORT_BATCH_ROWS = 65536
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+TEXT_FILTERS = ('contains', 'notContains', 'equals', 'notEqual', 'startsWith', 'endsWith')
+NUMBER_FILTERS = ('equals', 'notEqual', 'lessThan', 'lessThanOrEqual', 'greaterThan', 'greaterThanOrEqual', 'inRange')
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _as_text(column):
+    try:
+        return pc.cast(column, pa.string())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array([None if value is None else str(value) for value in column.to_pylist()], type=pa.string())
+
+
+def _condition_mask(column, condition):
+    """Rows of the column matching one ag-Grid filter condition."""
+    kind = condition.get('type', 'contains')
+    if kind == 'blank':
+        mask = pc.is_null(column, nan_is_null=True)
+        # Compact uploads store text as dictionaries, compared on their values
+        value_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        if pa.types.is_string(value_type) or pa.types.is_large_string(value_type):
+            mask = pc.or_kleene(mask, pc.equal(column, ''))
+        return mask
+    if kind == 'notBlank':
+        return pc.invert(_condition_mask(column, {'type': 'blank'}))
+
+    if condition.get('filterType') == 'number':
+        if kind not in NUMBER_FILTERS:
+            raise ExportError(f"Unsupported number filter: {kind}")
+        try:
+            values = pc.cast(column, pa.float64())
+            value = float(condition.get('filter'))
+        except (TypeError, ValueError, pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            raise ExportError(f"Number filter on a non-numeric value or column: {condition}")
+        if kind == 'inRange':
+            try:
+                upper = float(condition.get('filterTo'))
+            except (TypeError, ValueError):
+                raise ExportError(f"inRange filter without filterTo: {condition}")
+            return pc.and_(pc.greater_equal(values, value), pc.less_equal(values, upper))
+        compare = {
+            'equals': pc.equal, 'notEqual': pc.not_equal, 'lessThan': pc.less, 'lessThanOrEqual': pc.less_equal,
+            'greaterThan': pc.greater, 'greaterThanOrEqual': pc.greater_equal,
+        }[kind]
+        return compare(values, value)
+
+    if kind not in TEXT_FILTERS:
+        raise ExportError(f"Unsupported text filter: {kind}")
+    # ag-Grid's text filters are case-insensitive
+    text = _as_text(column)
+    pattern = str(condition.get('filter', ''))
+    if kind in ('contains', 'notContains'):
+        mask = pc.match_substring(text, pattern, ignore_case=True)
+    elif kind == 'startsWith':
+        mask = pc.starts_with(text, pattern, ignore_case=True)
+    elif kind == 'endsWith':
+        mask = pc.ends_with(text, pattern, ignore_case=True)
+    else:
+        mask = pc.equal(pc.utf8_lower(text), pattern.lower())
+    return pc.invert(mask) if kind in ('notContains', 'notEqual') else mask
+
+
+def filter_mask(batch, filter_model):
+    """Rows of the record batch passing every column filter of an ag-Grid filter model."""
+    mask = pa.array([True] * batch.num_rows, type=pa.bool_())
+    for column_name, model in filter_model.items():
+        index = batch.schema.get_field_index(column_name)
+        if index < 0:
+            raise ExportError(f"Unknown filter column: {column_name}")
+        column = batch.column(index)
+        # Combined filters: {operator: 'AND'|'OR', conditions: [...]}
+        conditions = model.get('conditions') or [model]
+        operator = pc.or_ if str(model.get('operator', 'AND')).upper() == 'OR' else pc.and_
+        column_mask = None
+        for condition in conditions:
+            condition = {'filterType': model.get('filterType'), **condition}
+            matched = pc.fill_null(_condition_mask(column, condition), False)
+            column_mask = matched if column_mask is None else operator(column_mask, matched)
+        mask = pc.and_(mask, column_mask)
+    return mask
+
+
+def view_batches(table, query='', filter_model=None, sort_model=None, columns=None):
+    """
+    Record batches of the grid's current view: rows matching the search query and the column
+    filters, in sort order, with only the visible columns.
+
+    Unsorted views are filtered one batch at a time. Sorted views compute the sort order of
+    the matching rows over the sort key columns only, then take rows in fixed-size slices.
+    """
+    filter_model = filter_model or {}
+    sort_model = [entry for entry in (sort_model or []) if entry.get('sort') in ('asc', 'desc')]
+    names = table.column_names
+    for name in list(columns or []) + [entry.get('colId') for entry in sort_model]:
+        if name not in names:
+            raise ExportError(f"Unknown column: {name}")
+    columns = list(columns) if columns else names
+
+    def mask_of(batch):
+        mask = filter_mask(batch, filter_model)
+        if query:
+            mask = pc.and_(mask, search_mask(batch, query))
+        return mask
+
+    if not sort_model:
+        for batch in table.to_batches():
+            if query or filter_model:
+                batch = batch.filter(mask_of(batch))
+            if batch.num_rows:
+                yield batch.select(columns)
+        return
+
+    if query or filter_model:
+        masks = [mask_of(batch) for batch in table.to_batches()]
+        selected = pc.indices_nonzero(pa.chunked_array(masks, type=pa.bool_()))
+    else:
+        selected = pa.array(range(table.num_rows), type=pa.uint64())
+    keys = table.select([entry['colId'] for entry in sort_model]).take(selected)
+    # Sorting doesn't support dictionary columns, sort their values instead
+    keys = pa.table([
+        pc.cast(column, column.type.value_type) if pa.types.is_dictionary(column.type) else column
+        for column in keys.columns
+    ], names=keys.column_names)
+    order = pc.sort_indices(keys, sort_keys=[
+        (entry['colId'], 'ascending' if entry['sort'] == 'asc' else 'descending') for entry in sort_model
+    ])
+    rows = pc.take(selected, order)
+    projected = table.select(columns)
+    for offset in range(0, len(rows), EXPORT_BATCH_ROWS):
+        chunk = projected.take(rows.slice(offset, EXPORT_BATCH_ROWS)).combine_chunks()
+        yield from chunk.to_batches()
+
+
+def _view_schema(table, columns=None):
+    # Schema of the view's record batches, also when no row matches
+    for name in columns or []:
+        if name not in table.column_names:
+            raise ExportError(f"Unknown column: {name}")
+    return table.select(list(columns) if columns else table.column_names).schema
+
+
+def _csv_ready(batch):
+    # The CSV writer handles dictionaries, dates and durations but not nested types
+    arrays = [
+        _as_text(column) if pa.types.is_nested(column.type) else column
+        for column in batch.columns
+    ]
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+class _StreamSink:
+    """Write-only file object collecting what the Parquet writer writes until it is drained."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _csv_chunks(batches, schema):
+    header = True
+    for batch in batches:
+        buffer = io.BytesIO()
+        pacsv.write_csv(_csv_ready(batch), buffer, pacsv.WriteOptions(include_header=header))
+        header = False
+        yield buffer.getvalue()
+    if header:
+        # No row matched, the file still gets its header row
+        buffer = io.BytesIO()
+        pacsv.write_csv(_csv_ready(pa.RecordBatch.from_pylist([], schema=schema)), buffer)
+        yield buffer.getvalue()
+
+
+def _jsonl_chunks(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(row, default=json_default) + '\n' for row in batch.to_pylist()).encode()
+
+
+def _parquet_chunks(batches, schema, compression):
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression=compression or 'snappy')
+    for batch in batches:
+        # One row group per batch, written out as soon as it is complete
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(table, export_format, compression=None, **view):
+    """
+    Bytes of the exported view, produced one record batch at a time so memory use doesn't grow
+    with the size of the export. CSV and JSONL are gzipped as a whole when compression is 'gzip';
+    Parquet compresses its pages with the given codec instead.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported export format: {export_format}")
+    batches = view_batches(table, **view)
+    schema = _view_schema(table, view.get('columns'))
+    if export_format == 'parquet':
+        chunks = _parquet_chunks(batches, schema, compression)
+    else:
+        if compression not in (None, 'gzip'):
+            raise ExportError(f"Unsupported compression for {export_format}: {compression}")
+        chunks = _csv_chunks(batches, schema) if export_format == 'csv' else _jsonl_chunks(batches)
+        if compression == 'gzip':
+            chunks = _gzip(chunks)
+    # Produce the first chunk now, so a bad filter or column is reported before the response starts
+    first = next(chunks, b'')
+    return _prepend(first, chunks)
+
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
@@ -0,0 +1,411 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from dataset_store import DATASET_ID, DatasetStore, VersionConflict, to_arrow_table
+
+# Use of a dataset is recorded at most this often, a retention period is counted in hours
+MARK_USED_INTERVAL_SECONDS = 60
+
+
+def search_mask(batch, query):
+    """Rows of the record batch with a value containing query, case-insensitively, as a boolean array."""
+    mask = pa.array([False] * batch.num_rows, type=pa.bool_())
+    for column in batch.columns:
+        try:
+            text = pc.cast(column, pa.string())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            text = pa.array([None if value is None else str(value) for value in column.to_pylist()], type=pa.string())
+        mask = pc.or_(mask, pc.fill_null(pc.match_substring(text, query, ignore_case=True), False))
+    return mask
+
+
+class Dataset:
+    """An uploaded dataset: the data rows as an Arrow table, the summary row and the grid column definitions."""
+
+    def __init__(self, dataset_id, table, summary_row, columns, column_types=None, version=1):
+        self.dataset_id = dataset_id
+        self.table = table
+        self.summary_row = summary_row
+        self.columns = columns
+        self.column_types = column_types or {}
+        self.version = version
+        # Version in which the data rows last changed; metadata-only versions (summaries, column types) keep it
+        self.data_version = version
+        # Version in which the columns (definitions, types or schema) last changed; summary-only versions keep it
+        self.columns_version = version
+        # Version in which rows last moved (appends, a replaced table); cell edits keep it, so cursors stay valid
+        self.rows_version = version
+        # Set for tables read from the store, whose buffers are pages of the mapped file
+        self.memory_mapped = False
+        # Incremental summary state per column, built on the first edit (see summary_state)
+        self.summary_states = {}
+
+    @property
+    def total_rows(self):
+        # The summary row is served as the first row of page 1
+        return self.table.num_rows + 1
+
+    def meta(self):
+        return {
+            'summary_row': self.summary_row, 'columns': self.columns, 'column_types': self.column_types,
+            'data_version': self.data_version, 'columns_version': self.columns_version, 'rows_version': self.rows_version
+        }
+
+    def nbytes(self):
+        # The summary row is small next to the data, its JSON size is a good enough estimate.
+        # Memory-mapped data lives in the page cache, which the OS reclaims on its own.
+        summary_bytes = len(json.dumps(self.summary_row, default=str))
+        return summary_bytes if self.memory_mapped else self.table.get_total_buffer_size() + summary_bytes
+
+    def memory_report(self):
+        """Bytes held by each column, in its storage type."""
+        return [
+            {'column': field.name, 'type': str(field.type), 'bytes': column.nbytes, 'nullCount': column.null_count}
+            for field, column in zip(self.table.schema, self.table.columns)
+        ]
+
+    def check_columns(self, columns):
+        """Raise KeyError naming the first of columns that the dataset doesn't have."""
+        names = set(self.table.column_names)
+        for column_name in columns or []:
+            if column_name not in names:
+                raise KeyError(column_name)
+
+    def project(self, summary_row, table, columns):
+        """Only the given columns of the summary row and the data rows, or all of them when columns is None."""
+        if columns is None:
+            return summary_row, table
+        if summary_row:
+            summary_row = {column_name: summary_row.get(column_name) for column_name in columns}
+        return summary_row, table.select(columns)
+
+    def rows(self, start, end, columns=None):
+        """
+        Return (summary_row or None, Arrow table slice) for the [start, end) window of the grid rows,
+        with only the given columns if any.
+        """
+        summary_row = self.summary_row if start == 0 else None
+        offset = max(start - 1, 0)
+        return self.project(summary_row, self.table.slice(offset, max(end - 1 - offset, 0)), columns)
+
+    def summary_matches(self, query):
+        lowered = query.lower()
+        return any(lowered in str(value).lower() for value in self.summary_row.values())
+
+    def search(self, query, start=0, limit=None, columns=None):
+        """
+        Case-insensitive substring search over all columns, one record batch at a time.
+        Returns (summary_row or None, Arrow table of the matching rows in [start, start + limit), total matching rows),
+        with only the given columns if any.
+        """
+        summary_row = self.summary_row if self.summary_matches(query) else None
+        table, total, _ = self.scan(query, skip=start, limit=limit)
+        summary_row, table = self.project(summary_row, table, columns)
+        return summary_row, table, total
+
+    def scan(self, query, from_row=0, skip=0, limit=None, count_all=True):
+        """
+        Search the data rows from table row from_row on, skipping the first skip matches and keeping
+        the next limit. Returns (Arrow table of the kept rows, matches counted, table row to continue
+        from or None when no matches are left). With count_all false the scan stops as soon as the
+        window is full, so the count only covers the rows scanned and more matches may be left.
+        """
+        matches, total, next_row = [], 0, None
+        position = from_row
+        for batch in self.table.slice(from_row).to_batches():
+            indices = pc.indices_nonzero(search_mask(batch, query))
+            count = len(indices)
+            # Only the matches inside the requested window are kept, the rest are just counted
+            wanted_from, wanted_to = skip - total, (skip + limit - total) if limit is not None else count
+            if count and wanted_to > 0 and wanted_from < count:
+                kept = indices.slice(max(wanted_from, 0), wanted_to - max(wanted_from, 0))
+                matches.append(batch.take(kept))
+                next_row = position + kept[-1].as_py() + 1
+            total += count
+            position += batch.num_rows
+            if not count_all and limit is not None and total >= skip + limit:
+                return self._concat(matches), total, next_row
+        if limit is None or total <= skip + limit:
+            next_row = None
+        return self._concat(matches), total, next_row
+
+    def _concat(self, batches):
+        return pa.Table.from_batches(batches) if batches else self.table.schema.empty_table()
+
+
+class DatasetRegistry:
+    """
+    Datasets keyed by ID, kept in memory under a byte budget with LRU eviction to disk.
+
+    In shared mode every dataset is published to the on-disk store as soon as it is added and
+    served from a memory-mapped copy, so all worker processes pointed at the same directory
+    see the same datasets and pick up new versions on their next access.
+
+    With retention_seconds, datasets that no worker has read or changed for that long are
+    deleted, checked whenever a dataset is added.
+    """
+
+    def __init__(self, memory_budget_bytes, data_dir=None, shared=False, retention_seconds=None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.store = DatasetStore(data_dir or os.path.join(tempfile.gettempdir(), 'ag-grid-datasets'))
+        self.shared = shared
+        self.retention_seconds = retention_seconds
+        self._last_used = {}  # dataset_id -> when this process last recorded a use of it
+        self._pruned_at = 0
+        self._in_memory = OrderedDict()  # dataset_id -> (Dataset, nbytes), least recently used first
+        self._on_disk = set()  # datasets whose current version has been written to the store
+        # Guards the two indexes above; held only for bookkeeping, not while a version is written
+        self._lock = threading.RLock()
+        # dataset_id -> lock held while a new version of that dataset is checked and published
+        self._dataset_locks = {}
+
+    @classmethod
+    def from_env(cls):
+        budget_mb = float(os.environ.get('DATASET_MEMORY_BUDGET_MB', 1024))
+        shared = os.environ.get('SHARED_DATASETS', '').lower() in ('1', 'true', 'yes')
+        retention_hours = float(os.environ.get('DATASET_RETENTION_HOURS', 0))
+        return cls(int(budget_mb * 1024 * 1024), os.environ.get('DATASET_DIR'), shared, retention_hours * 3600 or None)
+
+    def add(self, df, summary_row, columns, column_types=None):
+        return self.add_table(to_arrow_table(df), summary_row, columns, column_types)
+
+    def add_table(self, table, summary_row, columns, column_types=None):
+        dataset = Dataset(uuid.uuid4().hex, table, summary_row, columns, column_types)
+        self._prune()
+        with self._lock:
+            if self.shared:
+                dataset = self._publish(dataset)
+            self._in_memory[dataset.dataset_id] = (dataset, dataset.nbytes())
+            self._mark_used(dataset.dataset_id)
+            self._evict()
+        return dataset
+
+    def get(self, dataset_id):
+        """Return the dataset, reloading it from disk if it was evicted or changed, or None if the ID is unknown."""
+        if not dataset_id or not DATASET_ID.fullmatch(dataset_id):
+            return None
+        with self._lock:
+            cached = self._in_memory.get(dataset_id)
+            if self.shared:
+                version = self.store.current_version(dataset_id)
+                if version is None:
+                    # Deleted by another worker, if it was ever added
+                    self._in_memory.pop(dataset_id, None)
+                    self._on_disk.discard(dataset_id)
+                    return None
+                if cached and cached[0].version == version:
+                    self._in_memory.move_to_end(dataset_id)
+                    self._mark_used(dataset_id)
+                    return cached[0]
+            elif cached:
+                self._in_memory.move_to_end(dataset_id)
+                self._mark_used(dataset_id)
+                return cached[0]
+            elif dataset_id not in self._on_disk:
+                return None
+
+            dataset = self._load(dataset_id)
+            if dataset is None:
+                return None
+            self._in_memory[dataset_id] = (dataset, dataset.nbytes())
+            self._in_memory.move_to_end(dataset_id)
+            self._mark_used(dataset_id)
+            self._evict()
+            return dataset
+
+    def delete(self, dataset_id):
+        """Remove the dataset from memory and from the store, returning whether it existed."""
+        if not dataset_id or not DATASET_ID.fullmatch(dataset_id):
+            return False
+        with self._dataset_lock(dataset_id):
+            with self._lock:
+                existed = self._in_memory.pop(dataset_id, None) is not None or dataset_id in self._on_disk
+                self._on_disk.discard(dataset_id)
+                self._last_used.pop(dataset_id, None)
+            existed = existed or self.store.current_version(dataset_id) is not None
+            self.store.delete(dataset_id)
+        with self._lock:
+            self._dataset_locks.pop(dataset_id, None)
+        return existed
+
+    def delete_unused(self, max_age_seconds):
+        """
+        Delete the datasets that weren't read or changed for max_age_seconds, in this process or,
+        through the store, in any other. Returns their IDs.
+        """
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            dataset_ids = set(self._in_memory) | set(self.store.dataset_ids())
+        deleted = []
+        for dataset_id in dataset_ids:
+            uses = [used for used in (self._last_used.get(dataset_id), self.store.last_used(dataset_id)) if used is not None]
+            # A dataset directory without a current version is still being published
+            if uses and max(uses) < cutoff and self.delete(dataset_id):
+                deleted.append(dataset_id)
+        return deleted
+
+    def update(self, dataset_id, summary_row=None, column_types=None, expected_version=None):
+        """
+        Replace the summary row and/or column types, publishing a new version of the dataset.
+        Raises VersionConflict if expected_version is given and is no longer the current version.
+        """
+        with self._dataset_lock(dataset_id):
+            dataset = self.get(dataset_id)
+            if dataset is None:
+                return None
+            self._check_version(dataset, expected_version)
+            updated = Dataset(
+                dataset_id, dataset.table,
+                dataset.summary_row if summary_row is None else summary_row,
+                dataset.columns,
+                dataset.column_types if column_types is None else column_types,
+                dataset.version + 1
+            )
+            updated.memory_mapped = dataset.memory_mapped
+            updated.data_version = dataset.data_version
+            updated.rows_version = dataset.rows_version
+            if updated.column_types == dataset.column_types:
+                updated.columns_version = dataset.columns_version
+            # The data is unchanged, so the incremental summary states still apply
+            updated.summary_states = dataset.summary_states
+            if dataset_id in self._on_disk:
+                updated.version = self.store.publish_meta(dataset_id, dataset.version, updated.meta(), expected_version=dataset.version)
+            with self._lock:
+                self._in_memory[dataset_id] = (updated, updated.nbytes())
+            return updated
+
+    def add_arrow_file(self, arrow_path, summary_row, columns, column_types=None):
+        """Register a dataset whose data was written to store.temp_path(), e.g. by an out-of-core ingest."""
+        dataset_id = uuid.uuid4().hex
+        self._prune()
+        with self._lock:
+            self.store.publish_file(dataset_id, arrow_path, {'summary_row': summary_row, 'columns': columns, 'column_types': column_types or {}})
+            self._on_disk.add(dataset_id)
+            dataset = self._load(dataset_id)
+            self._in_memory[dataset_id] = (dataset, dataset.nbytes())
+            self._mark_used(dataset_id)
+            self._evict()
+        return dataset
+
+    def data_path(self, dataset):
+        """Path of the dataset's data file if its current version is on disk, else None."""
+        with self._lock:
+            if dataset.dataset_id in self._on_disk and self.store.current_version(dataset.dataset_id) == dataset.version:
+                return self.store.data_path(dataset.dataset_id, dataset.version)
+        return None
+
+    def replace_table(self, dataset_id, table, summary_row, summary_states, columns=None, column_types=None, expected_version=None,
+                      keep_row_positions=False):
+        """
+        Publish edited data with its updated summary row (and column definitions/types if they changed) as a new version of the dataset.
+        keep_row_positions says every row is still at its index, as after cell edits.
+        Raises VersionConflict if expected_version, the version the edit was made to, is no longer the current version.
+        """
+        with self._dataset_lock(dataset_id):
+            dataset = self.get(dataset_id)
+            if dataset is None:
+                return None
+            self._check_version(dataset, expected_version)
+            updated = Dataset(
+                dataset_id, table, summary_row,
+                dataset.columns if columns is None else columns,
+                dataset.column_types if column_types is None else column_types,
+                dataset.version + 1
+            )
+            if (updated.columns, updated.column_types) == (dataset.columns, dataset.column_types) and table.schema == dataset.table.schema:
+                updated.columns_version = dataset.columns_version
+            if keep_row_positions:
+                updated.rows_version = dataset.rows_version
+            if self.shared:
+                self.store.publish(dataset_id, table, updated.meta(), min_version=updated.version, expected_version=dataset.version)
+                updated = self._load(dataset_id)
+            updated.summary_states = summary_states
+            with self._lock:
+                if not self.shared:
+                    # The copy on disk is stale, it is rewritten if the dataset gets evicted again
+                    self._on_disk.discard(dataset_id)
+                self._in_memory[dataset_id] = (updated, updated.nbytes())
+                self._evict()
+            return updated
+
+    def memory_usage(self):
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._in_memory.values())
+
+    def memory_report(self, dataset):
+        """The /memory response: storage of each column of the dataset, and of all datasets held in memory."""
+        columns = dataset.memory_report()
+        return {
+            'datasetId': dataset.dataset_id,
+            'rows': dataset.table.num_rows,
+            'memoryMapped': dataset.memory_mapped,
+            'bytes': sum(column['bytes'] for column in columns),
+            'columns': columns,
+            'registryBytes': self.memory_usage(),
+            'registryBudgetBytes': self.memory_budget_bytes
+        }
+
+    def _dataset_lock(self, dataset_id):
+        # Serializes the publishing of one dataset's versions in this process, other datasets and
+        # reads aren't held up while a version is written; other processes are kept out by the store
+        with self._lock:
+            return self._dataset_locks.setdefault(dataset_id, threading.Lock())
+
+    def _mark_used(self, dataset_id):
+        # Also recorded in the store, so the retention check of other workers sees it
+        now = time.time()
+        if now - self._last_used.get(dataset_id, 0) < MARK_USED_INTERVAL_SECONDS:
+            return
+        self._last_used[dataset_id] = now
+        if dataset_id in self._on_disk:
+            self.store.mark_used(dataset_id)
+
+    def _prune(self):
+        # At most once a minute, a sweep lists and stats every dataset in the store
+        if self.retention_seconds is None or time.time() - self._pruned_at < MARK_USED_INTERVAL_SECONDS:
+            return
+        self._pruned_at = time.time()
+        self.delete_unused(self.retention_seconds)
+
+    def _check_version(self, dataset, expected_version):
+        if expected_version is not None and dataset.version != expected_version:
+            raise VersionConflict(dataset.dataset_id)
+
+    def _publish(self, dataset):
+        # Write the dataset to the store and swap in the memory-mapped copy
+        self.store.publish(dataset.dataset_id, dataset.table, dataset.meta())
+        self._on_disk.add(dataset.dataset_id)
+        return self._load(dataset.dataset_id)
+
+    def _load(self, dataset_id):
+        loaded = self.store.load(dataset_id)
+        if loaded is None:
+            return None
+        version, table, meta = loaded
+        # Loaded from the store, so later metadata updates are published there too, also in workers
+        # that didn't add the dataset
+        with self._lock:
+            self._on_disk.add(dataset_id)
+        dataset = Dataset(dataset_id, table, meta['summary_row'], meta['columns'], meta['column_types'], version)
+        dataset.data_version = meta.get('data_version', version)
+        dataset.columns_version = meta.get('columns_version', version)
+        dataset.rows_version = meta.get('rows_version', dataset.data_version)
+        dataset.memory_mapped = True
+        return dataset
+
+    def _evict(self):
+        # Drop least recently used datasets until under budget, always keeping the most recent one.
+        # Datasets that aren't on disk yet are written to the store first so they can be reloaded.
+        while len(self._in_memory) > 1 and self.memory_usage() > self.memory_budget_bytes:
+            dataset_id, (dataset, _) = self._in_memory.popitem(last=False)
+            if dataset_id not in self._on_disk:
+                self.store.publish(dataset_id, dataset.table, dataset.meta(), min_version=dataset.version)
+                self._on_disk.add(dataset_id)
@@ -0,0 +1,353 @@
+import json
+import math
+import os
+import re
+import shutil
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process publish lock, run a single worker process there
+    fcntl = None
+
+# Dataset IDs are uuid4 hex strings, also the names of their directories in the store
+DATASET_ID = re.compile(r'[0-9a-f]{32}')
+
+# String columns with at most this share of distinct values are dictionary-encoded, up to the
+# int16 index range: a larger dictionary saves little, and the streaming pass tracks at most that many values
+DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+DICTIONARY_MAX_VALUES = int(np.iinfo(np.int16).max)
+INTEGER_TYPES = (pa.int8(), pa.int16(), pa.int32(), pa.int64())
+
+
+def smallest_integer_type(low, high):
+    """The smallest signed integer type holding low..high, or None if int64 doesn't."""
+    for integer_type in INTEGER_TYPES:
+        info = np.iinfo(integer_type.to_pandas_dtype())
+        if info.min <= low and high <= info.max:
+            return integer_type
+    return None
+
+
+def compact_array(array):
+    """
+    Store the column in its most compact lossless type: integers, and floats that only hold whole
+    numbers, in the smallest integer type that fits; other floats as float32 when that loses
+    nothing; strings with few distinct values (see DICTIONARY_MAX_VALUES) dictionary-encoded. Missing values stay nulls in
+    the validity bitmap, booleans stay bit-packed.
+    """
+    data_type = array.type
+    if array.null_count == len(array):
+        return array
+
+    if pa.types.is_floating(data_type):
+        if pc.all(pc.and_(pc.is_finite(array), pc.equal(pc.floor(array), array))).as_py():
+            try:
+                array, data_type = pc.cast(array, pa.int64()), pa.int64()
+            except pa.ArrowInvalid:
+                # Whole numbers beyond the int64 range
+                return array
+        else:
+            narrowed = pc.cast(array, pa.float32(), safe=False)
+            return narrowed if pc.all(pc.equal(pc.cast(narrowed, data_type), array)).as_py() else array
+
+    if pa.types.is_integer(data_type):
+        bounds = pc.min_max(array)
+        integer_type = smallest_integer_type(bounds['min'].as_py(), bounds['max'].as_py())
+        return array if integer_type is None or integer_type == data_type else pc.cast(array, integer_type)
+
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        distinct = pc.count_distinct(array).as_py()
+        if distinct <= min(DICTIONARY_MAX_DISTINCT_RATIO * (len(array) - array.null_count), DICTIONARY_MAX_VALUES):
+            return pc.cast(pc.dictionary_encode(array), pa.dictionary(smallest_integer_type(0, distinct), data_type))
+    return array
+
+
+def compact_table(table):
+    return pa.Table.from_arrays([compact_array(column.combine_chunks()) for column in table.columns], names=table.column_names)
+
+
+class CompactTypes:
+    """
+    The types compact_array gives the columns of a table that is read one record batch at a time.
+    add() gathers what the rules look at from each batch (range, whole numbers, float32 round
+    trips, distinct strings), types() applies them to the whole column and compact() casts a
+    batch to those types. A column's distinct strings are dropped as soon as there are more than
+    DICTIONARY_MAX_VALUES of them, so memory stays bounded however large the file.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.stats = {field.name: {'count': 0, 'min': None, 'max': None, 'whole': True, 'float32': True, 'distinct': set()}
+                      for field in schema}
+
+    def add(self, batch):
+        for field, array in zip(self.schema, batch.columns):
+            stats = self.stats[field.name]
+            valid = len(array) - array.null_count
+            if not valid:
+                continue
+            stats['count'] += valid
+            if pa.types.is_floating(field.type) or pa.types.is_integer(field.type):
+                bounds = pc.min_max(array)
+                low, high = bounds['min'].as_py(), bounds['max'].as_py()
+                stats['min'] = low if stats['min'] is None else min(stats['min'], low)
+                stats['max'] = high if stats['max'] is None else max(stats['max'], high)
+            if pa.types.is_floating(field.type):
+                if stats['whole']:
+                    stats['whole'] = pc.all(pc.and_(pc.is_finite(array), pc.equal(pc.floor(array), array))).as_py()
+                if stats['float32']:
+                    narrowed = pc.cast(array, pa.float32(), safe=False)
+                    stats['float32'] = pc.all(pc.equal(pc.cast(narrowed, field.type), array)).as_py()
+            elif (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)) and stats['distinct'] is not None:
+                unique = pc.drop_null(pc.unique(array))
+                if len(unique) <= DICTIONARY_MAX_VALUES:
+                    stats['distinct'].update(unique.to_pylist())
+                if len(unique) > DICTIONARY_MAX_VALUES or len(stats['distinct']) > DICTIONARY_MAX_VALUES:
+                    # Can no longer be dictionary-encoded
+                    stats['distinct'] = None
+
+    def types(self):
+        types = []
+        for field in self.schema:
+            stats, data_type = self.stats[field.name], field.type
+            if not stats['count']:
+                types.append(data_type)
+            elif pa.types.is_floating(data_type) and stats['whole']:
+                types.append(smallest_integer_type(stats['min'], stats['max']) or data_type)
+            elif pa.types.is_floating(data_type):
+                types.append(pa.float32() if stats['float32'] else data_type)
+            elif pa.types.is_integer(data_type):
+                types.append(smallest_integer_type(stats['min'], stats['max']) or data_type)
+            elif (pa.types.is_string(data_type) or pa.types.is_large_string(data_type)) and stats['distinct'] is not None \
+                    and len(stats['distinct']) <= min(DICTIONARY_MAX_DISTINCT_RATIO * stats['count'], DICTIONARY_MAX_VALUES):
+                types.append(pa.dictionary(smallest_integer_type(0, len(stats['distinct'])), data_type))
+            else:
+                types.append(data_type)
+        return pa.schema([(field.name, data_type) for field, data_type in zip(self.schema, types)], metadata=self.schema.metadata)
+
+    @staticmethod
+    def compact(batch, schema):
+        arrays = []
+        for array, field in zip(batch.columns, schema):
+            if array.type == field.type:
+                arrays.append(array)
+            elif pa.types.is_dictionary(field.type):
+                encoded = pc.dictionary_encode(array)
+                arrays.append(pa.DictionaryArray.from_arrays(pc.cast(encoded.indices, field.type.index_type), encoded.dictionary))
+            else:
+                arrays.append(pc.cast(array, field.type, safe=not pa.types.is_floating(field.type)))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def to_arrow_table(df):
+    """Convert a DataFrame to an Arrow table in compact column types, storing mixed-type object columns as strings."""
+    arrays = []
+    for col in df.columns:
+        try:
+            arrays.append(pa.array(df[col], from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            values = [None if value is None or (isinstance(value, float) and math.isnan(value)) else str(value) for value in df[col]]
+            arrays.append(pa.array(values, type=pa.string()))
+    return compact_table(pa.Table.from_arrays(arrays, names=[str(col) for col in df.columns]))
+
+
+def json_default(value):
+    # Summary rows can contain numpy scalars from the summarizers
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def write_arrow_file(path, table):
+    """Write the table as an Arrow IPC file, replacing path atomically."""
+    # The IPC file format allows one dictionary per column, appended rows bring their own
+    table = table.unify_dictionaries()
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}")
+    with pa.OSFile(tmp, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def write_json_file(path, data):
+    """Write data as JSON, replacing path atomically."""
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}")
+    with open(tmp, 'w') as f:
+        json.dump(data, f, default=json_default)
+    os.replace(tmp, path)
+
+
+def read_arrow_file(path):
+    """Memory-map an Arrow IPC file, the returned table references the mapped pages without copying."""
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+class VersionConflict(Exception):
+    """Another writer published a new version of the dataset since the version a change was made to."""
+
+
+class DatasetStore:
+    """
+    Datasets on disk as Arrow IPC files that any process can memory-map without copying.
+
+    Each dataset lives in <root>/<dataset_id>/ with one v<version>.arrow data file and one
+    v<version>.json metadata file per version, plus a CURRENT file naming the live version.
+    CURRENT is replaced atomically, so readers in other processes switch to a new version
+    only once it has been fully written. Publishing holds a lock file in the dataset's directory,
+    so a writer can require that the version its change was made to is still current.
+    CURRENT's modification time is when the dataset was last published or marked used.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, dataset_id):
+        return os.path.join(self.root, dataset_id)
+
+    def current_version(self, dataset_id):
+        try:
+            with open(os.path.join(self._dir(dataset_id), 'CURRENT')) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def temp_path(self):
+        """A path for writing a data file that will be handed to publish_file, on the same filesystem as the store."""
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, f".ingest-{uuid.uuid4().hex}.arrow")
+
+    def data_path(self, dataset_id, version):
+        return os.path.join(self._dir(dataset_id), f"v{version}.arrow")
+
+    def publish(self, dataset_id, table, meta, min_version=1, expected_version=None):
+        """Write a new version of the dataset and make it current, returning the version number."""
+        tmp = self.temp_path()
+        write_arrow_file(tmp, table)
+        return self.publish_file(dataset_id, tmp, meta, min_version, expected_version)
+
+    def publish_file(self, dataset_id, arrow_path, meta, min_version=1, expected_version=None):
+        """
+        Move an Arrow IPC file written at temp_path() into the store as a new version, returning the version number.
+        With expected_version, raises VersionConflict (and removes the file) if that is no longer the current version.
+        """
+        dataset_dir = self._dir(dataset_id)
+        os.makedirs(dataset_dir, exist_ok=True)
+        with self._publish_lock(dataset_dir):
+            try:
+                self._check_version(dataset_id, expected_version)
+            except VersionConflict:
+                os.remove(arrow_path)
+                raise
+            version = self._claim_version(dataset_dir, max((self.current_version(dataset_id) or 0) + 1, min_version))
+
+            os.replace(arrow_path, os.path.join(dataset_dir, f"v{version}.arrow"))
+            write_json_file(os.path.join(dataset_dir, f"v{version}.json"), meta)
+
+            self._write_current(dataset_dir, version)
+        self._remove_old_versions(dataset_dir, version)
+        return version
+
+    def publish_meta(self, dataset_id, table_version, meta, expected_version=None):
+        """
+        Publish a new version that only changes the metadata, sharing the data file of table_version.
+        expected_version as for publish_file.
+        """
+        dataset_dir = self._dir(dataset_id)
+        with self._publish_lock(dataset_dir):
+            self._check_version(dataset_id, expected_version)
+            version = self._claim_version(dataset_dir, (self.current_version(dataset_id) or 0) + 1)
+            os.link(os.path.join(dataset_dir, f"v{table_version}.arrow"), os.path.join(dataset_dir, f"v{version}.arrow"))
+            write_json_file(os.path.join(dataset_dir, f"v{version}.json"), meta)
+
+            self._write_current(dataset_dir, version)
+        self._remove_old_versions(dataset_dir, version)
+        return version
+
+    def load(self, dataset_id):
+        """Memory-map the current version, returning (version, table, meta) or None if it doesn't exist."""
+        version = self.current_version(dataset_id)
+        if version is None:
+            return None
+        dataset_dir = self._dir(dataset_id)
+        table = read_arrow_file(os.path.join(dataset_dir, f"v{version}.arrow"))
+        with open(os.path.join(dataset_dir, f"v{version}.json")) as f:
+            meta = json.load(f)
+        return version, table, meta
+
+    def delete(self, dataset_id):
+        """Remove every version of the dataset. Files other processes have mapped stay readable until unmapped."""
+        dataset_dir = self._dir(dataset_id)
+        if not os.path.isdir(dataset_dir):
+            return
+        # Not while another process is publishing a version of it
+        with self._publish_lock(dataset_dir):
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+
+    def dataset_ids(self):
+        """IDs of the datasets in the store."""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        # Skips temporary ingest files and other directories sharing the root, like upload job progress
+        return [name for name in names if DATASET_ID.fullmatch(name)]
+
+    def mark_used(self, dataset_id):
+        try:
+            os.utime(os.path.join(self._dir(dataset_id), 'CURRENT'))
+        except FileNotFoundError:
+            pass
+
+    def last_used(self, dataset_id):
+        """When the dataset was last published or marked used, or None while it has no current version."""
+        try:
+            return os.stat(os.path.join(self._dir(dataset_id), 'CURRENT')).st_mtime
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _publish_lock(self, dataset_dir):
+        # Held by one process at a time, so checking the current version and switching CURRENT is a compare-and-swap
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(dataset_dir, 'LOCK'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _check_version(self, dataset_id, expected_version):
+        if expected_version is not None and self.current_version(dataset_id) != expected_version:
+            raise VersionConflict(dataset_id)
+
+    def _claim_version(self, dataset_dir, version):
+        # Another worker may be publishing the same dataset, the lock file makes each version number unique
+        while True:
+            try:
+                fd = os.open(os.path.join(dataset_dir, f"v{version}.lock"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return version
+            except FileExistsError:
+                version += 1
+
+    def _write_current(self, dataset_dir, version):
+        if version <= (self.current_version(os.path.basename(dataset_dir)) or 0):
+            return
+        write_json_file(os.path.join(dataset_dir, 'CURRENT'), version)
+
+    def _remove_old_versions(self, dataset_dir, version):
+        # Keep the previous version for readers that resolved CURRENT just before the switch,
+        # mapped files stay readable after they are unlinked
+        for name in os.listdir(dataset_dir):
+            stem, ext = os.path.splitext(name)
+            if ext in ('.arrow', '.json', '.lock') and stem.startswith('v') and stem[1:].isdigit() and int(stem[1:]) < version - 1:
+                os.remove(os.path.join(dataset_dir, name))
@@ -1,40 +1,13 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Use Agg backend for non-interactive plots
-from io import BytesIO
-import base64
-import seaborn as sns
-import os
-from datetime import datetime
+from datetime import date, datetime
 from collections import Counter
 import numpy as np
 from dateutil import parser
 
 
-def summarize_date_time(df, column_name):
-    # Attempt to parse dates using dateutil.parser
-    def try_parse_date(value):
-        try:
-            # Try to parse the value; if successful, return the parsed date
-            return parser.parse(value)
-        except (parser.ParserError, TypeError, ValueError):
-            # If parsing fails, return NaT (Not a Time)
-            return pd.NaT
-
-    # Apply the parsing function to the column
-    date_series = df[column_name].apply(try_parse_date)
-
-    # Convert dates to strings for ECharts
-    date_series_str = date_series.dropna().dt.strftime("%Y-%m-%d")
-    
-    # Get date counts
-    date_counts = Counter(date_series_str)
-    sorted_dates = sorted(date_counts.keys())
-    sorted_counts = [date_counts[date] for date in sorted_dates]
-
-    # Generate ECharts options for date distribution
-    chart_options = {
+def date_time_chart_options(column_name, sorted_dates, sorted_counts):
+    # ECharts options for the distribution of dates
+    return {
         "title": {
             # "text": f"Distribution of {column_name}"
         },
@@ -68,6 +41,35 @@ def summarize_date_time(df, column_name):
             }
         ]
     }
+
+
+# Attempt to parse dates using dateutil.parser
+def try_parse_date(value):
+    # Already a date, e.g. from a Parquet or Arrow timestamp/date column
+    if isinstance(value, date):
+        return pd.Timestamp(value)
+    try:
+        # Try to parse the value; if successful, return the parsed date
+        return parser.parse(value)
+    except (parser.ParserError, TypeError, ValueError):
+        # If parsing fails, return NaT (Not a Time)
+        return pd.NaT
+
+
+def summarize_date_time(df, column_name):
+    # Apply the parsing function to the column
+    date_series = df[column_name].apply(try_parse_date)
+
+    # Convert dates to strings for ECharts
+    date_series_str = date_series.dropna().dt.strftime("%Y-%m-%d")
+    
+    # Get date counts
+    date_counts = Counter(date_series_str)
+    sorted_dates = sorted(date_counts.keys())
+    sorted_counts = [date_counts[date] for date in sorted_dates]
+
+    # Generate ECharts options for date distribution
+    chart_options = date_time_chart_options(column_name, sorted_dates, sorted_counts)
     
     date_summary = {
         'chart_options': chart_options  # Include ECharts options in the summary
@@ -77,25 +79,9 @@ def summarize_date_time(df, column_name):
 
 
 
-def summarize_numeric(df, column_name):
-    # Calculate summary statistics
-    summary = {}
-
-    # Drop NA values
-    data = df[column_name].dropna()
-
-    # Calculate basic statistics
-    mean_value = data.mean()
-    median_value = data.median()
-    std_dev = data.std()
-
-    # Calculate histogram data (dynamic bin size based on data range)
-    bin_count = 30  # Set the number of bins
-    counts, bin_edges = np.histogram(data, bins=bin_count)
-    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
-
-    # Convert histogram data to ECharts format with meaningful labels
-    chart_options = {
+def numeric_chart_options(column_name, counts, bin_centers, mean_value, median_value):
+    # ECharts options for the histogram of a numeric column
+    return {
         "title": {
             "subtext": f"Mean: {mean_value:.2f}, Median: {median_value:.2f}",
             "textStyle": {
@@ -146,26 +132,36 @@ def summarize_numeric(df, column_name):
         ]
     }
 
+
+def summarize_numeric(df, column_name):
+    # Calculate summary statistics
+    summary = {}
+
+    # Drop NA values
+    data = df[column_name].dropna()
+
+    # Calculate basic statistics
+    mean_value = data.mean()
+    median_value = data.median()
+    std_dev = data.std()
+
+    # Calculate histogram data (dynamic bin size based on data range)
+    bin_count = 30  # Set the number of bins
+    counts, bin_edges = np.histogram(data, bins=bin_count)
+    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+
+    # Convert histogram data to ECharts format with meaningful labels
+    chart_options = numeric_chart_options(column_name, counts, bin_centers, mean_value, median_value)
+
     # Include the ECharts options in the summary
     summary['chart_options'] = chart_options
 
     return summary
 
 
-def summarize_categorical(df, column_name):
-    # Get the value counts
-    value_counts = df[column_name].value_counts()
-    
-    # Summary statistics
-    summary = {}
-    
-    # Top 5 categories and frequencies
-    top_categories = value_counts.head(5)
-    categories = top_categories.index.tolist()
-    frequencies = top_categories.values.tolist()
-    
-    # Generate ECharts options
-    chart_options = {
+def categorical_chart_options(column_name, categories, frequencies):
+    # ECharts options for the top categories
+    return {
         "title": {
             # "text": f"Top Categories",
             "textStyle": {
@@ -209,6 +205,22 @@ def summarize_categorical(df, column_name):
             }
         ]
     }
+
+
+def summarize_categorical(df, column_name):
+    # Get the value counts
+    value_counts = df[column_name].value_counts()
+    
+    # Summary statistics
+    summary = {}
+    
+    # Top 5 categories and frequencies
+    top_categories = value_counts.head(5)
+    categories = top_categories.index.tolist()
+    frequencies = top_categories.values.tolist()
+    
+    # Generate ECharts options
+    chart_options = categorical_chart_options(column_name, categories, frequencies)
     
     # Include ECharts options in the summary
     summary['chart_options'] = chart_options
@@ -231,19 +243,9 @@ def summarize_identifiers(df, column_name):
     }
     return summary
 
-def summarize_financial(df, column_name):
-    summary = {}
-    
-    # Compute boxplot statistics
-    data = df[column_name].dropna()
-    q1 = data.quantile(0.25)
-    q3 = data.quantile(0.75)
-    iqr = q3 - q1
-    lower_bound = q1 - 1.5 * iqr
-    upper_bound = q3 + 1.5 * iqr
-    
+def financial_chart_options(column_name, data, q1, q3):
     # ECharts options for the boxplot
-    chart_options = {
+    return {
         "title": {
             # "text": f"Boxplot of {column_name}",
             "textStyle": {
@@ -295,6 +297,21 @@ def summarize_financial(df, column_name):
             }
         ]
     }
+
+
+def summarize_financial(df, column_name):
+    summary = {}
+    
+    # Compute boxplot statistics
+    data = df[column_name].dropna()
+    q1 = data.quantile(0.25)
+    q3 = data.quantile(0.75)
+    iqr = q3 - q1
+    lower_bound = q1 - 1.5 * iqr
+    upper_bound = q3 + 1.5 * iqr
+    
+    # ECharts options for the boxplot
+    chart_options = financial_chart_options(column_name, data, q1, q3)
     
     # Include ECharts options in the summary
     summary['chart_options'] = chart_options
@@ -302,17 +319,9 @@ def summarize_financial(df, column_name):
     return summary
 
 
-def summarize_geospatial(df, column_name):
-    # Summary statistics
-    summary = {}
-    
-    # Top 5 locations
-    top_locations = df[column_name].value_counts().head(5)
-    locations = top_locations.index.tolist()
-    frequencies = top_locations.values.tolist()
-    
-    # ECharts options for the bar chart
-    chart_options = {
+def geospatial_chart_options(column_name, locations, frequencies):
+    # ECharts options for the top locations
+    return {
         "title": {
             # "text": f"Top 5 Locations of {column_name}",
             "textStyle": {
@@ -354,6 +363,19 @@ def summarize_geospatial(df, column_name):
             }
         ]
     }
+
+
+def summarize_geospatial(df, column_name):
+    # Summary statistics
+    summary = {}
+    
+    # Top 5 locations
+    top_locations = df[column_name].value_counts().head(5)
+    locations = top_locations.index.tolist()
+    frequencies = top_locations.values.tolist()
+    
+    # ECharts options for the bar chart
+    chart_options = geospatial_chart_options(column_name, locations, frequencies)
     
     # Include ECharts options in the summary
     summary['chart_options'] = chart_options
@@ -361,32 +383,9 @@ def summarize_geospatial(df, column_name):
     return summary
 
 
-def summarize_boolean(df, column_name):
-    # Normalize the column to boolean
-    def normalize_to_bool(value):
-        if pd.isnull(value):
-            return False  # Consider NaN values as False
-        if isinstance(value, bool):
-            return value
-        if isinstance(value, str):
-            # Convert string representations to boolean
-            return value.strip().lower() in ['true', '1', 'yes']
-        if isinstance(value, (int, float)):
-            # Consider non-zero numbers as True
-            return bool(value)
-        return False  # Default case if none of the above match
-
-    # Apply the normalization to the column
-    df[column_name] = df[column_name].apply(normalize_to_bool)
-
-    # Summary statistics
-    true_count = df[column_name].sum()
-    false_count = df[column_name].count() - true_count  # Total count minus true_count
-
-    summary = {}
-
-    # ECharts options for the pie chart
-    chart_options = {
+def boolean_chart_options(column_name, true_count, false_count):
+    # ECharts options for the True/False pie chart
+    return {
         "title": {
             "textStyle": {
                 "fontSize": 14  # Smaller font size for the title
@@ -425,6 +424,35 @@ def summarize_boolean(df, column_name):
         ]
     }
 
+
+# Normalize a value to boolean
+def normalize_to_bool(value):
+    if pd.isnull(value):
+        return False  # Consider NaN values as False
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, str):
+        # Convert string representations to boolean
+        return value.strip().lower() in ['true', '1', 'yes']
+    if isinstance(value, (int, float, np.number)):
+        # Consider non-zero numbers as True
+        return bool(value)
+    return False  # Default case if none of the above match
+
+
+def summarize_boolean(df, column_name):
+    # Apply the normalization to the column
+    df[column_name] = df[column_name].apply(normalize_to_bool)
+
+    # Summary statistics
+    true_count = df[column_name].sum()
+    false_count = df[column_name].count() - true_count  # Total count minus true_count
+
+    summary = {}
+
+    # ECharts options for the pie chart
+    chart_options = boolean_chart_options(column_name, true_count, false_count)
+
     # Include ECharts options in the summary
     summary['chart_options'] = chart_options
 
@@ -465,16 +493,9 @@ def summarize_special_symbols(df, column_name):
     }
     return summary
 
-def summarize_ratings_scoring(df, column_name):
-    summary = {}
-    
-    # Compute the distribution of scores
-    score_counts = df[column_name].value_counts().sort_index()
-    scores = score_counts.index.tolist()
-    counts = score_counts.values.tolist()
-    
-    # ECharts options for the bar chart
-    chart_options = {
+def ratings_scoring_chart_options(column_name, scores, counts):
+    # ECharts options for the distribution of scores
+    return {
         "title": {
             # "text": f"Distribution for {column_name}",
             "textStyle": {
@@ -522,6 +543,18 @@ def summarize_ratings_scoring(df, column_name):
             }
         ]
     }
+
+
+def summarize_ratings_scoring(df, column_name):
+    summary = {}
+    
+    # Compute the distribution of scores
+    score_counts = df[column_name].value_counts().sort_index()
+    scores = score_counts.index.tolist()
+    counts = score_counts.values.tolist()
+    
+    # ECharts options for the bar chart
+    chart_options = ratings_scoring_chart_options(column_name, scores, counts)
     
     # Include ECharts options in the summary
     summary['chart_options'] = chart_options
@@ -529,21 +562,9 @@ def summarize_ratings_scoring(df, column_name):
     return summary
 
 
-import pandas as pd
-import numpy as np
-
-def summarize_duration(df, column_name):
-    # Convert to timedelta and compute summary statistics
-    duration_series = pd.to_timedelta(df[column_name], errors='coerce')
-    summary = {}
-    
-    # Compute histogram data
-    durations_seconds = duration_series.dropna().dt.total_seconds()
-    hist, bin_edges = np.histogram(durations_seconds, bins=30)
-    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
-    
-    # ECharts options for the histogram
-    chart_options = {
+def duration_chart_options(column_name, hist, bin_centers):
+    # ECharts options for the histogram of durations
+    return {
         "title": {
             # "text": f"Distribution of Duration in {column_name}",
             "textStyle": {
@@ -585,6 +606,20 @@ def summarize_duration(df, column_name):
             }
         ]
     }
+
+
+def summarize_duration(df, column_name):
+    # Convert to timedelta and compute summary statistics
+    duration_series = pd.to_timedelta(df[column_name], errors='coerce')
+    summary = {}
+    
+    # Compute histogram data
+    durations_seconds = duration_series.dropna().dt.total_seconds()
+    hist, bin_edges = np.histogram(durations_seconds, bins=30)
+    bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+    
+    # ECharts options for the histogram
+    chart_options = duration_chart_options(column_name, hist, bin_centers)
     
     # Include ECharts options in the summary
     summary['chart_options'] = chart_options
@@ -593,14 +628,9 @@ def summarize_duration(df, column_name):
 
 
 
-def summarize_survey_feedback(df, column_name):
-    # Compute value counts
-    value_counts = df[column_name].value_counts()
-    summary = {}
-    
-    # Generate ECharts options for the top 5 responses
-    top_responses = value_counts.head(5)
-    chart_options = {
+def survey_feedback_chart_options(column_name, top_responses):
+    # ECharts options for the top responses
+    return {
         "title": {
             # "text": f"Top 5 Survey/Feedback Responses for {column_name}",
             "textStyle": {
@@ -642,6 +672,16 @@ def summarize_survey_feedback(df, column_name):
             }
         ]
     }
+
+
+def summarize_survey_feedback(df, column_name):
+    # Compute value counts
+    value_counts = df[column_name].value_counts()
+    summary = {}
+    
+    # Generate ECharts options for the top 5 responses
+    top_responses = value_counts.head(5)
+    chart_options = survey_feedback_chart_options(column_name, top_responses)
     
     # Include ECharts options in the summary
     summary['chart_options'] = chart_options
@@ -0,0 +1,146 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Upper bounds in seconds, from a cached page (milliseconds) to an upload with LLM calls (minutes)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Stage timings of the request being handled in this thread, for its Server-Timing header.
+# None outside requests, e.g. in background upload jobs, whose stages only go to the histograms.
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ('le',)
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                # Prometheus buckets are cumulative
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(names, label_values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(names, label_values + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {series[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram('ag_grid_stage_seconds', 'Time spent in each processing stage.', ['stage'])
+SUMMARIZER_SECONDS = Histogram('ag_grid_summarizer_seconds', 'Time spent in the summary handler of each column type.', ['column_type'])
+SUMMARIZER_ERRORS = Counter('ag_grid_summarizer_errors_total', 'Columns whose summary handler raised.', ['column_type'])
+REQUEST_SECONDS = Histogram('ag_grid_request_seconds', 'Request latency by endpoint.', ['endpoint'])
+REQUESTS = Counter('ag_grid_requests_total', 'Requests by endpoint and status code.', ['endpoint', 'status'])
+CACHE_LOOKUPS = Counter('ag_grid_cache_lookups_total', 'Cache lookups by cache and result.', ['cache', 'result'])
+
+ALL_METRICS = (STAGE_SECONDS, SUMMARIZER_SECONDS, SUMMARIZER_ERRORS, REQUEST_SECONDS, REQUESTS, CACHE_LOOKUPS)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return '\n'.join(line for metric in ALL_METRICS for line in metric.render()) + '\n'
+
+
+@contextmanager
+def stage(name):
+    """Time the block as a stage, in the stage histogram and the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def timed(name):
+    """Decorator timing every call of the function as a stage."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def summarizer(column_type):
+    """Time a summary handler by column type, counting the calls that raise."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SUMMARIZER_ERRORS.inc(column_type)
+        raise
+    finally:
+        SUMMARIZER_SECONDS.observe(time.perf_counter() - started, column_type)
+
+
+def start_request_timings():
+    _request_timings.set([])
+
+
+def finish_request_timings():
+    """The stages timed during the request, summed per stage in the order they first ran."""
+    timings = _request_timings.get() or []
+    _request_timings.set(None)
+    totals = {}
+    for name, elapsed in timings:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return list(totals.items())
+
+
+def server_timing(timings):
+    """Server-Timing header value for (stage, seconds) pairs."""
+    return ', '.join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings)
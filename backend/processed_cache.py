@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+from dataset_store import read_arrow_file, write_arrow_file, write_json_file
+
+
+def cache_key(content_hash, **options):
+    """Key for a processed upload: the hash of the file's bytes plus every option that changes how it is processed."""
+    return hashlib.sha256(json.dumps([content_hash, options], sort_keys=True).encode()).hexdigest()
+
+
+class ProcessedDatasetCache:
+    """
+    Processed uploads on disk, keyed by content hash, with a size cap and LRU eviction.
+
+    Each entry is a directory holding the columnar data as an Arrow IPC file and a JSON file
+    with the column types, column definitions and summary row, so a repeat upload of the same
+    file skips parsing, LLM classification and summarization. An entry's modification time is
+    refreshed on every hit and the least recently used entries are removed beyond max_bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        """Return (table, meta) for the cached upload, or None on a miss."""
+        if not self.enabled:
+            return None
+        entry_dir = os.path.join(self.root, key)
+        try:
+            table = read_arrow_file(os.path.join(entry_dir, 'data.arrow'))
+            with open(os.path.join(entry_dir, 'meta.json')) as f:
+                meta = json.load(f)
+            os.utime(entry_dir)
+        except FileNotFoundError:
+            # Not cached, or evicted by another worker while being read
+            return None
+        return table, meta
+
+    def link_data(self, key, path):
+        """Hardlink the cached data file to path (copying it across filesystems), returning False on a miss."""
+        source = os.path.join(self.root, key, 'data.arrow')
+        try:
+            os.link(source, path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # The cache and the destination are on different filesystems
+            try:
+                shutil.copyfile(source, path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def put(self, key, table, meta, data_path=None):
+        """Cache a processed upload. data_path, if given, is the table's Arrow IPC file, hardlinked instead of rewritten."""
+        if not self.enabled:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f".{key}.{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        data_file = os.path.join(tmp_dir, 'data.arrow')
+        linked = False
+        if data_path:
+            try:
+                os.link(data_path, data_file)
+                linked = True
+            except OSError:
+                pass
+        if not linked:
+            write_arrow_file(data_file, table)
+        write_json_file(os.path.join(tmp_dir, 'meta.json'), meta)
+        try:
+            os.rename(tmp_dir, os.path.join(self.root, key))
+        except OSError:
+            # Another worker cached the same upload first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            if name.startswith('.') or not os.path.isdir(entry_dir):
+                continue
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+            except FileNotFoundError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
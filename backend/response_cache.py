@@ -0,0 +1,42 @@
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Serialized response bodies keyed by ETag, with LRU eviction beyond max_entries bodies or
+    max_bytes in total. ETags carry the dataset version, so a new version never hits the bodies
+    of the old one and they age out of the cache.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._bodies = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            body = self._bodies.get(etag)
+            if body is not None:
+                self._bodies.move_to_end(etag)
+            return body
+
+    def put(self, etag, body):
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._bodies.pop(etag, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._bodies[etag] = body
+            self._bytes += len(body)
+            while len(self._bodies) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+            self._bytes = 0
@@ -0,0 +1,126 @@
+"""
+Summary handlers by column type, as a registry of plugins imported on first use.
+
+A handler takes (df, column_name) and returns the summary dict of that column, with optional
+'chart_options'. Handlers are named "module:function" and only imported when a column of their
+type is first summarized, so starting the app doesn't pay for every handler's dependencies.
+Other packages add or replace handlers by calling register_summarizer, or without code changes
+through an entry point in the "ag_grid_summarizers" group named after the column type:
+
+    [project.entry-points.ag_grid_summarizers]
+    "Chemical Formula" = "my_package.summaries:summarize_formula"
+
+Handlers registered with register_summarizer take precedence over entry points, and both over
+the built-in handlers.
+"""
+import importlib
+import threading
+from collections.abc import Mapping
+from importlib.metadata import entry_points
+
+ENTRY_POINT_GROUP = 'ag_grid_summarizers'
+
+# The built-in handler of each column type
+BUILTIN_SUMMARIZERS = {
+    "Date/Time": "functions_v2:summarize_date_time",
+    "Numeric": "functions_v2:summarize_numeric",
+    "Categorical": "functions_v2:summarize_categorical",
+    "Text": "functions_v2:summarize_text",
+    "Identifiers": "functions_v2:summarize_identifiers",
+    "Financial": "functions_v2:summarize_financial",
+    "Geospatial": "functions_v2:summarize_geospatial",
+    "Boolean": "functions_v2:summarize_boolean",
+    "Binary": "functions_v2:summarize_binary",
+    "Contact Information": "functions_v2:summarize_contact_information",
+    "Aggregated/Mixed Data": "functions_v2:summarize_aggregated_mixed",
+    "Special Symbols": "functions_v2:summarize_special_symbols",
+    "Ratings/Scoring": "functions_v2:summarize_ratings_scoring",
+    "Duration": "functions_v2:summarize_duration",
+    "Survey/Feedback": "functions_v2:summarize_survey_feedback",
+    "File References": "functions_v2:summarize_file_references",
+    "Miscellaneous": "functions_v2:summarize_miscellaneous",
+    "Names": "functions_v2:summarize_names",
+}
+
+
+def load_handler(spec):
+    """Import the function named by a "module:function" spec."""
+    module_name, _, attribute = spec.partition(':')
+    if not module_name or not attribute:
+        raise ValueError(f"Summarizer '{spec}' is not of the form 'module:function'")
+    handler = importlib.import_module(module_name)
+    for name in attribute.split('.'):
+        handler = getattr(handler, name)
+    return handler
+
+
+class SummarizerRegistry(Mapping):
+    """
+    Read-only mapping of column type to handler function, resolving each handler on first lookup.
+    Unknown column types raise KeyError; a handler that fails to import raises its ImportError
+    or AttributeError on every lookup, so it surfaces where the column is summarized.
+    """
+
+    def __init__(self, builtins, entry_point_group=None):
+        self.builtins = dict(builtins)
+        self.entry_point_group = entry_point_group
+        self._entry_points = None
+        self._registered = {}
+        self._loaded = {}
+        # Reentrant: a plugin module may call register_summarizer while it is being imported
+        self._lock = threading.RLock()
+
+    def register(self, column_type, handler):
+        """Add or replace the handler of a column type: a function or a "module:function" spec."""
+        if not callable(handler) and not isinstance(handler, str):
+            raise TypeError(f"Summarizer for '{column_type}' must be a function or a 'module:function' string")
+        with self._lock:
+            self._registered[column_type] = handler
+            self._loaded.pop(column_type, None)
+
+    def _specs(self):
+        # Entry points are read once, on the first lookup rather than at import
+        if self._entry_points is None:
+            found = {}
+            if self.entry_point_group:
+                for entry_point in entry_points(group=self.entry_point_group):
+                    found[entry_point.name] = entry_point.value
+            self._entry_points = found
+        return {**self.builtins, **self._entry_points, **self._registered}
+
+    def is_builtin(self, column_type):
+        """Whether the column type is summarized by its built-in handler, not one added by a plugin."""
+        with self._lock:
+            spec = self._specs().get(column_type)
+        return spec is not None and spec == self.builtins.get(column_type)
+
+    def __getitem__(self, column_type):
+        with self._lock:
+            handler = self._loaded.get(column_type)
+            if handler is not None:
+                return handler
+            spec = self._specs()[column_type]
+            handler = load_handler(spec) if isinstance(spec, str) else spec
+            self._loaded[column_type] = handler
+            return handler
+
+    def __contains__(self, column_type):
+        # Membership must not import the handler
+        with self._lock:
+            return column_type in self._specs()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._specs()))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._specs())
+
+
+column_type_handlers = SummarizerRegistry(BUILTIN_SUMMARIZERS, ENTRY_POINT_GROUP)
+
+
+def register_summarizer(column_type, handler):
+    """Add or replace the summary handler of a column type; see SummarizerRegistry.register."""
+    column_type_handlers.register(column_type, handler)
@@ -0,0 +1,360 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Must match the bin count used by summarize_numeric
+HISTOGRAM_BINS = 30
+
+# The chart builders of functions_v2 are imported where a state is first built or read, like the
+# summary handlers in summarizers, so that importing the app doesn't load them
+
+
+def is_missing(value):
+    return value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value))
+
+
+def as_number(value):
+    """Return the value as a float, or None if it isn't numeric."""
+    if is_missing(value) or isinstance(value, (bool, np.bool_)):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+class Moments:
+    """Running count, mean and sum of squared deviations (Welford), supporting removal and merging."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_array(cls, data):
+        if len(data) == 0:
+            return cls()
+        mean = float(data.mean())
+        return cls(len(data), mean, float(((data - mean) ** 2).sum()))
+
+    @property
+    def variance(self):
+        # Sample variance, like pandas' std()
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.count -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (x - self.mean)
+
+    def merge(self, other):
+        # Chan et al. parallel combination
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+
+
+class NumericState:
+    """
+    Numeric column summary kept current under edits.
+
+    Mean/variance are maintained with Welford updates and the histogram with per-bin increments.
+    The histogram's bin edges span the column's min and max, so when an edit moves either
+    extreme (or removes the value holding it) the histogram is rebuilt, chunk by chunk, on the
+    next read. The median has no exact incremental form; after a change it is interpolated from
+    the histogram like for out-of-core columns, so an edit doesn't cost a pass over the column.
+    """
+
+    def __init__(self, column_name, values):
+        self.column_name = column_name
+        self._rebuild(values)
+
+    def _rebuild(self, values):
+        data = pd.to_numeric(values, errors='coerce').dropna().to_numpy(dtype=float)
+        self.moments = Moments.from_array(data)
+        self.min = float(data.min()) if len(data) else None
+        self.max = float(data.max()) if len(data) else None
+        self.counts, self.edges = np.histogram(data, bins=HISTOGRAM_BINS)
+        self.median = float(np.median(data)) if len(data) else math.nan
+        self.stale_range = False
+        self.changed = False
+
+    @classmethod
+    def from_chunks(cls, column_name, chunks):
+        """
+        Build the state in two passes over the column's chunks without holding the whole column:
+        merged moments and the global range first, then the histogram over that range.
+        The median is interpolated from the histogram.
+        """
+        state = cls.__new__(cls)
+        state.column_name = column_name
+        state._rebuild_from_chunks(chunks)
+        return state
+
+    def _rebuild_from_chunks(self, chunks):
+        self.moments = Moments()
+        self.min = self.max = None
+        for chunk in chunks():
+            data = pd.to_numeric(chunk, errors='coerce').dropna().to_numpy(dtype=float)
+            if len(data):
+                self.moments.merge(Moments.from_array(data))
+                self.min = float(data.min()) if self.min is None else min(self.min, float(data.min()))
+                self.max = float(data.max()) if self.max is None else max(self.max, float(data.max()))
+
+        self.edges = np.histogram_bin_edges([] if self.min is None else [self.min, self.max], bins=HISTOGRAM_BINS)
+        self.counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        if self.min is not None:
+            for chunk in chunks():
+                data = pd.to_numeric(chunk, errors='coerce').dropna().to_numpy(dtype=float)
+                self.counts += np.histogram(data, bins=self.edges)[0]
+        self.median = histogram_median(self.counts, self.edges)
+        self.stale_range = False
+        self.changed = False
+
+    def _bin(self, x):
+        # Same convention as np.histogram: the last bin includes its right edge
+        return min(int(np.searchsorted(self.edges, x, side='right')) - 1, HISTOGRAM_BINS - 1)
+
+    def update(self, removed, added):
+        for x in filter(lambda x: x is not None, map(as_number, removed)):
+            self.moments.remove(x)
+            if x == self.min or x == self.max:
+                self.stale_range = True
+            elif not self.stale_range:
+                self.counts[self._bin(x)] -= 1
+        for x in filter(lambda x: x is not None, map(as_number, added)):
+            self.moments.add(x)
+            if self.min is None or x < self.min or x > self.max:
+                self.stale_range = True
+            elif not self.stale_range:
+                self.counts[self._bin(x)] += 1
+        self.changed = True
+
+    def result(self, chunks):
+        from functions_v2 import numeric_chart_options
+
+        if self.stale_range:
+            self._rebuild_from_chunks(chunks)
+        elif self.changed:
+            self.median = histogram_median(self.counts, self.edges)
+            self.changed = False
+        bin_centers = (self.edges[:-1] + self.edges[1:]) / 2
+        mean = self.moments.mean if self.moments.count else math.nan
+        return {'chart_options': numeric_chart_options(self.column_name, self.counts, bin_centers, mean, self.median)}
+
+
+def histogram_median(counts, edges):
+    """Median interpolated linearly within the histogram bin that holds it."""
+    total = counts.sum()
+    if not total:
+        return math.nan
+    cumulative = np.cumsum(counts)
+    index = int(np.searchsorted(cumulative, total / 2))
+    before = cumulative[index - 1] if index else 0
+    fraction = (total / 2 - before) / counts[index] if counts[index] else 0.0
+    return float(edges[index] + fraction * (edges[index + 1] - edges[index]))
+
+
+class ValueCountsState:
+    """Value counts kept current with per-value deltas, for the top-N and distribution charts."""
+
+    def __init__(self, column_name, column_type, values):
+        self.column_name = column_name
+        self.column_type = column_type
+        # Categorical (dictionary-encoded) columns also count categories without any values
+        self.counts = Counter({value: count for value, count in values.dropna().value_counts().items() if count})
+
+    def _key(self, value):
+        return value
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+
+    def update(self, removed, added):
+        for value in removed:
+            if not is_missing(value):
+                key = self._key(value)
+                self.counts[key] -= 1
+                if self.counts[key] <= 0:
+                    del self.counts[key]
+        for value in added:
+            if not is_missing(value):
+                self.counts[self._key(value)] += 1
+
+    def result(self, chunks):
+        from functions_v2 import (
+            categorical_chart_options, geospatial_chart_options, ratings_scoring_chart_options, survey_feedback_chart_options
+        )
+
+        if self.column_type == "Ratings/Scoring":
+            try:
+                scores = sorted(self.counts)
+            except TypeError:
+                scores = sorted(self.counts, key=str)
+            return {'chart_options': ratings_scoring_chart_options(self.column_name, scores, [self.counts[s] for s in scores])}
+
+        top = self.counts.most_common(5)
+        labels = [label for label, _ in top]
+        frequencies = [count for _, count in top]
+        if self.column_type == "Geospatial":
+            return {'chart_options': geospatial_chart_options(self.column_name, labels, frequencies)}
+        if self.column_type == "Survey/Feedback":
+            return {'chart_options': survey_feedback_chart_options(self.column_name, pd.Series(frequencies, index=labels, dtype='int64'))}
+        return {'chart_options': categorical_chart_options(self.column_name, labels, frequencies)}
+
+
+class DateTimeState(ValueCountsState):
+    """Counts of values per day for the date distribution chart."""
+
+    def __init__(self, column_name, values):
+        from functions_v2 import try_parse_date
+
+        self.column_name = column_name
+        self.column_type = "Date/Time"
+        self.parse_date = try_parse_date
+        self.counts = Counter(self._key(value) for value in values if not is_missing(value))
+        self.counts.pop(None, None)
+
+    def _key(self, value):
+        parsed = self.parse_date(value)
+        return None if parsed is pd.NaT else parsed.strftime("%Y-%m-%d")
+
+    def update(self, removed, added):
+        super().update(removed, added)
+        self.counts.pop(None, None)
+
+    def result(self, chunks):
+        from functions_v2 import date_time_chart_options
+
+        self.counts.pop(None, None)
+        sorted_dates = sorted(self.counts)
+        return {'chart_options': date_time_chart_options(self.column_name, sorted_dates, [self.counts[d] for d in sorted_dates])}
+
+
+class BooleanState:
+    """True/False counts; missing values count as False like in summarize_boolean."""
+
+    def __init__(self, column_name, column_type, values):
+        from functions_v2 import normalize_to_bool
+
+        self.column_name = column_name
+        self.column_type = column_type
+        normalized = [normalize_to_bool(value) for value in values]
+        self.true_count = sum(normalized)
+        self.false_count = len(normalized) - self.true_count
+
+    def merge(self, other):
+        self.true_count += other.true_count
+        self.false_count += other.false_count
+
+    def update(self, removed, added):
+        from functions_v2 import normalize_to_bool
+
+        for value in removed:
+            if normalize_to_bool(value):
+                self.true_count -= 1
+            else:
+                self.false_count -= 1
+        for value in added:
+            if normalize_to_bool(value):
+                self.true_count += 1
+            else:
+                self.false_count += 1
+
+    def result(self, chunks):
+        from functions_v2 import boolean_chart_options
+
+        result = {'chart_options': boolean_chart_options(self.column_name, self.true_count, self.false_count)}
+        if self.column_type == "Binary":
+            # pandas' mode() returns False first on a tie
+            result["Mode"] = None if not (self.true_count or self.false_count) else self.true_count > self.false_count
+        return result
+
+
+class RecomputeState:
+    """
+    Column types without an incremental form: rerun the handler on this column only.
+    With sample_rows, on the first sample_rows rows only, and the result notes the sample size.
+    """
+
+    def __init__(self, column_name, handler, sample_rows=None):
+        self.column_name = column_name
+        self.handler = handler
+        self.sample_rows = sample_rows
+
+    def update(self, removed, added):
+        pass
+
+    def merge(self, other):
+        pass
+
+    def result(self, chunks):
+        parts, rows, sampled = [], 0, False
+        for chunk in chunks():
+            if self.sample_rows is not None and rows + len(chunk) > self.sample_rows:
+                parts.append(chunk.iloc[:self.sample_rows - rows])
+                sampled = True
+                break
+            parts.append(chunk)
+            rows += len(chunk)
+        values = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0] if parts else pd.Series([], dtype=object)
+        result = self.handler(pd.DataFrame({self.column_name: values}), self.column_name)
+        return {**result, 'Sampled rows': self.sample_rows} if sampled else result
+
+
+def build_summary_state(column_name, column_type, values, handler, incremental=True, sample_rows=None):
+    """
+    Build the incremental summary state of a column from its current values.
+    incremental=False reruns the handler instead, for handlers the incremental states don't reproduce;
+    sample_rows is passed on to the RecomputeState of column types without an incremental form.
+    """
+    if not incremental:
+        return RecomputeState(column_name, handler, sample_rows)
+    if column_type == "Numeric":
+        return NumericState(column_name, values)
+    if column_type in ("Categorical", "Geospatial", "Survey/Feedback", "Ratings/Scoring"):
+        return ValueCountsState(column_name, column_type, values)
+    if column_type == "Date/Time":
+        return DateTimeState(column_name, values)
+    if column_type in ("Boolean", "Binary"):
+        return BooleanState(column_name, column_type, values)
+    return RecomputeState(column_name, handler, sample_rows)
+
+
+def build_summary_state_from_chunks(column_name, column_type, chunks, handler, incremental=True, sample_rows=None):
+    """
+    Build the summary state of a column that is read one chunk at a time, merging per-chunk
+    partial states. chunks() returns a fresh iterator of pandas Series; sample_rows as for build_summary_state.
+    """
+    if not incremental:
+        return RecomputeState(column_name, handler, sample_rows)
+    if column_type == "Numeric":
+        return NumericState.from_chunks(column_name, chunks)
+    state = None
+    for chunk in chunks():
+        partial = build_summary_state(column_name, column_type, chunk, handler, sample_rows=sample_rows)
+        if isinstance(partial, RecomputeState):
+            return partial
+        if state is None:
+            state = partial
+        else:
+            state.merge(partial)
+    return state or build_summary_state(column_name, column_type, pd.Series([], dtype=object), handler, sample_rows=sample_rows)
@@ -0,0 +1,43 @@
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Importing app_v2 creates its storage directories, so keep them out of the tree
+SCRATCH_DIR = tempfile.mkdtemp(prefix='ag-grid-tests-')
+for name, directory in (('DATASET_DIR', 'datasets'), ('UPLOAD_DIR', 'uploads'), ('PROCESSED_CACHE_DIR', 'cache')):
+    os.environ[name] = os.path.join(SCRATCH_DIR, directory)
+
+import app_v2  # noqa: E402
+from benchmarks.fake_llm import FakeLLMClient  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return app_v2.app.test_client()
+
+
+@pytest.fixture
+def upload(client, monkeypatch):
+    """Upload a DataFrame as CSV, classifying its columns as column_types, and return the dataset ID once the job is done."""
+
+    def upload(df, column_types, filename='data.csv', **form):
+        monkeypatch.setattr(app_v2, 'client', FakeLLMClient(column_types))
+        response = client.post('/upload', data={'file': (io.BytesIO(df.to_csv(index=False).encode()), filename), **form})
+        assert response.status_code in (200, 202), response.get_json()
+        job = response.get_json()
+        deadline = time.monotonic() + 30
+        while job['stage'] not in ('done', 'error'):
+            assert time.monotonic() < deadline, job
+            time.sleep(0.02)
+            job = client.get(f"/jobs/{job['jobId']}").get_json()
+        assert job['stage'] == 'done', job
+        return job['datasetId']
+
+    return upload
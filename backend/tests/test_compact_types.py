@@ -0,0 +1,115 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import app_v2
+import chunked_ingest
+import dataset_store
+from chunked_ingest import compact_arrow_file, write_csv_as_arrow
+from dataset_store import CompactTypes, compact_array, compact_table, to_arrow_table
+
+
+@pytest.mark.parametrize('values, data_type, expected', [
+    ([1, 2, None, 300], pa.int64(), pa.int16()),
+    ([1.0, -2.0, None], pa.float64(), pa.int8()),
+    ([0.5, 1.25], pa.float64(), pa.float32()),
+    ([0.1, 1.0], pa.float64(), pa.float64()),
+    ([1e20, 2.0], pa.float64(), pa.float64()),
+    (['a', 'b', 'a', 'a', None], pa.string(), pa.dictionary(pa.int8(), pa.string())),
+    (['a', 'b', 'c'], pa.string(), pa.string()),
+    ([True, None], pa.bool_(), pa.bool_()),
+    ([None, None], pa.int64(), pa.int64()),
+])
+def test_compact_array(values, data_type, expected):
+    compacted = compact_array(pa.array(values, type=data_type))
+    assert compacted.type == expected
+    assert compacted.to_pylist() == pa.array(values, type=data_type).to_pylist()
+
+
+def write_batches(path, batches):
+    with pa.ipc.new_file(str(path), batches[0].schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def read(path):
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+def test_compact_arrow_file_matches_compact_table(tmp_path):
+    # Each rule only holds for the whole column, not for every batch
+    table = pa.table({
+        'small': pa.array([1, 2, 3, 4, 100000, 6], pa.int64()),
+        'whole': pa.array([1.0, None, 3.0, 4.0, 5.0, 6.0]),
+        'half': pa.array([0.5, 1.5, 2.5, 3.5, 4.5, 0.1]),
+        'words': pa.array(['a', 'b', 'a', 'b', 'a', 'b']),
+        'unique': pa.array(['a', 'b', 'c', 'd', 'e', 'f']),
+        'flags': pa.array([True, False, None, True, True, False]),
+        'empty': pa.array([None] * 6, pa.string()),
+    })
+    source, target = tmp_path / 'raw.arrow', tmp_path / 'compact.arrow'
+    write_batches(source, table.to_batches(max_chunksize=2))
+
+    schema = compact_arrow_file(str(source), str(target))
+    expected = compact_table(table)
+    assert schema == expected.schema
+    compacted = read(target)
+    assert compacted.schema == expected.schema
+    assert compacted.to_pylist() == table.to_pylist()
+
+
+def test_dictionaries_are_unified_across_batches(tmp_path):
+    table = pa.table({'words': ['x', 'y'] * 10 + ['z', 'x'] * 10})
+    source, target = tmp_path / 'raw.arrow', tmp_path / 'compact.arrow'
+    write_batches(source, table.to_batches(max_chunksize=7))
+    compact_arrow_file(str(source), str(target))
+    compacted = read(target)
+    assert compacted.column('words').type == pa.dictionary(pa.int8(), pa.string())
+    assert compacted.column('words').to_pylist() == table.column('words').to_pylist()
+
+
+def test_distinct_strings_are_tracked_up_to_a_fixed_cap(monkeypatch):
+    monkeypatch.setattr(dataset_store, 'DICTIONARY_MAX_VALUES', 3)
+    table = pa.table({'few': ['a', 'b', 'c'] * 20, 'many': [f"v{i % 4}" for i in range(60)]})
+    compact_types = CompactTypes(table.schema)
+    for batch in table.to_batches(max_chunksize=10):
+        compact_types.add(batch)
+
+    # Dropped as soon as the column has more distinct values than the cap
+    assert compact_types.stats['many']['distinct'] is None
+    assert compact_types.stats['few']['distinct'] == {'a', 'b', 'c'}
+    assert compact_types.types() == pa.schema([('few', pa.dictionary(pa.int8(), pa.string())), ('many', pa.string())])
+    assert compact_table(table).schema == compact_types.types()
+
+
+def test_streamed_csv_gets_the_types_of_the_in_memory_path(tmp_path, monkeypatch):
+    csv_path = tmp_path / 'data.csv'
+    rows = [f"{i},{i * 1000},{'yes' if i % 3 else 'no'},2024-01-{i % 28 + 1:02d},{'' if i % 5 else 'x'},{i / 4}" for i in range(400)]
+    csv_path.write_text("id,salary,flag,day,sparse,ratio\n" + "\n".join(rows) + "\n")
+    # Many small blocks, so the statistics span batches
+    monkeypatch.setattr(chunked_ingest, 'CSV_BLOCK_BYTES', 1024)
+
+    write_csv_as_arrow(str(csv_path), str(tmp_path / 'raw.arrow'))
+    compact_arrow_file(str(tmp_path / 'raw.arrow'), str(tmp_path / 'compact.arrow'))
+    streamed = read(tmp_path / 'compact.arrow')
+    in_memory = to_arrow_table(pd.read_csv(csv_path))
+    assert streamed.schema == in_memory.schema
+    assert streamed.to_pylist() == in_memory.to_pylist()
+
+
+def test_out_of_core_upload_is_stored_in_compact_types(upload):
+    df = pd.DataFrame({'n': range(300), 'word': ['a', 'b', 'c'] * 100})
+    dataset_id = upload(df, {'n': "Numeric", 'word': "Categorical"}, storage='out_of_core')
+    dataset = app_v2.registry.get(dataset_id)
+    assert dataset.memory_mapped
+    assert dataset.table.schema == to_arrow_table(df).schema
+
+
+def test_memory_report(client, upload):
+    df = pd.DataFrame({'n': range(300), 'word': ['a', 'b', 'c'] * 100})
+    dataset_id = upload(df, {'n': "Numeric", 'word': "Categorical"})
+    body = client.get('/memory', query_string={'dataset_id': dataset_id}).get_json()
+    assert [(column['column'], column['type']) for column in body['columns']] == [('n', 'int16'), ('word', 'dictionary<values=string, indices=int8, ordered=0>')]
+    assert body['rows'] == 300 and body['bytes'] == sum(column['bytes'] for column in body['columns'])
+    assert body['registryBudgetBytes'] == app_v2.registry.memory_budget_bytes
+    assert client.get('/memory', query_string={'dataset_id': '0' * 32}).status_code == 404
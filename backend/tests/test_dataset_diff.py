@@ -0,0 +1,70 @@
+import pandas as pd
+
+import app_v2
+from dataset_diff import REPORT_SAMPLE_SIZE, diff_columns, diff_rows
+
+OLD = pd.DataFrame({'id': [1, 2, 3, 4], 'name': ['a', 'b', 'c', 'd'], 'score': [1.0, 2.0, 3.0, 4.0], 'gone': [0, 0, 0, 0]})
+
+
+def test_diff_columns():
+    new = OLD.drop(columns='gone').assign(score=[1.0, 2.0, 3.5, 4.0], extra=['x'] * 4)
+    assert diff_columns(OLD, new) == {'unchanged': ['id', 'name'], 'changed': ['score'], 'added': ['extra'], 'removed': ['gone']}
+
+
+def test_diff_columns_sees_a_dtype_change():
+    new = OLD.assign(id=OLD['id'].astype(float))
+    assert diff_columns(OLD, new)['changed'] == ['id']
+
+
+def test_diff_rows_by_position():
+    new = pd.concat([OLD, pd.DataFrame({'id': [5], 'name': ['e'], 'score': [5.0], 'gone': [0]})], ignore_index=True)
+    new.loc[1, 'name'] = 'B'
+    report = diff_rows(OLD, new)
+    assert report['matchedBy'] == 'position'
+    assert (report['added'], report['removed'], report['changed'], report['unchanged']) == (1, 0, 1, 3)
+    assert report['examples'] == {'added': [4], 'removed': [], 'changed': [1]}
+
+
+def test_diff_rows_by_position_with_removed_rows():
+    report = diff_rows(OLD, OLD.iloc[:2])
+    assert (report['added'], report['removed'], report['changed'], report['unchanged']) == (0, 2, 0, 2)
+    assert report['examples']['removed'] == [2, 3]
+
+
+def test_diff_rows_by_key_ignores_order():
+    new = OLD.iloc[::-1].reset_index(drop=True)
+    new = new[new['id'] != 2]
+    new.loc[new['id'] == 3, 'score'] = 30.0
+    new = pd.concat([new, pd.DataFrame({'id': [9], 'name': ['z'], 'score': [9.0], 'gone': [1]})], ignore_index=True)
+    report = diff_rows(OLD, new, key='id')
+    assert report['matchedBy'] == 'id'
+    assert (report['added'], report['removed'], report['changed'], report['unchanged']) == (1, 1, 1, 2)
+    assert report['examples'] == {'added': [9], 'removed': [2], 'changed': [3]}
+
+
+def test_diff_rows_only_compares_common_columns():
+    report = diff_rows(OLD, OLD.drop(columns='gone').assign(extra=1))
+    assert report['changed'] == 0
+
+
+def test_diff_rows_examples_are_capped():
+    old = pd.DataFrame({'v': range(100)})
+    report = diff_rows(old, old + 1)
+    assert report['changed'] == 100
+    assert len(report['examples']['changed']) == REPORT_SAMPLE_SIZE
+
+
+def test_delta_upload_reuses_unchanged_columns(upload):
+    column_types = {'id': "Identifiers", 'name': "Categorical", 'score': "Numeric", 'gone': "Numeric"}
+    dataset_id = upload(OLD, column_types)
+    before = app_v2.registry.get(dataset_id)
+
+    new = OLD.drop(columns='gone').assign(score=[1.0, 2.0, 3.5, 4.0], extra=['x'] * 4)
+    # The extra column is the only one sent to the LLM
+    assert upload(new, {'extra': "Text"}, base_dataset_id=dataset_id, key_column='id') == dataset_id
+
+    after = app_v2.registry.get(dataset_id)
+    assert after.table.column_names == ['id', 'name', 'score', 'extra']
+    assert after.column_types == {'id': "Identifiers", 'name': "Categorical", 'score': "Numeric", 'extra': "Text"}
+    assert after.summary_row['name'] == before.summary_row['name']
+    assert after.table.column('score').to_pylist() == [1.0, 2.0, 3.5, 4.0]
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from dataset_registry import DatasetRegistry
+from dataset_store import VersionConflict
+
+ROWS = 10000
+
+
+def make_table(offset=0):
+    return pa.table({'n': pa.array(range(offset, offset + ROWS), pa.int64()), 't': [f"v{i % 7}" for i in range(ROWS)]})
+
+
+def columns(table):
+    return [{'headerName': name, 'field': name} for name in table.column_names]
+
+
+def test_least_recently_used_dataset_is_evicted_to_disk_and_reloaded(tmp_path):
+    first, second = make_table(), make_table(ROWS)
+    # Room for one of the tables only
+    registry = DatasetRegistry(int(first.get_total_buffer_size() * 1.5), str(tmp_path))
+
+    a = registry.add_table(first, {'n': {'summary': 'a'}}, columns(first))
+    b = registry.add_table(second, {'n': {'summary': 'b'}}, columns(second))
+
+    assert registry.memory_usage() <= registry.memory_budget_bytes
+    assert not b.memory_mapped
+
+    reloaded = registry.get(a.dataset_id)
+    assert reloaded.memory_mapped
+    assert reloaded.table.equals(first)
+    assert reloaded.summary_row == {'n': {'summary': 'a'}}
+    assert reloaded.columns == columns(first)
+    assert reloaded.version == a.version
+
+    # Reloading a made b the least recently used one
+    assert registry.get(b.dataset_id).table.equals(second)
+
+
+def test_edited_dataset_is_written_again_when_evicted(tmp_path):
+    table = make_table()
+    registry = DatasetRegistry(int(table.get_total_buffer_size() * 1.5), str(tmp_path))
+    dataset = registry.add_table(table, {}, columns(table))
+    registry.add_table(make_table(ROWS), {}, columns(table))
+
+    edited = registry.get(dataset.dataset_id).table.slice(0, 10)
+    registry.replace_table(dataset.dataset_id, edited, {'n': {'summary': 'edited'}}, {})
+    registry.add_table(make_table(2 * ROWS), {}, columns(table))
+
+    reloaded = registry.get(dataset.dataset_id)
+    assert reloaded.memory_mapped
+    assert reloaded.table.equals(edited)
+    assert reloaded.summary_row == {'n': {'summary': 'edited'}}
+    assert reloaded.version == dataset.version + 1
+
+
+def test_most_recent_dataset_is_kept_over_budget(tmp_path):
+    table = make_table()
+    registry = DatasetRegistry(1, str(tmp_path))
+    dataset = registry.add_table(table, {}, columns(table))
+    assert registry.get(dataset.dataset_id) is dataset
+
+
+def test_unknown_dataset_ids(tmp_path):
+    registry = DatasetRegistry(1024 * 1024, str(tmp_path))
+    assert registry.get(None) is None
+    assert registry.get('../etc') is None
+    assert registry.get('0' * 32) is None
+
+
+def test_metadata_update_keeps_the_data_version(tmp_path):
+    table = make_table()
+    registry = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path))
+    dataset = registry.add_table(table, {}, columns(table))
+
+    updated = registry.update(dataset.dataset_id, summary_row={'n': {'summary': 'new'}})
+    assert updated.version == dataset.version + 1
+    assert updated.data_version == dataset.data_version
+    assert updated.table is dataset.table
+
+
+def test_shared_workers_see_each_others_updates(tmp_path):
+    # Two worker processes pointed at the same directory
+    first = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True)
+    second = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True)
+    table = make_table()
+    dataset = first.add_table(table, {'n': {'summary': ''}}, columns(table))
+
+    assert second.get(dataset.dataset_id).version == dataset.version
+    updated = second.update(dataset.dataset_id, summary_row={'n': {'summary': 'from the second worker'}}, column_types={'n': "Numeric"})
+    assert updated.version == dataset.version + 1
+
+    for registry in (second, first):
+        current = registry.get(dataset.dataset_id)
+        assert current.version == updated.version
+        assert current.summary_row == {'n': {'summary': 'from the second worker'}}
+        assert current.column_types == {'n': "Numeric"}
+        assert current.table.equals(table)
+
+    edited = table.slice(0, 10)
+    replaced = first.replace_table(dataset.dataset_id, edited, {'n': {'summary': 'edited'}}, {})
+    assert second.get(dataset.dataset_id).version == replaced.version
+    assert second.update(dataset.dataset_id, summary_row={'n': {'summary': 'again'}}).table.equals(edited)
+    assert first.get(dataset.dataset_id).summary_row == {'n': {'summary': 'again'}}
+
+
+def test_concurrent_edits_in_two_workers_conflict(tmp_path):
+    first = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True)
+    second = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True)
+    table = make_table()
+    dataset = first.add_table(table, {}, columns(table))
+    # Both workers start an edit from the same version
+    base = second.get(dataset.dataset_id)
+
+    first.replace_table(dataset.dataset_id, table.slice(0, 10), {'n': {'summary': 'first'}}, {}, expected_version=dataset.version)
+    with pytest.raises(VersionConflict):
+        second.replace_table(dataset.dataset_id, table.slice(0, 20), {'n': {'summary': 'second'}}, {}, expected_version=base.version)
+    with pytest.raises(VersionConflict):
+        second.update(dataset.dataset_id, summary_row={'n': {'summary': 'second'}}, expected_version=base.version)
+
+    current = second.get(dataset.dataset_id)
+    assert current.version == dataset.version + 1
+    assert current.summary_row == {'n': {'summary': 'first'}}
+    assert current.table.num_rows == 10
+    # The rejected data file isn't left behind
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.ingest-')]
+
+
+def test_store_publish_checks_the_expected_version(tmp_path):
+    registry = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True)
+    table = make_table()
+    dataset = registry.add_table(table, {}, columns(table))
+    store = registry.store
+
+    # A publish from another process that didn't go through this registry
+    store.publish_meta(dataset.dataset_id, dataset.version, {**dataset.meta(), 'summary_row': {'n': {'summary': 'other'}}})
+    with pytest.raises(VersionConflict):
+        store.publish(dataset.dataset_id, table, dataset.meta(), expected_version=dataset.version)
+    with pytest.raises(VersionConflict):
+        store.publish_meta(dataset.dataset_id, dataset.version, dataset.meta(), expected_version=dataset.version)
+    assert store.current_version(dataset.dataset_id) == dataset.version + 1
+    assert store.publish_meta(dataset.dataset_id, dataset.version + 1, dataset.meta(), expected_version=dataset.version + 1) == dataset.version + 2
+
+
+def test_publishing_a_version_does_not_hold_up_other_datasets(tmp_path, monkeypatch):
+    table = make_table()
+    registry = DatasetRegistry(1 << 40, str(tmp_path), shared=True)
+    a = registry.add_table(table, {}, columns(table))
+    b = registry.add_table(table, {}, columns(table))
+    writing, release = threading.Event(), threading.Event()
+    publish = registry.store.publish
+
+    def slow_publish(dataset_id, *args, **kwargs):
+        if dataset_id == a.dataset_id:
+            writing.set()
+            release.wait(10)
+        return publish(dataset_id, *args, **kwargs)
+
+    monkeypatch.setattr(registry.store, 'publish', slow_publish)
+    edit = threading.Thread(target=registry.replace_table, args=(a.dataset_id, table.slice(0, 5), {}, {}))
+    edit.start()
+    try:
+        assert writing.wait(10)
+        # While a's new version is being written, b can be read and edited and a can still be read
+        results = []
+        other = threading.Thread(target=lambda: results.extend([
+            registry.replace_table(b.dataset_id, table.slice(0, 3), {}, {}), registry.get(a.dataset_id)
+        ]))
+        other.start()
+        other.join(5)
+        assert not other.is_alive()
+        assert results[0].table.num_rows == 3 and results[1].version == a.version
+    finally:
+        release.set()
+        edit.join()
+    assert registry.get(a.dataset_id).table.num_rows == 5
+
+
+def test_deleted_dataset_is_gone_in_every_worker(tmp_path):
+    first = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True)
+    second = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True)
+    table = make_table()
+    dataset = first.add_table(table, {}, columns(table))
+    assert second.get(dataset.dataset_id) is not None
+
+    assert second.delete(dataset.dataset_id)
+    assert first.get(dataset.dataset_id) is None and second.get(dataset.dataset_id) is None
+    assert not os.path.exists(tmp_path / dataset.dataset_id)
+    assert not first.delete(dataset.dataset_id)
+    assert not first.delete('../' + dataset.dataset_id)
+
+
+def test_unused_datasets_are_deleted_after_the_retention_period(tmp_path):
+    table = make_table()
+    # Room for one of the tables only, so the first two are evicted to disk
+    registry = DatasetRegistry(int(table.get_total_buffer_size() * 1.5), str(tmp_path))
+    unused, read_elsewhere, in_memory = (registry.add_table(table, {}, columns(table)) for _ in range(3))
+    assert registry.store.current_version(in_memory.dataset_id) is None
+    (tmp_path / 'jobs').mkdir()
+    # A dataset another worker is publishing right now has no current version yet
+    (tmp_path / ('0' * 32)).mkdir()
+
+    two_hours_ago = time.time() - 7200
+    for dataset in (unused, read_elsewhere):
+        registry._last_used[dataset.dataset_id] = two_hours_ago
+        os.utime(tmp_path / dataset.dataset_id / 'CURRENT', (two_hours_ago, two_hours_ago))
+    # Only the store knows that another worker read it since
+    os.utime(tmp_path / read_elsewhere.dataset_id / 'CURRENT')
+
+    assert registry.delete_unused(3600) == [unused.dataset_id]
+    assert registry.get(unused.dataset_id) is None
+    assert sorted(os.listdir(tmp_path)) == sorted(['0' * 32, 'jobs', read_elsewhere.dataset_id])
+
+    # Datasets only held in memory go by this process's record of their use
+    registry._last_used[in_memory.dataset_id] = two_hours_ago
+    assert registry.delete_unused(3600) == [in_memory.dataset_id]
+    assert registry.get(in_memory.dataset_id) is None
+    assert registry.get(read_elsewhere.dataset_id) is not None
+
+
+def test_retention_is_checked_when_datasets_are_added(tmp_path):
+    table = make_table()
+    registry = DatasetRegistry(1024 * 1024 * 1024, str(tmp_path), shared=True, retention_seconds=3600)
+    old = registry.add_table(table, {}, columns(table))
+    os.utime(tmp_path / old.dataset_id / 'CURRENT', (time.time() - 7200, time.time() - 7200))
+    registry._last_used[old.dataset_id] = time.time() - 7200
+    registry._pruned_at = 0
+
+    new = registry.add_table(table, {}, columns(table))
+    assert registry.get(old.dataset_id) is None
+    assert registry.get(new.dataset_id) is not None
+
+
+def test_delete_endpoint(client, upload):
+    dataset_id = upload(pd.DataFrame({'n': range(10)}), {'n': "Numeric"})
+    assert client.delete(f"/datasets/{dataset_id}").status_code == 204
+    assert client.get('/data', query_string={'dataset_id': dataset_id}).status_code == 404
+    assert client.delete(f"/datasets/{dataset_id}").status_code == 404
@@ -0,0 +1,202 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+import app_v2
+from functions_v2 import summarize_categorical
+
+COLUMN_TYPES = {'city': "Categorical", 'count': "Numeric"}
+
+
+@pytest.fixture
+def dataset_id(upload):
+    df = pd.DataFrame({'city': ['Paris', 'Lyon', 'Nice', 'Paris'] * 100, 'count': [1, 2, 3, 4] * 100})
+    return upload(df, COLUMN_TYPES)
+
+
+def column(dataset_id, name):
+    return app_v2.registry.get(dataset_id).table.column(name)
+
+
+def test_upload_stores_compact_types(dataset_id):
+    assert column(dataset_id, 'city').type == pa.dictionary(pa.int8(), pa.string())
+    assert column(dataset_id, 'count').type == pa.int8()
+
+
+def test_cell_edits_keep_the_dictionary_while_it_fits(client, dataset_id):
+    response = client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 1, 'column': 'city', 'value': 'Lille'}]})
+    assert response.status_code == 200
+    assert column(dataset_id, 'city').type == pa.dictionary(pa.int8(), pa.string())
+    assert column(dataset_id, 'city').to_pylist()[:3] == ['Paris', 'Lille', 'Nice']
+
+
+def test_cell_edits_widen_a_full_dictionary(client, dataset_id):
+    edits = [{'row': row, 'column': 'city', 'value': f"town {row}"} for row in range(200)]
+    response = client.patch('/cells', json={'dataset_id': dataset_id, 'edits': edits})
+    assert response.status_code == 200
+    city = column(dataset_id, 'city')
+    assert city.type == pa.dictionary(pa.int32(), pa.string())
+    assert city.to_pylist()[199:201] == ['town 199', 'Paris']
+
+
+def test_cell_edits_widen_small_integers(client, dataset_id):
+    response = client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 0, 'column': 'count', 'value': 100000}]})
+    assert response.status_code == 200
+    assert column(dataset_id, 'count').type == pa.int64()
+    assert column(dataset_id, 'count').to_pylist()[:2] == [100000, 2]
+
+
+def test_values_float32_cannot_hold_widen_the_column(client, upload):
+    dataset_id = upload(pd.DataFrame({'price': [0.5, 1.25, 2.75] * 10}), {'price': "Financial"})
+    assert column(dataset_id, 'price').type == pa.float32()
+
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 0, 'column': 'price', 'value': 3.5}]})
+    assert column(dataset_id, 'price').type == pa.float32()
+
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 1, 'column': 'price', 'value': 19.99}]})
+    assert column(dataset_id, 'price').type == pa.float64()
+    assert column(dataset_id, 'price').to_pylist()[:3] == [3.5, 19.99, 2.75]
+
+    client.post('/rows', json={'dataset_id': dataset_id, 'rows': [{'price': 1234567.89}]})
+    assert column(dataset_id, 'price').to_pylist()[-1] == 1234567.89
+
+
+def test_appended_float32_values_are_kept_exactly(client, upload):
+    dataset_id = upload(pd.DataFrame({'price': [0.5, 1.25, 2.75] * 10}), {'price': "Financial"})
+    client.post('/rows', json={'dataset_id': dataset_id, 'rows': [{'price': 1234567.89}, {'price': None}]})
+    assert column(dataset_id, 'price').type == pa.float64()
+    assert column(dataset_id, 'price').to_pylist()[-2:] == [1234567.89, None]
+
+
+def test_appended_rows_widen_a_full_dictionary(client, dataset_id):
+    rows = [{'city': f"town {i}", 'count': i} for i in range(200)]
+    response = client.post('/rows', json={'dataset_id': dataset_id, 'rows': rows})
+    assert response.status_code == 200
+    city = column(dataset_id, 'city')
+    assert city.type == pa.dictionary(pa.int32(), pa.string())
+    assert city.to_pylist()[398:] == ['Nice', 'Paris'] + [f"town {i}" for i in range(200)]
+    assert column(dataset_id, 'count').type == pa.int64()
+
+
+def test_appended_text_to_a_dictionary_column_is_stored_as_text(client, dataset_id):
+    response = client.post('/rows', json={'dataset_id': dataset_id, 'rows': [{'city': True, 'count': 5}, {'city': 7}]})
+    assert response.status_code == 200
+    assert column(dataset_id, 'city').to_pylist()[-2:] == ['True', '7']
+    assert column(dataset_id, 'count').to_pylist()[-2:] == [5, None]
+
+
+def test_summary_after_edits_matches_a_full_recompute(client, dataset_id):
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [
+        {'row': 0, 'column': 'city', 'value': 'Nice'}, {'row': 4, 'column': 'city', 'value': 'Nice'},
+    ]})
+    client.post('/rows', json={'dataset_id': dataset_id, 'rows': [{'city': 'Lyon', 'count': 1}] * 3})
+    summary = client.get('/summary', query_string={'dataset_id': dataset_id}).get_json()['summary']
+    cities = column(dataset_id, 'city').to_pandas()
+    assert summary['city']['chart_options'] == summarize_categorical(pd.DataFrame({'city': cities}), 'city')['chart_options']
+
+
+@pytest.mark.parametrize('body', [
+    {'edits': 'city'},
+    {'edits': [{'row': True, 'column': 'city', 'value': 'x'}]},
+    {'edits': [{'row': 400, 'column': 'city', 'value': 'x'}]},
+    {'edits': [{'row': 0, 'column': 'nope', 'value': 'x'}]},
+    {'edits': [{'row': 0, 'column': 'count', 'value': 'abc'}]},
+])
+def test_invalid_cell_edits_are_rejected(client, dataset_id, body):
+    response = client.patch('/cells', json={'dataset_id': dataset_id, **body})
+    assert response.status_code == 400
+    assert column(dataset_id, 'city').to_pylist()[0] == 'Paris'
+
+
+def columns_version(client, dataset_id):
+    return client.get('/columns', query_string={'dataset_id': dataset_id}).get_json()['columnsVersion']
+
+
+def test_columns_version_only_changes_with_the_column_types(client, dataset_id):
+    version = columns_version(client, dataset_id)
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 0, 'column': 'count', 'value': 2}]})
+    app_v2.registry.update(dataset_id, summary_row=app_v2.registry.get(dataset_id).summary_row)
+    assert columns_version(client, dataset_id) == version
+
+    # The client already has the definitions
+    body = client.get('/data', query_string={'dataset_id': dataset_id, 'columns_version': version}).get_json()
+    assert body['columnsVersion'] == version and 'columns' not in body
+
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 0, 'column': 'count', 'value': 1000}]})
+    assert columns_version(client, dataset_id) != version
+    assert 'columns' in client.get('/data', query_string={'dataset_id': dataset_id, 'columns_version': version}).get_json()
+
+
+def test_edit_of_a_version_replaced_meanwhile_is_rejected(client, dataset_id, monkeypatch):
+    update_summaries = app_v2.update_summaries
+
+    def publish_in_between(dataset, table, changes):
+        # Another worker publishes a version while this edit is being made
+        app_v2.registry.update(dataset.dataset_id, summary_row=dataset.summary_row)
+        return update_summaries(dataset, table, changes)
+
+    monkeypatch.setattr(app_v2, 'update_summaries', publish_in_between)
+    version = app_v2.registry.get(dataset_id).version
+    response = client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 0, 'column': 'city', 'value': 'Lille'}]})
+    assert response.status_code == 409
+    assert response.get_json()['version'] == version
+    assert column(dataset_id, 'city').to_pylist()[0] == 'Paris'
+
+    response = client.post('/rows', json={'dataset_id': dataset_id, 'rows': [{'city': 'Lille', 'count': 1}]})
+    assert response.status_code == 409
+    assert column(dataset_id, 'city').to_pylist()[-1] == 'Paris'
+
+
+def test_only_the_chunks_holding_edited_rows_are_rewritten():
+    column = pa.chunked_array([pa.array(range(start, start + 4), pa.int8()) for start in range(0, 16, 4)])
+    new_values = pa.array([100, 101], pa.int8())
+    edited, column_type = app_v2.set_rows(column, [5, 6], new_values, pa.int8())
+    assert column_type == pa.int8() and edited.num_chunks == 4
+    assert edited.to_pylist() == [0, 1, 2, 3, 4, 100, 101, 7] + list(range(8, 16))
+    for index in (0, 2, 3):
+        assert edited.chunk(index).buffers()[1].address == column.chunk(index).buffers()[1].address
+
+
+def test_edits_across_chunks_with_their_own_dictionaries():
+    column = pa.chunked_array([pa.array(['a', 'b'] * 2).dictionary_encode(), pa.array(['c', 'd'] * 2).dictionary_encode()])
+    column = pa.chunked_array([pc.cast(chunk, pa.dictionary(pa.int8(), pa.string())) for chunk in column.chunks])
+    edited, column_type = app_v2.set_rows(column, [0, 7], pa.array(['x', 'y']), pa.string())
+    assert column_type == pa.dictionary(pa.int8(), pa.string())
+    assert edited.to_pylist() == ['x', 'b', 'a', 'b', 'c', 'd', 'c', 'y']
+
+
+def test_edited_memory_mapped_column_summaries_use_a_sample(client, upload, monkeypatch):
+    monkeypatch.setattr(app_v2, 'OUT_OF_CORE_SAMPLE_ROWS', 50)
+    df = pd.DataFrame({'n': range(300), 'note': [f"note {i}" for i in range(300)]})
+    dataset_id = upload(df, {'n': "Numeric", 'note': "Text"}, storage='out_of_core')
+    assert app_v2.registry.get(dataset_id).memory_mapped
+    response = client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [
+        {'row': 0, 'column': 'note', 'value': 'edited'}, {'row': 299, 'column': 'n', 'value': 1000},
+    ]})
+    assert response.status_code == 200
+    summary = response.get_json()['summary']
+    assert 'Sampled rows: 50' in summary['note']['summary']
+    assert column(dataset_id, 'n').to_pylist()[-1] == 1000
+
+
+def test_a_rejected_edit_leaves_the_published_summary_state_alone(client, dataset_id, monkeypatch):
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 0, 'column': 'city', 'value': 'Nice'}]})
+    update_summaries = app_v2.update_summaries
+    concurrent = []
+
+    def edit_in_between(dataset, table, changes):
+        # A concurrent request edits the same dataset while this edit is being made
+        if not concurrent:
+            concurrent.append(None)
+            concurrent[0] = client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 1, 'column': 'city', 'value': 'Lille'}]})
+        return update_summaries(dataset, table, changes)
+
+    monkeypatch.setattr(app_v2, 'update_summaries', edit_in_between)
+    response = client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 2, 'column': 'city', 'value': 'Paris'}]})
+    assert concurrent[0].status_code == 200 and response.status_code == 409
+
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 3, 'column': 'city', 'value': 'Lyon'}]})
+    summary = client.get('/summary', query_string={'dataset_id': dataset_id}).get_json()['summary']
+    cities = column(dataset_id, 'city').to_pandas()
+    assert summary['city']['chart_options'] == summarize_categorical(pd.DataFrame({'city': cities}), 'city')['chart_options']
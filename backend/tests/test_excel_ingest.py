@@ -0,0 +1,77 @@
+import openpyxl
+import pyarrow as pa
+import pytest
+
+import chunked_ingest
+from chunked_ingest import read_excel_file, write_excel_as_arrow
+
+
+def workbook(path, rows, title='Sheet'):
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = title
+    for row in rows:
+        sheet.append(row)
+    book.save(path)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(chunked_ingest, 'EXCEL_BATCH_ROWS', 3)
+
+
+def read_in_one_batch(path, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(chunked_ingest, 'EXCEL_BATCH_ROWS', 1000)
+        return read_excel_file(path)
+
+
+def test_columns_are_widened_when_a_later_batch_does_not_fit(tmp_path, monkeypatch):
+    rows = [['n', 'code', 'same']] + [[i, i, 'x'] for i in range(6)] + [[6.5, 'A7', 'x'], [7, 8, 'x']]
+    path = workbook(tmp_path / 'data.xlsx', rows)
+
+    table = read_excel_file(path)
+    assert table.schema == pa.schema([('n', pa.float64()), ('code', pa.string()), ('same', pa.string())])
+    assert table.column('n').to_pylist() == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.5, 7.0]
+    # Cells already written keep the text of their value, as if the column had been text from the start
+    assert table.column('code').to_pylist()[6] == 'A7'
+    assert table.equals(read_in_one_batch(path, monkeypatch))
+
+
+def test_a_column_is_widened_twice(tmp_path, monkeypatch):
+    rows = [['v']] + [[1], [2], [3], [4.5], [5], [6], ['seven']]
+    path = workbook(tmp_path / 'data.xlsx', rows)
+    table = read_excel_file(path)
+    assert table.column('v').type == pa.string()
+    assert table.equals(read_in_one_batch(path, monkeypatch))
+
+
+def test_progress_and_single_pass(tmp_path, monkeypatch):
+    rows = [['n']] + [[i] for i in range(5)] + [['text']]
+    path = workbook(tmp_path / 'data.xlsx', rows)
+    reads = []
+    excel_rows = chunked_ingest._excel_rows
+    monkeypatch.setattr(chunked_ingest, '_excel_rows', lambda *args: reads.append(args) or excel_rows(*args))
+
+    fractions = []
+    write_excel_as_arrow(path, str(tmp_path / 'data.arrow'), progress=fractions.append)
+    assert len(reads) == 1
+    assert fractions[-1] == 1.0
+    assert not (tmp_path / 'data.arrow.narrow').exists()
+
+
+def test_cell_range_header_and_blank_rows(tmp_path):
+    rows = [['title'], [None, 'a', 'a', None], [None, 1, 'x', 'ignored'], [None, None, None], [None, 3, 'z'], [None, None, None]]
+    path = workbook(tmp_path / 'data.xlsx', rows, title='Data')
+
+    table = read_excel_file(path, sheet='Data', cell_range='B2:C10')
+    assert table.column_names == ['a', 'a.1']
+    # The blank row in between stays, the one at the end is dropped
+    assert table.to_pylist() == [{'a': 1, 'a.1': 'x'}, {'a': None, 'a.1': None}, {'a': 3, 'a.1': 'z'}]
+
+
+def test_header_only_sheet(tmp_path):
+    table = read_excel_file(workbook(tmp_path / 'data.xlsx', [['a', None, 'a']]))
+    assert table.schema == pa.schema([('a', pa.null()), ('Unnamed: 1', pa.null()), ('a.1', pa.null())])
+    assert table.num_rows == 0
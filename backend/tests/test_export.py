@@ -0,0 +1,135 @@
+import gzip
+import io
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import dataset_export
+from dataset_export import ExportError, export_chunks, view_batches
+
+ROWS = [
+    {'name': 'Alice', 'city': 'Paris', 'age': 31, 'score': 7.5},
+    {'name': 'bob', 'city': 'Lyon', 'age': 25, 'score': None},
+    {'name': 'Carol', 'city': 'Paris', 'age': 42, 'score': 9.0},
+    {'name': 'dave', 'city': None, 'age': 25, 'score': 6.0},
+    {'name': 'Eve', 'city': 'Nice', 'age': 38, 'score': 8.0},
+    {'name': 'frank', 'city': 'Lyon', 'age': 19, 'score': 5.5},
+]
+
+
+@pytest.fixture
+def table():
+    # Several record batches, with a dictionary-encoded column like the compact uploads
+    table = pa.Table.from_pylist(ROWS)
+    table = table.set_column(1, 'city', table.column('city').dictionary_encode())
+    return pa.Table.from_batches(table.to_batches(max_chunksize=2))
+
+
+def names(table, **view):
+    return [row['name'] for batch in view_batches(table, **view) for row in batch.to_pylist()]
+
+
+def test_unfiltered_view_is_the_whole_table(table):
+    assert names(table) == [row['name'] for row in ROWS]
+
+
+@pytest.mark.parametrize('filter_model, expected', [
+    ({'name': {'filterType': 'text', 'type': 'contains', 'filter': 'A'}}, ['Alice', 'Carol', 'dave', 'frank']),
+    ({'name': {'filterType': 'text', 'type': 'startsWith', 'filter': 'b'}}, ['bob']),
+    ({'city': {'filterType': 'text', 'type': 'equals', 'filter': 'paris'}}, ['Alice', 'Carol']),
+    ({'city': {'filterType': 'text', 'type': 'blank'}}, ['dave']),
+    ({'score': {'filterType': 'number', 'type': 'notBlank'}}, ['Alice', 'Carol', 'dave', 'Eve', 'frank']),
+    ({'age': {'filterType': 'number', 'type': 'inRange', 'filter': 25, 'filterTo': 38}}, ['Alice', 'bob', 'dave', 'Eve']),
+    ({'age': {'filterType': 'number', 'type': 'greaterThan', 'filter': 30},
+      'city': {'filterType': 'text', 'type': 'notEqual', 'filter': 'Nice'}}, ['Alice', 'Carol']),
+    ({'age': {'filterType': 'number', 'operator': 'OR', 'conditions': [
+        {'type': 'lessThan', 'filter': 20}, {'type': 'greaterThanOrEqual', 'filter': 40}]}}, ['Carol', 'frank']),
+])
+def test_filters(table, filter_model, expected):
+    assert names(table, filter_model=filter_model) == expected
+
+
+def test_blank_filter_matches_empty_strings_in_dictionary_columns(table):
+    table = table.set_column(1, 'city', pa.chunked_array([
+        pa.array(['Paris', ''] if index == 0 else chunk.to_pylist()).dictionary_encode()
+        for index, chunk in enumerate(table.column('city').chunks)
+    ]))
+    assert names(table, filter_model={'city': {'filterType': 'text', 'type': 'blank'}}) == ['bob', 'dave']
+    assert 'bob' not in names(table, filter_model={'city': {'filterType': 'text', 'type': 'notBlank'}})
+
+
+def test_filters_combine_with_the_search_query(table):
+    assert names(table, query='lyon', filter_model={'age': {'filterType': 'number', 'type': 'lessThan', 'filter': 20}}) == ['frank']
+
+
+def test_sort_on_several_columns(table, monkeypatch):
+    # Rows are taken in slices smaller than the view
+    monkeypatch.setattr(dataset_export, 'EXPORT_BATCH_ROWS', 4)
+    sort_model = [{'colId': 'age', 'sort': 'asc'}, {'colId': 'name', 'sort': 'desc'}]
+    assert names(table, sort_model=sort_model) == ['frank', 'dave', 'bob', 'Alice', 'Eve', 'Carol']
+
+
+def test_sort_on_a_dictionary_column_after_filtering(table):
+    view = view_batches(
+        table, filter_model={'city': {'filterType': 'text', 'type': 'notBlank'}},
+        sort_model=[{'colId': 'city', 'sort': 'desc'}, {'colId': 'age', 'sort': 'asc'}], columns=['name', 'city']
+    )
+    rows = [row for batch in view for row in batch.to_pylist()]
+    assert rows == [
+        {'name': 'Alice', 'city': 'Paris'}, {'name': 'Carol', 'city': 'Paris'}, {'name': 'Eve', 'city': 'Nice'},
+        {'name': 'frank', 'city': 'Lyon'}, {'name': 'bob', 'city': 'Lyon'},
+    ]
+
+
+@pytest.mark.parametrize('view', [
+    {'columns': ['nope']},
+    {'sort_model': [{'colId': 'nope', 'sort': 'asc'}]},
+    {'filter_model': {'nope': {'filterType': 'text', 'type': 'contains', 'filter': 'x'}}},
+    {'filter_model': {'name': {'filterType': 'text', 'type': 'regex', 'filter': 'x'}}},
+    {'filter_model': {'age': {'filterType': 'number', 'type': 'inRange', 'filter': 1}}},
+])
+def test_invalid_views_are_reported_before_the_first_chunk(table, view):
+    with pytest.raises(ExportError):
+        export_chunks(table, 'csv', **view)
+
+
+def test_csv_export_is_gzipped_as_a_whole(table):
+    data = gzip.decompress(b''.join(export_chunks(
+        table, 'csv', 'gzip', filter_model={'city': {'filterType': 'text', 'type': 'equals', 'filter': 'Lyon'}},
+        sort_model=[{'colId': 'age', 'sort': 'asc'}], columns=['name', 'age']
+    )))
+    assert pd.read_csv(io.BytesIO(data)).to_dict('records') == [{'name': 'frank', 'age': 19}, {'name': 'bob', 'age': 25}]
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_empty_csv_export_has_the_header_row(table, compression):
+    data = b''.join(export_chunks(
+        table, 'csv', compression, filter_model={'city': {'filterType': 'text', 'type': 'equals', 'filter': 'Rome'}},
+        columns=['name', 'city']
+    ))
+    assert (gzip.decompress(data) if compression else data) == b'"name","city"\n'
+
+
+def test_export_endpoint(client, upload):
+    df = pd.DataFrame(ROWS)
+    dataset_id = upload(df, {'name': "Names", 'city': "Categorical", 'age': "Numeric", 'score': "Numeric"})
+
+    response = client.get('/export', query_string={
+        'dataset_id': dataset_id, 'format': 'parquet', 'columns': 'name,score',
+        'filters': json.dumps({'score': {'filterType': 'number', 'type': 'greaterThan', 'filter': 6}}),
+        'sort': json.dumps([{'colId': 'score', 'sort': 'desc'}]),
+    })
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == f'attachment; filename="{dataset_id}.parquet"'
+    exported = pq.read_table(io.BytesIO(response.get_data()))
+    assert exported.to_pylist() == [{'name': 'Carol', 'score': 9.0}, {'name': 'Eve', 'score': 8.0}, {'name': 'Alice', 'score': 7.5}]
+
+    response = client.get('/export', query_string={'dataset_id': dataset_id, 'format': 'jsonl', 'query': 'lyon'})
+    assert [json.loads(line)['name'] for line in response.get_data().splitlines()] == ['bob', 'frank']
+
+    assert client.get('/export', query_string={'dataset_id': dataset_id, 'sort': '[{'}).status_code == 400
+    assert client.get('/export', query_string={'dataset_id': dataset_id, 'columns': 'nope'}).status_code == 400
+    assert client.get('/export', query_string={'dataset_id': dataset_id, 'format': 'xml'}).status_code == 400
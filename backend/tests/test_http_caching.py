@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+import app_v2
+
+
+@pytest.fixture
+def dataset_id(upload):
+    df = pd.DataFrame({'n': range(100), 'word': [f"w{i % 10}" for i in range(100)]})
+    return upload(df, {'n': "Numeric", 'word': "Categorical"})
+
+
+@pytest.mark.parametrize('path, args', [
+    ('/data', {'startRow': 0, 'endRow': 10}),
+    ('/search', {'query': 'w3'}),
+    ('/summary', {}),
+])
+def test_etag_round_trip(client, dataset_id, path, args):
+    query = {'dataset_id': dataset_id, **args}
+    first = client.get(path, query_string=query)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+    assert etag.startswith(f'"{dataset_id}-')
+
+    revalidated = client.get(path, query_string=query, headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+    assert revalidated.headers['ETag'] == etag
+
+    # One of several cached copies
+    assert client.get(path, query_string=query, headers={'If-None-Match': f'"other", {etag}'}).status_code == 304
+    assert client.get(path, query_string=query, headers={'If-None-Match': '"other"'}).get_data() == first.get_data()
+
+
+def test_etag_depends_on_the_request_arguments(client, dataset_id):
+    first = client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': 0, 'endRow': 10})
+    other = client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': 10, 'endRow': 20})
+    assert first.headers['ETag'] != other.headers['ETag']
+    response = client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': 10, 'endRow': 20},
+                          headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+
+
+def test_edits_invalidate_the_etag(client, dataset_id):
+    query = {'dataset_id': dataset_id, 'startRow': 0, 'endRow': 10}
+    etag = client.get('/data', query_string=query).headers['ETag']
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': 0, 'column': 'n', 'value': 42}]})
+
+    response = client.get('/data', query_string=query, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['data'][0]['n'] == 42
+
+
+def test_summary_updates_invalidate_the_summary_etag(client, dataset_id):
+    query = {'dataset_id': dataset_id}
+    etag = client.get('/summary', query_string=query).headers['ETag']
+    app_v2.registry.update(dataset_id, summary_row={'n': {'summary': 'updated'}, 'word': {'summary': ''}})
+
+    response = client.get('/summary', query_string=query, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['summary']['n'] == {'summary': 'updated'}
+
+
+def test_repeated_requests_are_served_from_the_response_cache(client, dataset_id, monkeypatch):
+    query = {'dataset_id': dataset_id, 'startRow': 0, 'endRow': 10}
+    first = client.get('/data', query_string=query)
+    # A cache hit doesn't serialize the window again
+    monkeypatch.setattr(app_v2, 'convert_to_serializable', lambda df: pytest.fail("window built again"))
+    assert client.get('/data', query_string=query).get_data() == first.get_data()
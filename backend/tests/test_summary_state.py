@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions_v2 import summarize_binary, summarize_boolean, summarize_categorical, summarize_date_time, summarize_numeric
+from summarizers import column_type_handlers
+from summary_state import (
+    HISTOGRAM_BINS, NumericState, RecomputeState, build_summary_state, build_summary_state_from_chunks, histogram_median
+)
+
+
+def build(column_type, values):
+    return build_summary_state('c', column_type, values, column_type_handlers[column_type])
+
+
+def edit(values, changes):
+    """Apply {position: new value} to a copy of values, returning (edited, removed, added)."""
+    edited = values.copy()
+    positions = list(changes)
+    removed = edited.iloc[positions].tolist()
+    edited.iloc[positions] = list(changes.values())
+    return edited, removed, list(changes.values())
+
+
+def chunks_of(values, size):
+    return lambda: (values.iloc[start:start + size].reset_index(drop=True) for start in range(0, len(values), size))
+
+
+@pytest.fixture
+def numbers():
+    return pd.Series(np.random.default_rng(0).normal(100, 15, 5000))
+
+
+def test_numeric_edits_inside_the_range_match_a_full_recompute(numbers):
+    state = build("Numeric", numbers)
+    low, high = numbers.min(), numbers.max()
+    edited, removed, added = edit(numbers, {0: 101.5, 1: 99.0, 2: np.nan, 3: (low + high) / 2})
+    state.update(removed, added)
+    state.result(lambda: pytest.fail("edits inside the range must not read the column"))
+
+    data = edited.dropna().to_numpy(dtype=float)
+    counts, edges = np.histogram(data, bins=HISTOGRAM_BINS)
+    assert not state.stale_range
+    assert np.array_equal(state.counts, counts)
+    assert np.allclose(state.edges, edges)
+    assert state.moments.count == len(data)
+    assert state.moments.mean == pytest.approx(data.mean())
+    assert state.moments.variance == pytest.approx(data.var(ddof=1))
+    # The median is interpolated inside the bin that holds the true one
+    assert state.median == histogram_median(counts, edges)
+    assert abs(state.median - np.median(data)) <= edges[1] - edges[0]
+
+
+def test_numeric_edit_of_an_extreme_rebuilds_from_the_column_chunks(numbers):
+    state = build("Numeric", numbers)
+    edited, removed, added = edit(numbers, {int(numbers.idxmax()): 1000.0})
+    state.update(removed, added)
+    assert state.stale_range
+    result = state.result(chunks_of(edited, 700))
+    assert not state.stale_range
+    assert (state.min, state.max) == (edited.min(), 1000.0)
+    assert result == NumericState.from_chunks('c', chunks_of(edited, 700)).result(None)
+
+
+def test_numeric_state_from_chunks_matches_the_whole_column(numbers):
+    whole = NumericState('c', numbers)
+    merged = build_summary_state_from_chunks('c', "Numeric", chunks_of(numbers, 700), summarize_numeric)
+    assert np.array_equal(merged.counts, whole.counts)
+    assert np.allclose(merged.edges, whole.edges)
+    assert (merged.min, merged.max) == (whole.min, whole.max)
+    assert merged.moments.count == whole.moments.count
+    assert merged.moments.mean == pytest.approx(whole.moments.mean)
+    assert merged.moments.variance == pytest.approx(whole.moments.variance)
+    assert merged.median == histogram_median(whole.counts, whole.edges)
+
+
+def test_numeric_state_of_an_empty_column():
+    state = NumericState('c', pd.Series([None, None], dtype=float))
+    state.update([None], [5.0])
+    assert state.stale_range
+    values = pd.Series([5.0, None])
+    assert state.result(chunks_of(values, 1)) == NumericState.from_chunks('c', chunks_of(values, 1)).result(None)
+    assert state.moments.count == 1 and (state.min, state.max) == (5.0, 5.0)
+
+
+CATEGORIES = pd.Series(['a'] * 50 + ['b'] * 40 + ['c'] * 30 + ['d'] * 20 + ['e'] * 10 + ['f'] * 5 + [None] * 5)
+BOOLEANS = pd.Series([True, False, 'yes', 'no', None, 1, 0, 'TRUE'] * 20, dtype=object)
+DATES = pd.Series(['2024-01-01', '2024-01-02 10:00', 'not a date', None, '2024-02-29'] * 20, dtype=object)
+
+
+@pytest.mark.parametrize('column_type, handler, values, changes', [
+    ("Categorical", summarize_categorical, CATEGORIES, {0: 'f', 1: 'f', 2: 'g', 60: None, 159: 'a'}),
+    ("Boolean", summarize_boolean, BOOLEANS, {0: False, 1: 'true', 4: True, 5: None}),
+    ("Binary", summarize_binary, BOOLEANS, {0: False, 8: False, 16: False, 2: 'no'}),
+    ("Date/Time", summarize_date_time, DATES, {0: '2024-03-01', 2: '2024-01-01', 3: '2024-01-02', 4: None}),
+])
+def test_count_states_match_a_full_recompute(column_type, handler, values, changes):
+    state = build(column_type, values)
+    edited, removed, added = edit(values, changes)
+    state.update(removed, added)
+    expected = handler(pd.DataFrame({'c': edited}), 'c')
+    result = state.result(lambda: pytest.fail("count states must not read the column"))
+    assert result['chart_options'] == expected['chart_options']
+    if column_type == "Binary":
+        assert result['Mode'] == expected['Mode']
+
+
+@pytest.mark.parametrize('column_type, values', [
+    ("Categorical", CATEGORIES), ("Boolean", BOOLEANS), ("Date/Time", DATES),
+])
+def test_count_states_from_chunks_match_the_whole_column(column_type, values):
+    handler = column_type_handlers[column_type]
+    merged = build_summary_state_from_chunks('c', column_type, chunks_of(values, 17), handler)
+    assert merged.result(None) == build(column_type, values).result(None)
+
+
+def test_replaced_handlers_are_rerun():
+    state = build_summary_state('c', "Numeric", CATEGORIES, lambda df, column_name: {'rows': len(df)}, incremental=False)
+    assert isinstance(state, RecomputeState)
+    state.update(['a'], ['b'])
+    assert state.result(chunks_of(CATEGORIES, 50)) == {'rows': len(CATEGORIES)}
+
+
+def test_rerun_handlers_can_see_a_sample():
+    state = build_summary_state('c', "Text", CATEGORIES, lambda df, column_name: {'rows': len(df)}, sample_rows=120)
+    assert isinstance(state, RecomputeState)
+    assert state.result(chunks_of(CATEGORIES, 50)) == {'rows': 120, 'Sampled rows': 120}
+    # A column that fits in the sample isn't marked as sampled
+    assert state.result(chunks_of(CATEGORIES.iloc[:100], 50)) == {'rows': 100}
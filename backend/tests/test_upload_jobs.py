@@ -0,0 +1,77 @@
+import io
+import time
+
+import pandas as pd
+
+import app_v2
+from benchmarks.fake_llm import FakeLLMClient
+
+
+class SlowColumnClient(FakeLLMClient):
+    """Answers the prompt for one column after a delay and the others straight away."""
+
+    def __init__(self, column_types, slow_column, delay):
+        super().__init__(column_types)
+        create = self.chat.completions.create
+
+        def create_slowly(model, messages, **kwargs):
+            if f"from the column '{slow_column}'" in messages[-1]['content']:
+                time.sleep(delay)
+            return create(model, messages, **kwargs)
+
+        self.chat.completions.create = create_slowly
+
+
+def wait_for(client, job):
+    deadline = time.monotonic() + 30
+    while job['stage'] not in ('done', 'error'):
+        assert time.monotonic() < deadline, job
+        time.sleep(0.02)
+        job = client.get(f"/jobs/{job['jobId']}").get_json()
+    return job
+
+
+def test_a_slow_classification_does_not_hold_back_the_other_columns(client, monkeypatch):
+    column_types = {'a': "Numeric", 'b': "Numeric", 'c': "Categorical"}
+    monkeypatch.setattr(app_v2, 'client', SlowColumnClient(column_types, 'a', delay=1.0))
+    published = []
+    publish_column_summary = app_v2.publish_column_summary
+
+    def record(dataset_id, data_version, column_name, *args):
+        published.append((column_name, time.monotonic()))
+        return publish_column_summary(dataset_id, data_version, column_name, *args)
+
+    monkeypatch.setattr(app_v2, 'publish_column_summary', record)
+    df = pd.DataFrame({'a': range(20), 'b': range(20), 'c': ['x', 'y'] * 10})
+    started = time.monotonic()
+    job = client.post('/upload', data={'file': (io.BytesIO(df.to_csv(index=False).encode()), 'data.csv')}).get_json()
+    job = wait_for(client, job)
+
+    assert job['stage'] == 'done'
+    assert job['columns'] == {'a': 'summarized', 'b': 'summarized', 'c': 'summarized'}
+    assert [column_name for column_name, _ in published][-1] == 'a'
+    published_at = dict(published)
+    assert published_at['b'] - started < 0.9 and published_at['c'] - started < 0.9
+    summary = client.get('/summary', query_string={'dataset_id': job['datasetId']}).get_json()['summary']
+    assert all(summary[column_name]['chart_options'] for column_name in column_types)
+
+
+def test_a_failing_summary_handler_marks_only_its_column(client, monkeypatch):
+    column_types = {'a': "Numeric", 'note': "Text"}
+    monkeypatch.setattr(app_v2, 'client', FakeLLMClient(column_types))
+    # Reset afterwards, so the handler only replaces the built-in one in this test
+    monkeypatch.setattr(app_v2.column_type_handlers, '_registered', {})
+    monkeypatch.setattr(app_v2.column_type_handlers, '_loaded', {})
+
+    def fail(df, column_name):
+        raise ValueError('no text today')
+
+    app_v2.column_type_handlers.register("Text", fail)
+    df = pd.DataFrame({'a': range(20), 'note': ['x'] * 20})
+    job = client.post('/upload', data={'file': (io.BytesIO(df.to_csv(index=False).encode()), 'data.csv')}).get_json()
+    job = wait_for(client, job)
+
+    assert job['stage'] == 'done'
+    assert job['columns'] == {'a': 'summarized', 'note': 'error'}
+    summary = client.get('/summary', query_string={'dataset_id': job['datasetId']}).get_json()['summary']
+    assert summary['note'] == app_v2.error_cell('note', ValueError('no text today'))
@@ -0,0 +1,117 @@
+import pandas as pd
+import pytest
+
+import app_v2
+from cursors import InvalidCursor, decode_cursor, encode_cursor
+
+ROWS = 250
+
+
+@pytest.fixture
+def dataset_id(upload):
+    df = pd.DataFrame({'n': range(ROWS), 'parity': ['even' if i % 2 == 0 else 'odd' for i in range(ROWS)]})
+    return upload(df, {'n': "Numeric", 'parity': "Categorical"})
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(3, 'query', 120)) == (3, 'query', 120)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', encode_cursor(1, 'q', 5)[:-4], 'WzEsMl0=', encode_cursor('1', '', 0),
+                                    encode_cursor(1, '', -1), encode_cursor(1, None, 0)])
+def test_invalid_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def numbers(response):
+    return [row['n'] for row in response.get_json()['data']]
+
+
+def test_start_and_end_row_window(client, dataset_id):
+    response = client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': 100, 'endRow': 150})
+    body = response.get_json()
+    assert numbers(response) == list(range(100, 150))
+    assert (body['startRow'], body['endRow'], body['lastRow']) == (100, 150, ROWS)
+    assert (body['page'], body['totalPages']) == (3, 5)
+
+
+def test_window_past_the_last_row_is_cut(client, dataset_id):
+    body = client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': 240, 'endRow': 300}).get_json()
+    assert (body['startRow'], body['endRow'], body['nextCursor']) == (240, ROWS, None)
+    body = client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': 400, 'endRow': 450}).get_json()
+    assert (body['data'], body['startRow'], body['endRow']) == ([], 400, 400)
+
+
+def test_windows_are_capped(client, dataset_id, monkeypatch):
+    monkeypatch.setattr(app_v2, 'MAX_WINDOW_ROWS', 30)
+    response = client.get('/data', query_string={'dataset_id': dataset_id, 'startRow': 10, 'endRow': 200})
+    assert numbers(response) == list(range(10, 40))
+
+
+def test_pages(client, dataset_id):
+    assert numbers(client.get('/data', query_string={'dataset_id': dataset_id, 'page': 2, 'page_size': 7})) == list(range(7, 14))
+    assert numbers(client.get('/data/3', query_string={'dataset_id': dataset_id, 'page_size': 100})) == list(range(200, ROWS))
+
+
+@pytest.mark.parametrize('window', [
+    {'startRow': -1, 'endRow': 10}, {'startRow': 10, 'endRow': 10}, {'startRow': 'a'},
+    {'page': 0}, {'page_size': 0}, {'page': 'x'},
+])
+def test_invalid_windows(client, dataset_id, window):
+    response = client.get('/data', query_string={'dataset_id': dataset_id, **window})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid window'
+
+
+def walk(client, path, **args):
+    """Follow nextCursor from the first window to the last, returning every row served."""
+    rows, cursor = [], None
+    while True:
+        query = {**args, 'cursor': cursor} if cursor else args
+        body = client.get(path, query_string=query).get_json()
+        rows += body['data']
+        cursor = body['nextCursor']
+        if cursor is None:
+            return rows
+
+
+def test_cursor_walk_over_the_data(client, dataset_id):
+    rows = walk(client, '/data', dataset_id=dataset_id, page_size=40)
+    assert [row['n'] for row in rows] == list(range(ROWS))
+
+
+def test_cursor_walk_over_search_results(client, dataset_id):
+    rows = walk(client, '/search', dataset_id=dataset_id, query='odd', page_size=40)
+    assert [row['n'] for row in rows] == list(range(1, ROWS, 2))
+
+
+def test_cursor_of_another_query_is_rejected(client, dataset_id):
+    cursor = client.get('/search', query_string={'dataset_id': dataset_id, 'query': 'odd'}).get_json()['nextCursor']
+    response = client.get('/search', query_string={'dataset_id': dataset_id, 'query': 'even', 'cursor': cursor})
+    assert response.status_code == 400
+
+
+def test_cursor_is_stale_once_rows_are_added(client, dataset_id):
+    cursor = client.get('/data', query_string={'dataset_id': dataset_id}).get_json()['nextCursor']
+    client.post('/rows', json={'dataset_id': dataset_id, 'rows': [{'n': ROWS, 'parity': 'even'}]})
+    response = client.get('/data', query_string={'dataset_id': dataset_id, 'cursor': cursor})
+    assert response.status_code == 409
+
+
+def test_cursor_survives_cell_edits(client, dataset_id):
+    cursor = client.get('/search', query_string={'dataset_id': dataset_id, 'query': 'odd'}).get_json()['nextCursor']
+    row = app_v2.DEFAULT_PAGE_ROWS * 2 + 1
+    client.patch('/cells', json={'dataset_id': dataset_id, 'edits': [{'row': row, 'column': 'parity', 'value': 'even'}]})
+    response = client.get('/search', query_string={'dataset_id': dataset_id, 'query': 'odd', 'cursor': cursor})
+    assert response.status_code == 200
+    # The search goes on from the same row and sees the edit
+    assert numbers(response)[0] == row + 2
+
+
+def test_cursor_survives_summary_updates(client, dataset_id):
+    cursor = client.get('/data', query_string={'dataset_id': dataset_id}).get_json()['nextCursor']
+    app_v2.registry.update(dataset_id, summary_row={'n': {'summary': 'updated'}})
+    response = client.get('/data', query_string={'dataset_id': dataset_id, 'cursor': cursor})
+    assert response.status_code == 200
+    assert numbers(response)[0] == app_v2.DEFAULT_PAGE_ROWS
@@ -0,0 +1,166 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Share of the progress bar taken by reading the file, the rest is split over the columns
+INGEST_PERCENT = 10
+
+
+class UploadJob:
+    """Progress of one upload: the current stage, overall percent and the status of each column."""
+
+    def __init__(self, filename):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.dataset_id = None
+        self.revision = 0
+        self.stage = 'queued'
+        self.columns = {}
+        # Fraction of the file converted, reported by ingests that stream the file in chunks
+        self.ingest_progress = 0.0
+        self.error = None
+        # Change report of a new version of an existing dataset (see dataset_diff)
+        self.changes = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def percent(self):
+        if self.stage == 'done':
+            return 100
+        if not self.columns:
+            return int(INGEST_PERCENT * self.ingest_progress)
+        # Each column is classified and then summarized
+        steps = sum({'pending': 0, 'classified': 1}.get(status, 2) for status in self.columns.values())
+        return INGEST_PERCENT + int((100 - INGEST_PERCENT) * steps / (2 * len(self.columns)))
+
+    def snapshot(self):
+        return {
+            'jobId': self.job_id,
+            'datasetId': self.dataset_id,
+            'revision': self.revision,
+            'filename': self.filename,
+            'stage': self.stage,
+            'percent': self.percent,
+            'dataReady': self.dataset_id is not None,
+            'columns': dict(self.columns),
+            'error': self.error,
+            'changes': self.changes,
+        }
+
+
+class UploadJobManager:
+    """
+    Runs upload processing on a background worker pool and tracks each job's progress.
+
+    When jobs_dir is set, every progress update is also written there so that other worker
+    processes sharing the directory can answer progress requests for jobs they don't run.
+    """
+
+    def __init__(self, max_workers, jobs_dir=None, retention_seconds=3600):
+        self.jobs_dir = jobs_dir
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def submit(self, filename, fn, *args):
+        """Create a job and run fn(job, *args) in the background, returning the job."""
+        job = UploadJob(filename)
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+        self._save(job)
+        self._executor.submit(self._run, job, fn, *args)
+        return job
+
+    def add_finished(self, filename, **fields):
+        """Record a job that needed no background processing, e.g. an upload served from the cache."""
+        job = UploadJob(filename)
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.stage = 'done'
+        job.finished_at = time.time()
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+        self._save(job)
+        return job
+
+    def update(self, job, **changes):
+        """Apply changes to the job's attributes; a 'column_status' change is a (column, status) pair."""
+        with self._lock:
+            column_status = changes.pop('column_status', None)
+            if column_status:
+                job.columns[column_status[0]] = column_status[1]
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.revision += 1
+            self._changed.notify_all()
+        self._save(job)
+
+    def get(self, job_id):
+        """Return the job's progress snapshot, or None if the job is unknown."""
+        if not job_id or not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return job.snapshot()
+        if self.jobs_dir:
+            try:
+                with open(os.path.join(self.jobs_dir, f"{job_id}.json")) as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                pass
+        return None
+
+    def wait_for_change(self, job_id, revision, timeout):
+        """Block until the job's revision is past the given one or the timeout expires, returning the latest snapshot."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job:
+                self._changed.wait_for(lambda: job.revision > revision, timeout)
+                return job.snapshot()
+
+        # The job runs in another worker process, poll its progress file
+        while True:
+            snapshot = self.get(job_id)
+            if snapshot is None or snapshot['revision'] > revision or time.monotonic() >= deadline:
+                return snapshot
+            time.sleep(min(0.25, max(deadline - time.monotonic(), 0)))
+
+    def _run(self, job, fn, *args):
+        try:
+            fn(job, *args)
+            self.update(job, stage='done', finished_at=time.time())
+        except Exception as e:
+            self.update(job, stage='error', error=str(e), finished_at=time.time())
+
+    def _prune(self):
+        # Forget jobs that finished longer ago than the retention period
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+            if self.jobs_dir:
+                try:
+                    os.remove(os.path.join(self.jobs_dir, f"{job_id}.json"))
+                except FileNotFoundError:
+                    pass
+
+    def _save(self, job):
+        if not self.jobs_dir:
+            return
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        with self._lock:
+            snapshot = job.snapshot()
+        tmp = os.path.join(self.jobs_dir, f".{job.job_id}.{uuid.uuid4().hex}")
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, os.path.join(self.jobs_dir, f"{job.job_id}.json"))